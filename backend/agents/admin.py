@@ -0,0 +1,30 @@
+from django.contrib import admin
+from .models import PromptMetric, ProjectStageEvent, StageCheckpoint
+
+@admin.register(PromptMetric)
+class PromptMetricAdmin(admin.ModelAdmin):
+    list_display = ('agent_name', 'project', 'input_tokens', 'raw_tokens', 'budget_tokens', 'created_at')
+    list_filter = ('agent_name', 'created_at')
+    readonly_fields = ('agent_name', 'project', 'budget_tokens', 'raw_tokens', 'input_tokens', 'section_tokens', 'trimmed_sections', 'created_at')
+
+
+@admin.register(ProjectStageEvent)
+class ProjectStageEventAdmin(admin.ModelAdmin):
+    list_display = ('project', 'stage', 'event', 'attempt', 'duration_ms', 'worker', 'created_at')
+    list_filter = ('stage', 'event', 'created_at')
+    readonly_fields = ('project', 'stage', 'event', 'attempt', 'worker', 'task_id', 'started_at', 'finished_at', 'duration_ms', 'created_at')
+
+    # Events are append-only (see ProjectStageEvent.save), so they can be
+    # viewed but not added or changed here.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StageCheckpoint)
+class StageCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('project', 'stage', 'step', 'created_at')
+    list_filter = ('stage', 'created_at')
+    readonly_fields = ('project', 'stage', 'step', 'idempotency_key', 'output', 'created_at')
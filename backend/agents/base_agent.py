@@ -1,12 +1,16 @@
-import google.generativeai as genai
-import os
 from abc import ABC, abstractmethod
+from .llm_cache import llm_cache
+from .model_registry import DEFAULT_MODEL, get_model
+from .prompt_builder import PromptBuilder, REQUIRED
 
 class BaseAgent(ABC):
     """
     Abstract Base Class for all AI Agents in the Applaude platform.
     """
-    def __init__(self, agent_name: str, agent_persona: str, goal: str):
+    # Input-token budget for prompts built with `_prompt_builder`; None uses LLM_PROMPT_TOKEN_BUDGET.
+    prompt_token_budget = None
+
+    def __init__(self, agent_name: str, agent_persona: str, goal: str, model_name: str = DEFAULT_MODEL):
         """
         Initializes the agent with its core attributes.
 
@@ -14,15 +18,13 @@ class BaseAgent(ABC):
             agent_name (str): The name of the agent.
             agent_persona (str): A rich description of the agent's persona.
             goal (str): The primary objective of the agent.
+            model_name (str): The model the agent talks to, resolved through the
+                process-wide model registry.
         """
         self.agent_name = agent_name
         self.agent_persona = agent_persona
         self.goal = goal
-        self.gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not self.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables.")
-        genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.model = get_model(model_name)
 
     @abstractmethod
     def execute(self, *args, **kwargs):
@@ -38,5 +40,41 @@ class BaseAgent(ABC):
         """
         return f"Persona: {self.agent_persona}\n\nGoal: {self.goal}\n\nTask: {task_description}"
 
+    def _prompt_builder(self, project=None) -> PromptBuilder:
+        """
+        Starts a budgeted prompt with the agent's persona and goal. Callers add
+        the task and its inputs as sections, then call `build()`.
+        """
+        builder = PromptBuilder(self.agent_name, self.prompt_token_budget, project=project)
+        builder.add('persona', f"Persona: {self.agent_persona}", priority=REQUIRED)
+        builder.add('goal', f"Goal: {self.goal}", priority=REQUIRED)
+        return builder
+
+    def generate_content(self, prompt: str) -> str:
+        """
+        Sends a prompt to the agent's model, serving repeated prompts from the
+        response cache shared with every other agent and task.
+        """
+        cached = llm_cache.get(self.model.model_name, prompt)
+        if cached is not None:
+            return cached
+        text = self.model.generate_content(prompt).text
+        llm_cache.set(self.model.model_name, prompt, text)
+        return text
+
+    def stream_content(self, prompt: str):
+        """
+        Yields the model's response text chunk by chunk as it is generated.
+        Streamed responses are not written to the response cache, since that
+        would mean holding the whole response in memory.
+        """
+        cached = llm_cache.get(self.model.model_name, prompt)
+        if cached is not None:
+            yield cached
+            return
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.parts:
+                yield chunk.text
+
     def __repr__(self):
         return f"{self.agent_name}Agent"
@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+from .models import StageCheckpoint
+
+
+def idempotency_key(stage: str, step: str, *inputs) -> str:
+    """Identifies a step by its stage, name and everything it reads."""
+    payload = json.dumps([stage, step, *inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def checkpointed(project_id, stage: str, step: str, compute, *inputs):
+    """
+    Runs one step of a stage at most once per pipeline run.
+
+    The step's output is stored under an idempotency key derived from
+    `inputs`, so a retry or resume with the same inputs returns the stored
+    output instead of calling `compute` again, while changed inputs run the
+    step afresh. If two attempts race, both outputs are valid and the
+    first one stored is what later retries get.
+
+    Args:
+        project_id: The project the stage runs for.
+        stage (str): The pipeline stage name.
+        step (str): The step within the stage.
+        compute (callable): Produces the step's JSON-serializable output.
+        *inputs: Everything the step's output depends on (e.g. its prompt).
+    """
+    key = idempotency_key(stage, step, *inputs)
+    checkpoint = StageCheckpoint.objects.filter(project_id=project_id, idempotency_key=key).only('output').first()
+    if checkpoint is not None:
+        print(f"Resuming {stage}/{step} for project {project_id} from its checkpoint.")
+        return checkpoint.output
+
+    output = compute()
+    StageCheckpoint.objects.bulk_create([
+        StageCheckpoint(project_id=project_id, stage=stage, step=step[:255], idempotency_key=key, output=output)
+    ], ignore_conflicts=True)
+    return output
+
+
+def clear_checkpoints(project_ids, stages):
+    """Forgets the projects' finished steps of the given stages, so they run afresh."""
+    StageCheckpoint.objects.filter(project_id__in=list(project_ids), stage__in=list(stages)).delete()
@@ -1,22 +1,163 @@
 from .base_agent import BaseAgent
 from .prompts.super_prompts import CODE_GEN_PERSONA, CODE_GEN_GOAL
-from apps.projects.models import Project
-from django.db import transaction
-import google.generativeai as genai
-import os
+from .code_stream import CodeBlockStreamParser
+from .model_registry import CODE_GEN_MODEL
+from apps.projects.models import Project, MobileApp
+from apps.projects.notifications import send_project_update
+from .project_status import update_project_status, report_progress
+from .checkpoints import checkpointed
+import hashlib
 import json
+import posixpath
+import re
+
+# Upper bound on the number of files a plan may fan out into.
+MAX_MANIFEST_FILES = 80
+
+PLATFORM_LANGUAGES = {
+    'Android': 'kotlin',
+    'iOS': 'swift',
+}
+
+# Trimming order for the optional prompt sections (higher is trimmed first).
+FILE_STRUCTURE_PRIORITY = 1
+PERSONA_PRIORITY = 2
+SURVEY_PRIORITY = 3
+
+# The project inputs generated code can depend on, and the fields behind
+# each. Every file depends on the structural inputs, which also shape the
+# plan itself; the plan names which of the others each file needs, and a
+# file's prompt only carries the inputs it depends on.
+FILE_INPUTS = {
+    'app_type': ('app_type',),
+    'source_url': ('source_url',),
+    'persona': ('user_persona_document',),
+    'brand_palette': ('brand_palette',),
+    'ux_survey': ('enable_ux_survey', 'ux_survey_questions'),
+    'pmf_survey': ('enable_pmf_survey', 'pmf_survey_questions'),
+}
+STRUCTURAL_INPUTS = ('app_type', 'source_url')
+OPTIONAL_INPUTS = tuple(name for name in FILE_INPUTS if name not in STRUCTURAL_INPUTS)
+
+# Placeholder survey questions for projects that have not customised theirs.
+DEFAULT_PMF_SURVEY_QUESTIONS = [
+    {"id": 1, "question": "How would you feel if you could no longer use [App Name]?", "type": "radio", "options": ["Very disappointed", "Somewhat disappointed", "Not disappointed (it's not that useful)"]},
+    {"id": 2, "question": "What is the primary benefit you receive from [App Name]?", "type": "text"},
+    {"id": 3, "question": "How likely are you to recommend [App Name] to a friend or colleague?", "type": "nps", "scale": [0, 10]},
+    {"id": 4, "question": "What alternatives would you use if [App Name] were no longer available?", "type": "text"}
+]
+DEFAULT_UX_SURVEY_QUESTIONS = [
+    {"id": 1, "question": "How easy is it to navigate this app?", "type": "scale", "min": 1, "max": 5, "labels": ["Very Difficult", "Very Easy"]},
+    {"id": 2, "question": "What do you like most about the app?", "type": "text"},
+    {"id": 3, "question": "What could be improved?", "type": "text"},
+    {"id": 4, "question": "Overall, how satisfied are you with the app?", "type": "radio", "options": ["Very Satisfied", "Satisfied", "Neutral", "Dissatisfied", "Very Dissatisfied"]}
+]
+
+
+def _question_text_only(section: str) -> str:
+    """Compacts a survey section to its question texts and types."""
+    title, _, questions_json = section.partition(':** ')
+    try:
+        questions = json.loads(questions_json)
+    except ValueError:
+        return section
+    summary = "; ".join(f"{q.get('question')} ({q.get('type')})" for q in questions if isinstance(q, dict))
+    return f"{title}:** {summary}"
+
+
+def input_digests(project: Project) -> dict:
+    """The current digest of each of a project's inputs, by input name."""
+    digests = {}
+    for name, fields in FILE_INPUTS.items():
+        value = json.dumps([getattr(project, field) for field in fields], sort_keys=True, default=str)
+        digests[name] = hashlib.sha256(value.encode('utf-8')).hexdigest()[:16]
+    return digests
+
+
+def file_dependencies(entry: dict) -> tuple:
+    """
+    The inputs a manifest entry depends on. Entries that do not say depend
+    on everything.
+    """
+    optional = entry.get('depends_on')
+    if optional is None:
+        optional = OPTIONAL_INPUTS
+    return STRUCTURAL_INPUTS + tuple(name for name in OPTIONAL_INPUTS if name in optional)
+
+
+def plan_regeneration(project_id):
+    """
+    Works out which files of a project's latest build are out of date.
+
+    A file is out of date when one of the inputs it was generated from has
+    changed since. Files whose inputs are unchanged can be kept as they are.
+
+    Args:
+        project_id: The project to regenerate.
+
+    Returns:
+        A `(manifest, stale)` pair: the latest build's manifest and the
+        entries of it that need generating again. None when the whole app
+        has to be planned and generated from scratch: there is no build
+        yet, a file of it predates dependency tracking, or a structural
+        input changed.
+    """
+    project = Project.objects.get(id=project_id)
+    build = project.builds.order_by('-build_number').first()
+    if build is None:
+        return None
+    current = input_digests(project)
+    apps = {
+        (app.platform, app.file_path): app
+        for app in MobileApp.objects.filter(project_id=project_id).only(
+            'id', 'platform', 'file_path', 'language', 'purpose', 'input_digests'
+        )
+    }
+
+    manifest, stale = [], []
+    for item in build.files:
+        app = apps.get((item['platform'], item['path']))
+        if app is None or not app.input_digests:
+            return None
+        recorded = app.input_digests
+        if any(recorded.get(name) != current[name] for name in STRUCTURAL_INPUTS):
+            return None
+        entry = {
+            'platform': app.platform,
+            'path': app.file_path,
+            'language': app.language,
+            'purpose': app.purpose,
+            'depends_on': [name for name in OPTIONAL_INPUTS if name in recorded],
+        }
+        manifest.append(entry)
+        if any(current.get(name) != digest for name, digest in recorded.items()):
+            stale.append(entry)
+    return manifest, stale
+
 
 class CodeGenAgent(BaseAgent):
     """
     Generates the mobile application source code.
+
+    Generation runs in two phases: a planning call that produces the file
+    manifest for every target platform, then one smaller call per file. The
+    per-file calls are independent, so `agents.tasks.run_code_generation`
+    fans them out as a Celery group; `execute` runs them in sequence.
+
+    Each file records the digests of the inputs it was generated from (see
+    FILE_INPUTS), so a later build only regenerates the files whose inputs
+    changed; see `plan_regeneration`.
     """
+    # The context is repeated in every per-file prompt, so it is kept tight.
+    prompt_token_budget = 6000
+
     def __init__(self):
         super().__init__(
             agent_name="Code Generation",
             agent_persona=CODE_GEN_PERSONA,
-            goal=CODE_GEN_GOAL
+            goal=CODE_GEN_GOAL,
+            model_name=CODE_GEN_MODEL
         )
-        self.model = genai.GenerativeModel(model_name='google/gemini-pro-2.5-experimental')
 
     def execute(self, project_id: int):
         """
@@ -27,104 +168,50 @@ class CodeGenAgent(BaseAgent):
             project_id (int): The ID of the project to build.
         """
         print(f"Executing Code Generation Agent for project {project_id}...")
-        try:
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status_message = "Generating production-ready code with advanced features..."
-                project.status = Project.ProjectStatus.CODE_GENERATION # Set status to generation
-                project.save()
-        except Project.DoesNotExist:
+        if not Project.objects.filter(id=project_id).exists():
             print(f"Error: Project with ID {project_id} not found.")
             return
+        update_project_status(project_id, Project.ProjectStatus.CODE_GENERATION, "Generating production-ready code with advanced features...")
 
-        # 1. Gather all data, including new survey flags and questions
-        user_persona = project.user_persona_document
-        palette = project.brand_palette
-        app_type = project.app_type
-        source_url = project.source_url
-        enable_ux_survey = project.enable_ux_survey
-        ux_survey_questions = project.ux_survey_questions
-        enable_pmf_survey = project.enable_pmf_survey
-        pmf_survey_questions = project.pmf_survey_questions
-
-        # Placeholder PMF questions (as I cannot access external articles)
-        if not pmf_survey_questions:
-            pmf_survey_questions = [
-                {"id": 1, "question": "How would you feel if you could no longer use [App Name]?", "type": "radio", "options": ["Very disappointed", "Somewhat disappointed", "Not disappointed (it's not that useful)"]},
-                {"id": 2, "question": "What is the primary benefit you receive from [App Name]?", "type": "text"},
-                {"id": 3, "question": "How likely are you to recommend [App Name] to a friend or colleague?", "type": "nps", "scale": [0, 10]},
-                {"id": 4, "question": "What alternatives would you use if [App Name] were no longer available?", "type": "text"}
-            ]
-        if not ux_survey_questions:
-             ux_survey_questions = [
-                {"id": 1, "question": "How easy is it to navigate this app?", "type": "scale", "min": 1, "max": 5, "labels": ["Very Difficult", "Very Easy"]},
-                {"id": 2, "question": "What do you like most about the app?", "type": "text"},
-                {"id": 3, "question": "What could be improved?", "type": "text"},
-                {"id": 4, "question": "Overall, how satisfied are you with the app?", "type": "radio", "options": ["Very Satisfied", "Satisfied", "Neutral", "Dissatisfied", "Very Dissatisfied"]}
-            ]
-
-
-
-
-        
-        # 2. Construct the detailed task for the Gemini API with multi-step reasoning
-        task_description = f"""
-        **MISSION CRITICAL TASK: Generate a production-ready mobile application with an integrated feedback engine.**
-
-        **Input Data:**
-        - **Target Platform:** {project.app_type}
-        - **User Persona:** {project.user_persona_document}
-        - **Brand Palette:** {json.dumps(project.brand_palette, indent=2)}
-        - **Enable UX Survey:** {project.enable_ux_survey}
-        - **Enable PMF Survey:** {project.enable_pmf_survey}
-
-        **Core Instructions:**
-        1.  Generate the complete, high-quality source code for the requested mobile application.
-        2.  The code must be clean, scalable, and follow platform-specific best practices.
-        3.  Implement all UI elements using the provided `Brand Palette`.
+        try:
+            manifest = self.plan(project_id)
+            for entry in manifest:
+                self.generate_file(project_id, entry, manifest)
+            self.validate(project_id, manifest)
+            self.discard_unplanned(project_id, manifest)
 
-        **Feedback Engine Implementation (MANDATORY):**
+            update_project_status(project_id, Project.ProjectStatus.COMPLETED, "Code generation complete. App is ready for download with integrated feedback features!")
 
-        You MUST generate code that performs the following actions within the mobile app:
+            send_project_update(project_id, {
+                'event': 'code_generation_complete',
+                'files_generated': len(manifest),
+            })
+            print(f"Code Generation complete for project {project_id}: {len(manifest)} files generated.")
 
-        1.  **Check Survey Flags:** The app MUST check the `enable_ux_survey` and `enable_pmf_survey` flags from the backend upon startup or when the relevant screen is loaded.
+        except Exception as e:
+            update_project_status(project_id, Project.ProjectStatus.FAILED, f"Code generation failed: {e}")
+            print(f"Error during code generation for project {project_id}: {e}")
+            raise
 
-        2.  **Display Survey Overlay:**
-            * If a survey is enabled, the app MUST display a **non-intrusive, full-screen survey overlay**.
-            * This overlay should appear after a set period of use (e.g., after the 5th app open, or 1 week after install). This logic should be implemented using local storage (e.g., SharedPreferences on Android, UserDefaults on iOS) to track app open counts or install date.
-            * The survey form itself must be **beautifully styled** using the app's own branding (colors, fonts) derived from the `Brand Palette`.
+    def plan(self, project_id) -> list:
+        """
+        Asks the model for the file manifest (Steps 1-3 of the framework).
 
-        3.  **User Control:**
-            * The survey overlay MUST include a clear and prominent **"Dismiss" or "Skip" button**.
-            * The survey must only be shown **once per user**. After being shown (and either completed or dismissed), it should not appear again. Use local storage to track this state (e.g., `has_shown_pmf_survey = true`).
+        Args:
+            project_id: The ID of the project to plan.
 
-        4.  **Analytics Tracking:**
-            * The app must track and send analytics events to the backend for the following actions:
-                * `survey_impression`: Fired when the user is shown the survey overlay.
-                * `survey_dismissed`: Fired when the user clicks the "Dismiss" or "Skip" button.
-                * `survey_completed`: Fired when the user successfully submits the survey form.
-        
-        Generate the code for all necessary files, including UI, logic, and analytics hooks.
+        Returns:
+            A list of `{"platform", "path", "language", "purpose", "depends_on"}`
+            dicts covering every platform required by the project's `app_type`.
         """
-        **Input Data:**
-        -   **Target Platform(s):** {app_type} (options: 'ANDROID', 'IOS', 'BOTH')
-        -   **Core User Persona Document:**
-            ```markdown
-            {user_persona}
-            ```
-        -   **Brand Color Palette (JSON):**
-            ```json
-            {json.dumps(palette, indent=2)}
-            ```
-        -   **Original Website URL (for content/product context):** {source_url}
-        -   **User Experience (UX) Survey Enabled:** {enable_ux_survey}
-            -   **UX Survey Questions:** {json.dumps(ux_survey_questions, indent=2)}
-        -   **Product Market Fit (PMF) Survey Enabled:** {enable_pmf_survey}
-            -   **PMF Survey Questions:** {json.dumps(pmf_survey_questions, indent=2)}
-
+        project = Project.objects.get(id=project_id)
+        app_type = project.app_type
+        builder = self._prompt_builder(project)
+        self._add_context(builder, project)
+        builder.add('task', f"""
         ---
 
-        **Multi-Step Reasoning Framework (Strict Adherence Required):**
+        **Planning Framework (Strict Adherence Required):**
 
         **Step 1: Deconstruct the Persona and Website Intent**
         * Analyze the `Core User Persona Document` to explicitly state your understanding of the target user's primary needs, motivations, and pain points relevant to a mobile application.
@@ -144,481 +231,290 @@ class CodeGenAgent(BaseAgent):
         * Include folders for UI components, screens/views, utilities, data models, networking, and styling/theming.
         * **Explicitly include structure for the Survey/Feedback module.**
 
-        **Step 4: Generate Code - Detailed Implementation**
-        * Generate the full, production-ready source code for each file identified in Step 3.
-        * For each file, start with a comment specifying the full file path.
-        * **Crucially, integrate the `Brand Color Palette` into a dedicated theme/style file.** All UI elements in the generated code MUST reference colors from this palette, not hardcoded values.
+        **Output Requirements:**
+        * Return ONLY a JSON object of the form `{{"files": [{{"platform": "Android" | "iOS", "path": "...", "language": "kotlin" | "swift" | ..., "purpose": "...", "depends_on": [...]}}]}}`.
+        * List every file of the structure from Step 3, one entry per file. Do NOT generate any code yet.
+        * `purpose` is one or two sentences describing what the file implements and which other files it depends on.
+        * `depends_on` lists the inputs the file's code needs, out of {', '.join(f'"{name}"' for name in OPTIONAL_INPUTS)}. Each file is later generated from these inputs alone, so keep the list minimal: only the theme/style file needs `brand_palette`, and only the survey module's files need the survey inputs.
+        """)
+        prompt = builder.build()
+        return checkpointed(
+            project_id, 'code_generation', 'plan',
+            lambda: self._parse_manifest(self.generate_content(prompt), project.app_type), prompt
+        )
+
+    def generate_file(self, project_id, entry: dict, manifest: list) -> str:
+        """
+        Generates a single file from the manifest (Step 4 of the framework) and
+        persists it as soon as its code block is complete.
+
+        Args:
+            project_id: The ID of the project being built.
+            entry (dict): The manifest entry for the file to generate.
+            manifest (list): The full manifest, so imports stay consistent across files.
+
+        Returns:
+            The path of the generated file.
+        """
+        project = Project.objects.get(id=project_id)
+        dependencies = file_dependencies(entry)
+        sibling_paths = "\n".join(
+            f"        - [{item['platform']}] {item['path']}" for item in manifest if item['platform'] == entry['platform']
+        )
+        builder = self._prompt_builder(project)
+        self._add_context(builder, project, dependencies)
+        builder.add('file_structure', f"""
+        ---
+
+        **Planned {entry['platform']} File Structure:**
+{sibling_paths}
+        """, priority=FILE_STRUCTURE_PRIORITY)
+        builder.add('task', f"""
+        **Step 4: Generate Code - Detailed Implementation (ONE FILE)**
+        * Generate the full, production-ready source code for `{entry['path']}` ONLY.
+        * Purpose of this file: {entry.get('purpose', '')}
+        * Reference other files by the paths above; do not generate them.
+        * Start the file with a comment specifying its full file path.
+        * **Crucially, integrate the `Brand Color Palette` through the dedicated theme/style file.** All UI elements MUST reference colors from that file, not hardcoded values.
         * For content, use placeholder data that aligns with the inferred app purpose (e.g., `dummyProducts`, `sampleArticles`).
-        * Ensure the code is clean, well-commented, and follows best practices for {app_type} development. For iOS, use Swift/SwiftUI and maximize the use of modern UI features like "liquid glass" effects. For Android, use Kotlin.
-        * **Implement the survey display and data collection features.** Provide a clear button for users to trigger the survey, and a dismiss option for pop-ups. Include tracking logic.
-        * The output format MUST be a series of distinct code blocks, each clearly preceded by its file path.
+        * Ensure the code is clean, well-commented, and follows best practices for {entry['platform']} development. For iOS, use Swift/SwiftUI and maximize the use of modern UI features like "liquid glass" effects. For Android, use Kotlin.
+        * The output MUST be a single code block preceded by its file path comment, with no other text.
 
         ---
-        **Example Output Format for Step 4 (Apply this for ALL generated code, adapting paths):**
+        **Example Output Format:**
         
         ```swift
         // File: MyApp/Views/ContentView.swift
         import SwiftUI
 
-        struct ContentView: View {
-            var body: some View {
+        struct ContentView: View {{
+            var body: some View {{
                 Text("Hello, world!")
                     .padding()
-            }
-        }
+            }}
+        }}
         ```
-        
-        ---
-        **Begin your detailed, multi-step reasoning and code generation now.**
-        """
-        
-        full_prompt = self._generate_prompt(task_description)
-
-        try:
-            # Simulate API call
-            # In a real application, this would call self.model.generate_content(full_prompt)
-            # For this exercise, we will simulate the expected output structure.
-            # The actual response will be very large and context-dependent,
-            # especially with the new survey features.
-
-            # This is a simplified simulation of the actual code generation.
-            # A real model output would be much more extensive and detailed,
-            # explicitly including files for survey UI, data models, and API integration.
-            simulated_code_output = f"""
-            **Step 1: Deconstruct the Persona and Website Intent**
-            * **Understanding of User Persona:** The persona "Digital Nomad Diana" indicates a user who is highly mobile, values efficiency, seamless integration, and clean interfaces for managing her professional and digital life. She seeks instant access and reliable tools to navigate her travel-heavy lifestyle.
-            * **Inferred Primary Purpose:** The mobile application's primary purpose is to serve as a **highly efficient mobile companion for digital professionals**, extending the core functionalities of `{source_url}` into a native, offline-capable, and intuitively designed mobile experience. It's about empowering Diana to manage her work and engagement on the go.
-
-            **Step 2: Define Core App Logic, Key Features, and Feedback Integration Strategy**
-            * **Essential Functionalities:**
-                * Secure User Authentication & Profile Management.
-                * Access to core content/products/services from `{source_url}`.
-                * Push Notifications for critical updates.
-                * **Integrated Feedback & Survey Module:**
-                    * UX and PMF Surveys with dynamic question rendering.
-                    * In-app rating collection.
-                    * Textual feedback submission.
-            * **Minimal Screens/Views:**
-                * `AuthScreen` (Login/Signup)
-                * `Dashboard/Home Screen` (Main content, quick actions)
-                * `Content/Product Detail Screen`
-                * `Profile/Settings Screen`
-                * `Survey/Feedback Module` (Accessible via dedicated section and/or subtle, dismissible pop-ups).
-            * **Feedback Integration Strategy:**
-                * **Survey Display:** A subtle, non-intrusive pop-up will appear after a user completes a certain action or has spent a minimum time in the app, with a clear 'Dismiss' button and a 'Don't show again' option. A dedicated 'Feedback' section will also be available in the app settings.
-                * **Data Collection:** Survey responses, ratings, and text feedback will be collected via secure API calls to the Applause backend, validated, and timestamped.
-                * **Tracking:** Each survey impression (saw), interaction (ignored, clicked), and completion (answered) will be logged to provide granular analytics on user engagement with feedback prompts.
-
-            **Step 3: Propose Logical File Structure for {app_type}**
-            * **For Android (Kotlin):**
-                ```
-                app/
-                ├── src/
-                │   └── main/
-                │       ├── java/
-                │       │   └── com/yourcompany/yourapp/
-                │       │       ├── MainActivity.kt
-                │       │       ├── ui/
-                │       │       │   ├── theme/ # Color, Theme, Type
-                │       │       │   ├── screens/ # AuthScreen, HomeScreen, DetailScreen, ProfileScreen
-                │       │       │   ├── components/ # Generic UI components
-                │       │       │   └── feedback/ # NEW: SurveyDialog, FeedbackScreen, RatingComponent
-                │       │       ├── data/
-                │       │       │   ├── model/ # Product, User, SurveyResponse, AppRating, Feedback
-                │       │       │   └── repository/ # Repository for data access including feedback submission
-                │       │       ├── network/ # API service for backend communication
-                │       │       └── util/ # Constants, AnalyticsLogger (for survey interaction tracking)
-                │       └── res/
-                └── build.gradle
-                ```
-            * **For iOS (SwiftUI):**
-                ```
-                YourAppName/
-                ├── YourAppNameApp.swift
-                ├── Views/ # AuthView, HomeView, DetailView, ProfileView
-                ├── Components/ # Generic UI components, LiquidGlassView
-                ├── Feedback/ # NEW: SurveyPromptView, FeedbackView, RatingView, SurveyModels.swift
-                ├── Models/ # Product, User, SurveyResponse, AppRating, Feedback
-                ├── Services/ # API service for backend communication, AnalyticsService (for survey tracking)
-                └── Theme/ # ColorPalette.swift
-                ```
-
-            **Step 4: Generate Code - Detailed Implementation**
-
-            ```swift
-            // File: YourAppName/Components/LiquidGlassView.swift
-            import SwiftUI
-
-            struct LiquidGlassView: View {
-                var body: some View {
-                    ZStack {
-                        Rectangle()
-                            .fill(LinearGradient(
-                                gradient: Gradient(colors: [Color.white.opacity(0.1), Color.white.opacity(0.05)]),
-                                startPoint: .top,
-                                endPoint: .bottom
-                            ))
-                            .blur(radius: 10)
-                        
-                        Rectangle()
-                            .stroke(Color.white.opacity(0.2), lineWidth: 1)
-                    }
-                    .background(Color.clear)
-                }
-            }
-            ```
+        """)
 
-            ```kotlin
-            // File: app/src/main/java/com/yourcompany/yourapp/ui/theme/Color.kt
-            package com.yourcompany.yourapp.ui.theme
-
-            import androidx.compose.ui.graphics.Color
+        prompt = builder.build()
+        return checkpointed(
+            project_id, 'code_generation', f"file:{entry['path']}",
+            lambda: self._stream_file(project, entry, prompt, dependencies), prompt
+        )
 
-            val PrimaryColor = Color(0xFF{palette['primary'][1:]})
-            val SecondaryColor = Color(0xFF{palette['secondary'][1:]})
-            val TextLight = Color(0xFF{palette['text_light'][1:]})
-            val TextDark = Color(0xFF{palette['text_dark'][1:]})
-            val BackgroundColor = Color(0xFF{palette['background'][1:]})
-            val AccentColor = Color(0xFFE500FF) // Example for contrast elements
-            ```
+    def _stream_file(self, project: Project, entry: dict, prompt: str, dependencies: tuple) -> str:
+        parser = CodeBlockStreamParser()
+        saved_path = None
+        current = input_digests(project)
+        digests = {name: current[name] for name in dependencies}
+        for chunk in self.stream_content(prompt):
+            for generated_file in parser.feed(chunk):
+                saved_path = self._save_file(project, generated_file, entry, digests)
+        for generated_file in parser.close():
+            saved_path = self._save_file(project, generated_file, entry, digests)
+
+        if saved_path is None:
+            raise ValueError(f"The model response for {entry['path']} did not contain a source file.")
+        return saved_path
+
+    def validate(self, project_id, manifest: list):
+        """
+        Checks that every planned file was generated and is non-empty.
+        Raises a ValueError listing the missing files otherwise.
+        """
+        generated = set(
+            MobileApp.objects.filter(project_id=project_id)
+            .exclude(code_snippet='')
+            .values_list('file_path', flat=True)
+        )
+        missing = [entry['path'] for entry in manifest if entry['path'] not in generated]
+        if missing:
+            raise ValueError(f"{len(missing)} planned files were not generated: {', '.join(missing[:5])}")
 
-            ```kotlin
-            // File: app/src/main/java/com/yourcompany/yourapp/ui/theme/Theme.kt
-            package com.yourcompany.yourapp.ui.theme
-
-            import androidx.compose.foundation.isSystemInDarkTheme
-            import androidx.compose.material3.MaterialTheme
-            import androidx.compose.material3.darkColorScheme
-            import androidx.compose.material3.lightColorScheme
-            import androidx.compose.runtime.Composable
-
-            private val DarkColorScheme = darkColorScheme(
-                primary = PrimaryColor,
-                secondary = SecondaryColor,
-                background = BackgroundColor,
-                surface = BackgroundColor,
-                onPrimary = TextLight,
-                onSecondary = TextLight,
-                onBackground = TextLight,
-                onSurface = TextLight,
-                tertiary = AccentColor // Using accent for tertiary
-            )
-
-            private val LightColorScheme = lightColorScheme(
-                primary = PrimaryColor,
-                secondary = SecondaryColor,
-                background = BackgroundColor,
-                surface = BackgroundColor,
-                onPrimary = TextDark,
-                onSecondary = TextDark,
-                onBackground = TextDark,
-                onSurface = TextDark,
-                tertiary = AccentColor // Using accent for tertiary
-            )
-
-            @Composable
-            fun YourAppTheme(
-                darkTheme: Boolean = isSystemInDarkTheme(),
-                content: @Composable () -> Unit
-            ) {
-                val colorScheme = when {
-                    darkTheme -> DarkColorScheme
-                    else -> LightColorScheme
-                }
-
-                MaterialTheme(
-                    colorScheme = colorScheme,
-                    typography = Type, // Assuming Type.kt exists for typography
-                    content = content
-                )
-            }
-            ```
+    def discard_unplanned(self, project_id, manifest: list) -> int:
+        """
+        Deletes the project's files that are not in the manifest, e.g. those
+        of a platform a re-plan dropped, so the next build holds exactly the
+        planned files. Returns how many were deleted.
+        """
+        deleted, _ = MobileApp.objects.filter(project_id=project_id).exclude(
+            file_path__in=[entry['path'] for entry in manifest]
+        ).delete()
+        if deleted:
+            print(f"Removed {deleted} files no longer in the plan of project {project_id}.")
+        return deleted
+
+    def _add_context(self, builder, project: Project, inputs=None):
+        """
+        Adds the project inputs shared by the planning call and every per-file
+        call. Optional inputs are compacted or trimmed when the prompt runs
+        over the agent's token budget.
 
-            ```kotlin
-            // File: app/src/main/java/com/yourcompany/yourapp/data/model/Survey.kt
-            package com.yourcompany.yourapp.data.model
-
-            // Represents a single question in a survey
-            data class SurveyQuestion(
-                val id: Int,
-                val question: String,
-                val type: String, // e.g., "text", "radio", "scale", "nps"
-                val options: List<String>? = null, // For radio/dropdown
-                val min: Int? = null, // For scale
-                val max: Int? = null, // For scale
-                val labels: List<String>? = null // For scale labels
-            )
-
-            // Represents a user's response to a survey
-            data class SurveyResponse(
-                val projectId: String,
-                val userId: String,
-                val surveyType: String, // "UX" or "PMF"
-                val responses: Map<String, Any>, // Map of question ID to answer
-                val timestamp: Long
-            )
-
-            // Represents an app rating
-            data class AppRating(
-                val projectId: String,
-                val userId: String,
-                val rating: Int, // e.g., 1-5 stars
-                val comment: String? = null,
-                val timestamp: Long
-            )
-
-            // Represents general user feedback
-            data class UserFeedback(
-                val projectId: String,
-                val userId: String,
-                val feedbackText: String,
-                val timestamp: Long
-            )
-            ```
+        Args:
+            builder: The prompt builder to add the sections to.
+            project (Project): The project being built.
+            inputs: Names of the FILE_INPUTS to include. Defaults to all of them.
+        """
+        inputs = FILE_INPUTS.keys() if inputs is None else inputs
+        builder.add('instructions', """
+Task:
+        **MISSION CRITICAL TASK: Generate a production-ready mobile application with an integrated feedback engine.**
 
-            ```kotlin
-            // File: app/src/main/java/com/yourcompany/yourapp/ui/feedback/SurveyDisplay.kt
-            package com.yourcompany.yourapp.ui.feedback
-
-            import androidx.compose.animation.AnimatedVisibility
-            import androidx.compose.animation.fadeIn
-            import androidx.compose.animation.fadeOut
-            import androidx.compose.foundation.background
-            import androidx.compose.foundation.layout.*
-            import androidx.compose.material3.*
-            import androidx.compose.runtime.*
-            import androidx.compose.ui.Alignment
-            import androidx.compose.ui.Modifier
-            import androidx.compose.ui.graphics.Color
-            import androidx.compose.ui.unit.dp
-            import com.yourcompany.yourapp.data.model.SurveyQuestion
-            import com.yourcompany.yourapp.ui.theme.BackgroundColor
-            import com.yourcompany.yourapp.ui.theme.PrimaryColor
-            import com.yourcompany.yourapp.ui.theme.TextLight
-
-            @Composable
-            fun SurveyPromptDialog(
-                isVisible: Boolean,
-                onDismiss: () -> Unit,
-                onSurveyClick: () -> Unit,
-                surveyTitle: String = "Quick Feedback!"
-            ) {
-                AnimatedVisibility(
-                    visible = isVisible,
-                    enter = fadeIn(),
-                    exit = fadeOut()
-                ) {
-                    AlertDialog(
-                        onDismissRequest = onDismiss,
-                        title = { Text(surveyTitle, color = TextLight) },
-                        text = { Text("Help us improve by answering a short survey.", color = TextLight) },
-                        confirmButton = {
-                            Button(
-                                onClick = onSurveyClick,
-                                colors = ButtonDefaults.buttonColors(containerColor = PrimaryColor)
-                            ) {
-                                Text("Start Survey", color = Color.White)
-                            }
-                        },
-                        dismissButton = {
-                            TextButton(onClick = onDismiss) {
-                                Text("Not Now", color = TextLight)
-                            }
-                        },
-                        containerColor = BackgroundColor
-                    )
-                }
-            }
+        **Core Instructions:**
+        1.  Generate the complete, high-quality source code for the requested mobile application.
+        2.  The code must be clean, scalable, and follow platform-specific best practices.
+        3.  Implement all UI elements using the provided `Brand Palette`.
 
-            @Composable
-            fun SurveyScreen(
-                surveyQuestions: List<SurveyQuestion>,
-                onSubmit: (Map<String, Any>) -> Unit,
-                onClose: () -> Unit,
-                surveyType: String
-            ) {
-                var currentResponses by remember { mutableStateOf<MutableMap<String, Any>>(mutableMapOf()) }
-
-                Scaffold(
-                    topBar = {
-                        TopAppBar(
-                            title = { Text("$surveyType Survey", color = TextLight) },
-                            colors = TopAppBarDefaults.topAppBarColors(containerColor = PrimaryColor),
-                            navigationIcon = {
-                                IconButton(onClick = onClose) {
-                                    Icon(Icons.Default.Close, contentDescription = "Close", tint = TextLight)
-                                }
-                            }
-                        )
-                    }
-                ) { paddingValues ->
-                    Column(
-                        modifier = Modifier
-                            .fillMaxSize()
-                            .padding(paddingValues)
-                            .padding(16.dp)
-                            .background(BackgroundColor)
-                    ) {
-                        surveyQuestions.forEach { question ->
-                            QuestionView(question = question, onAnswer = { answer ->
-                                currentResponses[question.id.toString()] = answer
-                            }, currentAnswer = currentResponses[question.id.toString()])
-                            Spacer(modifier = Modifier.height(16.dp))
-                        }
-                        Button(
-                            onClick = { onSubmit(currentResponses) },
-                            modifier = Modifier.fillMaxWidth().padding(vertical = 16.dp),
-                            colors = ButtonDefaults.buttonColors(containerColor = PrimaryColor)
-                        ) {
-                            Text("Submit Survey", color = Color.White)
-                        }
-                    }
-                }
-            }
+        **Feedback Engine Implementation (MANDATORY):**
 
-            @Composable
-            fun QuestionView(question: SurveyQuestion, onAnswer: (Any) -> Unit, currentAnswer: Any?) {
-                Column {
-                    Text(question.question, style = MaterialTheme.typography.titleMedium, color = TextLight)
-                    Spacer(modifier = Modifier.height(8.dp))
-                    when (question.type) {
-                        "text" -> {
-                            OutlinedTextField(
-                                value = currentAnswer as? String ?: "",
-                                onValueChange = { onAnswer(it) },
-                                modifier = Modifier.fillMaxWidth(),
-                                label = { Text("Your answer") },
-                                colors = TextFieldDefaults.outlinedTextFieldColors(
-                                    focusedBorderColor = PrimaryColor,
-                                    unfocusedBorderColor = TextLight.copy(alpha = 0.5f),
-                                    textColor = TextLight,
-                                    cursorColor = PrimaryColor
-                                )
-                            )
-                        }
-                        "radio" -> {
-                            question.options?.forEach { option ->
-                                Row(verticalAlignment = Alignment.CenterVertically) {
-                                    RadioButton(
-                                        selected = (currentAnswer as? String) == option,
-                                        onClick = { onAnswer(option) },
-                                        colors = RadioButtonDefaults.colors(selectedColor = PrimaryColor)
-                                    )
-                                    Text(option, color = TextLight)
-                                }
-                            }
-                        }
-                        "scale" -> {
-                            val selectedValue = (currentAnswer as? Float) ?: (question.min?.toFloat() ?: 1f)
-                            Column(modifier = Modifier.fillMaxWidth()) {
-                                Slider(
-                                    value = selectedValue,
-                                    onValueChange = { onAnswer(it) },
-                                    valueRange = question.min?.toFloat() ?: 1f .. question.max?.toFloat() ?: 5f,
-                                    steps = (question.max ?: 5) - (question.min ?: 1) - 1,
-                                    colors = SliderDefaults.colors(
-                                        thumbColor = PrimaryColor,
-                                        activeTrackColor = PrimaryColor,
-                                        inactiveTrackColor = TextLight.copy(alpha = 0.3f)
-                                    )
-                                )
-                                Row(
-                                    modifier = Modifier.fillMaxWidth(),
-                                    horizontalArrangement = Arrangement.SpaceBetween
-                                ) {
-                                    question.labels?.forEach { label ->
-                                        Text(label, style = MaterialTheme.typography.bodySmall, color = TextLight)
-                                    }
-                                }
-                            }
-                        }
-                        "nps" -> {
-                            val selectedValue = (currentAnswer as? Float) ?: 0f
-                            Column(modifier = Modifier.fillMaxWidth()) {
-                                Slider(
-                                    value = selectedValue,
-                                    onValueChange = { onAnswer(it.toInt()) }, // NPS usually integer
-                                    valueRange = question.min?.toFloat() ?: 0f .. question.max?.toFloat() ?: 10f,
-                                    steps = (question.max ?: 10) - (question.min ?: 0) - 1,
-                                    colors = SliderDefaults.colors(
-                                        thumbColor = PrimaryColor,
-                                        activeTrackColor = PrimaryColor,
-                                        inactiveTrackColor = TextLight.copy(alpha = 0.3f)
-                                    )
-                                )
-                                Row(
-                                    modifier = Modifier.fillMaxWidth(),
-                                    horizontalArrangement = Arrangement.SpaceBetween
-                                ) {
-                                    Text("Not Likely (0)", style = MaterialTheme.typography.bodySmall, color = TextLight)
-                                    Text("Very Likely (10)", style = MaterialTheme.typography.bodySmall, color = TextLight)
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-            ```
+        You MUST generate code that performs the following actions within the mobile app:
 
-            ```kotlin
-            // File: app/src/main/java/com/yourcompany/yourapp/util/AnalyticsLogger.kt
-            package com.yourcompany.yourapp.util
+        1.  **Check Survey Flags:** The app MUST check the `enable_ux_survey` and `enable_pmf_survey` flags from the backend upon startup or when the relevant screen is loaded.
 
-            import android.util.Log
+        2.  **Display Survey Overlay:**
+            * If a survey is enabled, the app MUST display a **non-intrusive, full-screen survey overlay**.
+            * This overlay should appear after a set period of use (e.g., after the 5th app open, or 1 week after install). This logic should be implemented using local storage (e.g., SharedPreferences on Android, UserDefaults on iOS) to track app open counts or install date.
+            * The survey form itself must be **beautifully styled** using the app's own branding (colors, fonts) derived from the `Brand Palette`.
 
-            object AnalyticsLogger {
-                private const val TAG = "AppAnalytics"
+        3.  **User Control:**
+            * The survey overlay MUST include a clear and prominent **"Dismiss" or "Skip" button**.
+            * The survey must only be shown **once per user**. After being shown (and either completed or dismissed), it should not appear again. Use local storage to track this state (e.g., `has_shown_pmf_survey = true`).
 
-                fun logSurveyEvent(eventId: String, projectId: String, userId: String, details: Map<String, Any>? = null) {
-                    val logMessage = "Event: $eventId, Project: $projectId, User: $userId"
-                    val fullMessage = if (details != null) "$logMessage, Details: $details" else logMessage
-                    Log.d(TAG, fullMessage)
-                    // In a real app, send this to a backend analytics service
-                }
-            }
+        4.  **Analytics Tracking:**
+            * The app must track and send analytics events to the backend for the following actions:
+                * `survey_impression`: Fired when the user is shown the survey overlay.
+                * `survey_dismissed`: Fired when the user clicks the "Dismiss" or "Skip" button.
+                * `survey_completed`: Fired when the user successfully submits the survey form.
+        """)
+        input_data = f"""
+        **Input Data:**
+        -   **Target Platform:** {project.app_type} (options: 'ANDROID', 'IOS', 'BOTH')
+        -   **Original Website URL (for content/product context):** {project.source_url}
+"""
+        if 'ux_survey' in inputs:
+            input_data += f"        -   **User Experience (UX) Survey Enabled:** {project.enable_ux_survey}\n"
+        if 'pmf_survey' in inputs:
+            input_data += f"        -   **Product Market Fit (PMF) Survey Enabled:** {project.enable_pmf_survey}\n"
+        builder.add('input_data', input_data)
+        if 'brand_palette' in inputs:
+            # Compact JSON: indentation alone roughly doubles the palette's token count.
+            builder.add('brand_palette', f"""
+        -   **Brand Color Palette (JSON):** {json.dumps(project.brand_palette, separators=(',', ':'))}
+        """)
+        if 'persona' in inputs:
+            builder.add('user_persona', f"""
+        -   **Core User Persona Document:**
+            ```markdown
+            {project.user_persona_document}
             ```
+        """, priority=PERSONA_PRIORITY)
+        # Survey questions only matter when the survey is switched on.
+        if 'ux_survey' in inputs and project.enable_ux_survey:
+            builder.add('ux_survey_questions', self._survey_section(
+                "UX Survey Questions", project.ux_survey_questions or DEFAULT_UX_SURVEY_QUESTIONS
+            ), priority=SURVEY_PRIORITY, compactor=_question_text_only)
+        if 'pmf_survey' in inputs and project.enable_pmf_survey:
+            builder.add('pmf_survey_questions', self._survey_section(
+                "PMF Survey Questions", project.pmf_survey_questions or DEFAULT_PMF_SURVEY_QUESTIONS
+            ), priority=SURVEY_PRIORITY, compactor=_question_text_only)
+
+    def _survey_section(self, title: str, questions: list) -> str:
+        return f"        -   **{title}:** {json.dumps(questions, separators=(',', ':'))}"
+
+    def _parse_manifest(self, response: str, app_type: str) -> list:
+        """
+        Extracts and validates the file manifest from the planning response.
+        Files for a platform the project does not target, or whose path
+        would leave the project's directory, are dropped.
+        """
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if not json_match:
+            raise ValueError("Could not extract the file manifest from the planning response.")
+        files = json.loads(json_match.group(0)).get('files') or []
+        required = {'ANDROID': {'Android'}, 'IOS': {'iOS'}, 'BOTH': {'Android', 'iOS'}}.get(app_type, set())
+        platforms = {platform.lower(): platform for platform in PLATFORM_LANGUAGES}
+
+        manifest = []
+        seen = set()
+        for item in files:
+            path = self._clean_path(item.get('path'))
+            platform = platforms.get(str(item.get('platform', '')).strip().lower())
+            if platform not in required:
+                print(f"Skipping planned file {path!r} for untargeted platform {item.get('platform')!r}.")
+                continue
+            if path is None:
+                print(f"Skipping planned file with unsafe path {item.get('path')!r}.")
+                continue
+            if not path or path in seen:
+                continue
+            seen.add(path)
+            manifest.append({
+                'platform': platform,
+                'path': path,
+                'language': (item.get('language') or PLATFORM_LANGUAGES[platform]).lower(),
+                'purpose': item.get('purpose', ''),
+                'depends_on': self._parse_dependencies(item.get('depends_on')),
+            })
+
+        if not manifest:
+            raise ValueError("The planning response did not list any files.")
+        if len(manifest) > MAX_MANIFEST_FILES:
+            raise ValueError(f"The plan lists {len(manifest)} files; the limit is {MAX_MANIFEST_FILES}.")
+
+        missing_platforms = required - {entry['platform'] for entry in manifest}
+        if missing_platforms:
+            raise ValueError(f"The plan has no files for: {', '.join(sorted(missing_platforms))}.")
+        return manifest
+
+    @staticmethod
+    def _clean_path(path) -> str:
+        """
+        A planned file's path, normalized to a relative POSIX path. Returns
+        None for paths that are absolute or climb out with `..`, since they
+        end up as entry names in the build's ZIP.
+        """
+        path = str(path or '').strip().replace('\\', '/')
+        if not path:
+            return ''
+        if path.startswith('/') or re.match(r'^[A-Za-z]:', path) or '..' in path.split('/'):
+            return None
+        path = posixpath.normpath(path)
+        return '' if path == '.' else path
+
+    @staticmethod
+    def _parse_dependencies(depends_on) -> list:
+        """
+        The known optional inputs a planned file names. A file that does not
+        give a list depends on all of them, so it is never left stale.
+        """
+        if not isinstance(depends_on, list):
+            return list(OPTIONAL_INPUTS)
+        return [name for name in OPTIONAL_INPUTS if name in depends_on]
 
-            ```kotlin
-            // File: app/src/main/java/com/yourcompany/yourapp/network/AppApiService.kt
-            package com.yourcompany.yourapp.network
-
-            import com.yourcompany.yourapp.data.model.SurveyResponse
-            import com.yourcompany.yourapp.data.model.AppRating
-            import com.yourcompany.yourapp.data.model.UserFeedback
-            import retrofit2.http.Body
-            import retrofit2.http.POST
-
-            // Placeholder for API service for submitting feedback and survey data
-            interface AppApiService {
-                @POST("api/app-feedback/survey-response/")
-                suspend fun submitSurveyResponse(@Body response: SurveyResponse): retrofit2.Response<Void>
-
-                @POST("api/app-feedback/app-rating/")
-                suspend fun submitAppRating(@Body rating: AppRating): retrofit2.Response<Void>
-
-                @POST("api/app-feedback/user-feedback/")
-                suspend fun submitUserFeedback(@Body feedback: UserFeedback): retrofit2.Response<Void>
+    def _save_file(self, project: Project, generated_file, entry: dict, digests: dict) -> str:
+        """
+        Stores one generated file, with the digests of the inputs it was
+        generated from, and tells clients watching the project about it.
+        The manifest entry decides the file's path and platform, whatever path
+        the model echoed in its header comment.
+        """
+        MobileApp.objects.update_or_create(
+            project=project,
+            file_path=entry['path'],
+            defaults={
+                'platform': entry['platform'],
+                'language': generated_file.language or entry['language'],
+                'code_snippet': generated_file.content,
+                'purpose': entry.get('purpose', ''),
+                'input_digests': digests,
             }
-            ```
-            """
-            
-            # In a real scenario, you'd parse `simulated_code_output` to extract code blocks
-            # and save them to actual files. For this response, we just acknowledge completion.
-            
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status = Project.ProjectStatus.COMPLETED
-                project.status_message = "Code generation complete. App is ready for download with integrated feedback features!"
-                # Potentially store a link to the generated code artifact here
-                project.save()
-
-            print(f"Code Generation complete for project {project_id}. Project is now marked as COMPLETED with new features.")
-
-        except Exception as e:
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status = Project.ProjectStatus.FAILED
-                project.status_message = f"Code generation failed: {e}"
-                project.save()
-            print(f"Error during code generation for project {project_id}: {e}")
-            raise
+        )
+        send_project_update(project.id, {
+            'event': 'file_generated',
+            'path': entry['path'],
+            'platform': entry['platform'],
+            'language': generated_file.language or entry['language'],
+        })
+        # Files land in bursts from parallel workers; coalesced to one write per window.
+        report_progress(project.id, f"Generated {entry['path']}")
+        return entry['path']
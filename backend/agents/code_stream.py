@@ -0,0 +1,104 @@
+import re
+import textwrap
+from dataclasses import dataclass
+
+FILE_HEADER_RE = re.compile(r'^\s*(?://|#|<!--)\s*File:\s*(?P<path>[^\s]+?)\s*(?:-->)?\s*$')
+
+# Platform a generated file belongs to, derived from its code fence language.
+LANGUAGE_PLATFORMS = {
+    'kotlin': 'Android',
+    'java': 'Android',
+    'groovy': 'Android',
+    'gradle': 'Android',
+    'swift': 'iOS',
+}
+
+
+@dataclass
+class GeneratedFile:
+    path: str
+    language: str
+    content: str
+
+    @property
+    def platform(self) -> str:
+        return LANGUAGE_PLATFORMS.get(self.language, 'Shared')
+
+
+class CodeBlockStreamParser:
+    """
+    Incrementally extracts "// File: path" code blocks from a streamed model response.
+
+    Text is fed in arbitrary chunks as it arrives. Only the current partial
+    line and the body of the file being read are held in memory; each file is
+    returned as soon as its closing fence is seen, so callers can persist it
+    before the rest of the response has been generated. Fenced blocks without
+    a file header (reasoning, directory trees) are discarded.
+    """
+    def __init__(self):
+        self._buffer = ''
+        self._in_block = False
+        self._language = ''
+        self._path = None
+        self._lines = []
+
+    def feed(self, chunk: str) -> list:
+        """Consumes a chunk of text and returns any files completed by it."""
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split('\n')
+        completed = []
+        for line in lines:
+            generated_file = self._consume_line(line)
+            if generated_file:
+                completed.append(generated_file)
+        return completed
+
+    def close(self) -> list:
+        """Flushes the trailing partial line and any block the response left unterminated."""
+        completed = []
+        if self._buffer:
+            generated_file = self._consume_line(self._buffer)
+            self._buffer = ''
+            if generated_file:
+                completed.append(generated_file)
+        if self._in_block and self._path:
+            completed.append(self._finish_block())
+        return completed
+
+    def _consume_line(self, line: str):
+        stripped = line.strip()
+        if not self._in_block:
+            if stripped.startswith('```'):
+                self._in_block = True
+                self._language = stripped[3:].strip().lower()
+                self._path = None
+                self._lines = []
+            return None
+
+        if stripped.startswith('```'):
+            if self._path:
+                return self._finish_block()
+            self._in_block = False
+            return None
+
+        if self._path is None and not self._lines:
+            match = FILE_HEADER_RE.match(line)
+            if match:
+                self._path = match.group('path')
+                return None
+            if not stripped:
+                return None
+        self._lines.append(line)
+        return None
+
+    def _finish_block(self) -> GeneratedFile:
+        generated_file = GeneratedFile(
+            path=self._path,
+            language=self._language or 'text',
+            content=textwrap.dedent('\n'.join(self._lines)).strip('\n') + '\n',
+        )
+        self._in_block = False
+        self._path = None
+        self._lines = []
+        return generated_file
+
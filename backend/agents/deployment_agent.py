@@ -1,8 +1,8 @@
 from .base_agent import BaseAgent
 from .prompts.super_prompts import DEVOPS_AGENT_PERSONA, DEVOPS_AGENT_GOAL
+from .model_registry import ANALYSIS_MODEL
 from apps.projects.models import Project
-from django.db import transaction
-import google.generativeai as genai
+from .project_status import update_project_status
 
 class DeploymentAgent(BaseAgent):
     """
@@ -12,9 +12,9 @@ class DeploymentAgent(BaseAgent):
         super().__init__(
             agent_name="CI/CD & DevOps Specialist",
             agent_persona=DEVOPS_AGENT_PERSONA,
-            goal=DEVOPS_AGENT_GOAL
+            goal=DEVOPS_AGENT_GOAL,
+            model_name=ANALYSIS_MODEL
         )
-        self.model = genai.GenerativeModel('gemini-1.5-pro')
 
     def execute(self, project_id: int):
         """
@@ -24,21 +24,20 @@ class DeploymentAgent(BaseAgent):
             project_id (int): The ID of the project to deploy.
         """
         print(f"Executing Deployment Agent for project {project_id}...")
-        try:
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                # Ensure the QA check was completed before deploying
-                if project.status != Project.ProjectStatus.QA_COMPLETE:
-                    raise Exception("Cannot deploy: QA check is not yet complete.")
-
-                project.status = Project.ProjectStatus.DEPLOYMENT_PENDING
-                project.status_message = "Preparing for deployment to production environment..."
-                project.save()
-
-        except Project.DoesNotExist:
+        project = Project.objects.filter(id=project_id).only('id', 'name', 'app_type').first()
+        if project is None:
             print(f"Error: Project with ID {project_id} not found.")
             return
 
+        # Deploying is only allowed once QA has passed; the check and the
+        # transition happen in the same UPDATE, so no row lock is needed.
+        if not update_project_status(
+            project_id, Project.ProjectStatus.DEPLOYMENT_PENDING,
+            "Preparing for deployment to production environment...",
+            from_statuses=[Project.ProjectStatus.QA_COMPLETE]
+        ):
+            raise Exception("Cannot deploy: QA check is not yet complete.")
+
         # Construct the task for the Gemini API
         task_description = f"""
         **MISSION: Simulate the CI/CD and Deployment Pipeline for a Mobile App.**
@@ -60,8 +59,7 @@ class DeploymentAgent(BaseAgent):
 
         full_prompt = self._generate_prompt(task_description)
         # In a real application, you would make the API call:
-        # response = self.model.generate_content(full_prompt)
-        # deployment_report = response.text
+        # deployment_report = self.generate_content(full_prompt)
 
         # For this simulation, we will create a representative report.
         deployment_report = f"""
@@ -88,23 +86,16 @@ class DeploymentAgent(BaseAgent):
         """
 
         try:
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status = Project.ProjectStatus.COMPLETED
-                project.status_message = "Deployment successful. Your app is live!"
-                project.deployment_platform = "Applaude" # Mark where it's 'hosted'
-                project.generated_code_path = f"https://cdn.applaude.ai/apps/{project.id}/app.apk"
-                project.save()
+            update_project_status(
+                project_id, Project.ProjectStatus.COMPLETED, "Deployment successful. Your app is live!",
+                deployment_url=f"https://cdn.applaude.ai/apps/{project.id}/app.apk",
+            )
 
             print(f"Deployment simulation complete for project {project_id}. Project is marked as COMPLETED.")
             return deployment_report
 
         except Exception as e:
             # Handle potential race conditions or other DB errors
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status = Project.ProjectStatus.FAILED
-                project.status_message = f"Deployment failed: {e}"
-                project.save()
+            update_project_status(project_id, Project.ProjectStatus.FAILED, f"Deployment failed: {e}")
             print(f"Error during final deployment update for project {project_id}: {e}")
             raise
@@ -1,9 +1,10 @@
 
+import json
 from .base_agent import BaseAgent
+from .model_registry import ANALYSIS_MODEL
+from .website_snapshot import design_context
 from apps.projects.models import Project
-from django.db import transaction
-import google.generativeai as genai
-import os
+from .project_status import update_project_status
 
 class DesignAgent(BaseAgent):
     """
@@ -13,9 +14,9 @@ class DesignAgent(BaseAgent):
         super().__init__(
             agent_name="Design",
             agent_persona="You are the 'Digital Design Agent,' an AI with a masterful eye for aesthetics and brand identity. You can look at any website and instantly identify its core color palette, understanding the role each color plays in the brand's visual language (e.g., primary, secondary, accent). Your output will be a precise JSON object containing hex codes.",
-            goal="To extract the primary, secondary, text (light/dark), and background branding colors from a user's website to ensure perfect brand consistency in the generated mobile app. If a specific color type cannot be confidently identified, provide a sensible fallback hex code (e.g., #FFFFFF for white, #000000 for black, #CCCCCC for gray). The output must be PURE JSON, with no introductory or concluding text."
+            goal="To extract the primary, secondary, text (light/dark), and background branding colors from a user's website to ensure perfect brand consistency in the generated mobile app. If a specific color type cannot be confidently identified, provide a sensible fallback hex code (e.g., #FFFFFF for white, #000000 for black, #CCCCCC for gray). The output must be PURE JSON, with no introductory or concluding text.",
+            model_name=ANALYSIS_MODEL # Using a more capable model for prompt engineering
         )
-        self.model = genai.GenerativeModel('gemini-1.5-pro') # Using a more capable model for prompt engineering
 
     def execute(self, project_id: int):
         """
@@ -25,15 +26,11 @@ class DesignAgent(BaseAgent):
             project_id (int): The ID of the project to analyze.
         """
         print(f"Executing Design Agent for project {project_id}...")
-        try:
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status_message = "Analyzing website for design elements and brand palette..."
-                project.status = Project.ProjectStatus.DESIGN_PENDING # Set status to pending
-                project.save()
-        except Project.DoesNotExist:
+        project = Project.objects.filter(id=project_id).only('id', 'source_url').first()
+        if project is None:
             print(f"Error: Project with ID {project_id} not found.")
             return
+        update_project_status(project_id, Project.ProjectStatus.DESIGN_PENDING, "Analyzing website for design elements and brand palette...")
 
         task_description = f"""
         **Objective:** Extract the brand color palette from the website at `{project.source_url}`.
@@ -46,6 +43,7 @@ class DesignAgent(BaseAgent):
         5.  **Identify Dark Text Color:** What color is used for text that sits on light backgrounds, ensuring high contrast and readability? Provide its hex code. If not explicit, assume a common dark text color.
         6.  **Identify Background Color:** What is the most prevalent background color of the main content areas? Provide its hex code. If multiple backgrounds exist, choose the most dominant one for content.
         7.  **Final JSON Output:** Based on the above analysis, construct a JSON object containing the identified colors.
+        {design_context(project.source_url)}
 
         **Output Requirements:**
         * The response MUST be a valid JSON object.
@@ -72,8 +70,7 @@ class DesignAgent(BaseAgent):
         try:
             # Simulate API call with a robust prompt
             # In a real scenario, this would involve web scraping/color analysis
-            # response = self.model.generate_content(full_prompt)
-            # generated_json_text = response.text
+            # generated_json_text = self.generate_content(full_prompt)
             # parsed_palette = json.loads(generated_json_text)
 
             # For demonstration, use a placeholder that adheres to the new prompt's structure
@@ -107,20 +104,14 @@ class DesignAgent(BaseAgent):
             else:
                 raise ValueError("Could not extract JSON from simulated response.")
 
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.brand_palette = parsed_palette
-                project.status = Project.ProjectStatus.DESIGN_COMPLETE
-                project.status_message = "Design analysis complete. Brand palette generated."
-                project.save()
+            update_project_status(
+                project_id, Project.ProjectStatus.DESIGN_COMPLETE, "Design analysis complete. Brand palette generated.",
+                brand_palette=parsed_palette,
+            )
 
             print(f"Design analysis complete for project {project_id}. Palette extracted: {parsed_palette}")
 
         except Exception as e:
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status = Project.ProjectStatus.FAILED
-                project.status_message = f"Design analysis failed: {e}"
-                project.save()
+            update_project_status(project_id, Project.ProjectStatus.FAILED, f"Design analysis failed: {e}")
             print(f"Error during design analysis for project {project_id}: {e}")
             raise
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import google.generativeai as genai
+from django.conf import settings
+
+# Durations of the pipeline stages that are still simulated, as (min, max) seconds.
+SIMULATED_STAGE_SECONDS = {
+    'qa': (15, 30),
+    'security_scan': (10, 20),
+    'deployment': (25, 50),
+}
+
+# Extensions used for the canned files of each platform.
+FAKE_PLATFORM_FILES = {
+    'Android': ('kotlin', 'app/src/main/java/com/applause/app/{name}.kt'),
+    'iOS': ('swift', 'ApplauseApp/{name}.swift'),
+}
+FAKE_FILE_NAMES = ('Theme', 'MainScreen', 'DetailScreen', 'SurveyOverlay', 'AnalyticsClient', 'Repository', 'Models', 'Settings')
+# The inputs the canned files say they depend on; other files only need the persona.
+FAKE_FILE_DEPENDENCIES = {
+    'Theme': ['brand_palette'],
+    'SurveyOverlay': ['ux_survey', 'pmf_survey'],
+}
+
+_configure_lock = threading.Lock()
+_configured_pid = None
+
+
+def get_backend_name() -> str:
+    return getattr(settings, 'LLM_BACKEND', 'gemini')
+
+
+def build_gemini_model(model_name: str):
+    """
+    Builds a Gemini client, configuring the SDK once per process.
+    """
+    global _configured_pid
+    with _configure_lock:
+        if _configured_pid != os.getpid():
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY not found in environment variables.")
+            genai.configure(api_key=api_key)
+            _configured_pid = os.getpid()
+    return genai.GenerativeModel(model_name)
+
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    """
+    Log-normal latency described by its median and 95th percentile, in seconds.
+    """
+    median: float
+    p95: float
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        sigma = math.log(max(self.p95, self.median) / self.median) / 1.645
+        return rng.lognormvariate(math.log(self.median), sigma)
+
+
+def fake_latency() -> LatencyDistribution:
+    return LatencyDistribution(
+        median=getattr(settings, 'LLM_FAKE_LATENCY_MEDIAN_SECONDS', 0.05),
+        p95=getattr(settings, 'LLM_FAKE_LATENCY_P95_SECONDS', 0.25),
+    )
+
+
+def simulated_stage_seconds(stage: str, key: str = '') -> float:
+    """
+    How long a simulated stage should take. The fake backend draws from its
+    seeded latency distribution so benchmark runs are reproducible.
+
+    Args:
+        stage (str): A key of `SIMULATED_STAGE_SECONDS`.
+        key (str): Extra seed material, usually the project ID.
+    """
+    if get_backend_name() == 'fake':
+        rng = random.Random(f"{getattr(settings, 'LLM_FAKE_SEED', 0)}:{stage}:{key}")
+        return fake_latency().sample(rng)
+    return random.randint(*SIMULATED_STAGE_SECONDS[stage])
+
+
+class FakeResponse:
+    """The subset of a Gemini response the agents read."""
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+def _canned_palette(prompt, match, rng):
+    return json.dumps({
+        "primary": "#0062FF", "secondary": "#FFC107", "text_light": "#FFFFFF",
+        "text_dark": "#212121", "background": "#F5F5F5",
+    })
+
+
+def _canned_manifest(prompt, match, rng):
+    app_type_match = re.search(r'\*\*Target Platform:\*\*\s*(\w+)', prompt)
+    app_type = app_type_match.group(1) if app_type_match else 'BOTH'
+    platforms = {'ANDROID': ['Android'], 'IOS': ['iOS']}.get(app_type, ['Android', 'iOS'])
+    files_per_platform = getattr(settings, 'LLM_FAKE_FILES_PER_PLATFORM', 4)
+    files = []
+    for platform in platforms:
+        language, pattern = FAKE_PLATFORM_FILES[platform]
+        for index in range(files_per_platform):
+            name = FAKE_FILE_NAMES[index % len(FAKE_FILE_NAMES)] + (str(index) if index >= len(FAKE_FILE_NAMES) else '')
+            files.append({
+                "platform": platform,
+                "path": pattern.format(name=name),
+                "language": language,
+                "purpose": f"Canned {name} file.",
+                "depends_on": FAKE_FILE_DEPENDENCIES.get(name, ['persona']),
+            })
+    return json.dumps({"files": files})
+
+
+def _canned_file(prompt, match, rng):
+    path = match.group('path')
+    language = 'swift' if path.endswith('.swift') else 'kotlin'
+    body = "\n".join(f"// {_filler(rng, 8)}" for _ in range(rng.randint(20, 60)))
+    return f"```{language}\n// File: {path}\n{body}\n```\n"
+
+
+def _canned_text(prompt, match, rng):
+    return "\n\n".join(_filler(rng, 40) for _ in range(rng.randint(3, 6)))
+
+
+def _filler(rng, words):
+    vocabulary = ('user', 'app', 'brand', 'feedback', 'screen', 'survey', 'mobile', 'persona', 'content', 'goal')
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+# Ordered (pattern, responder) pairs matched against the prompt text. The
+# patterns follow the prompts built by the agents and `agents.tasks`.
+DEFAULT_RESPONDERS = (
+    (re.compile(r'Return ONLY a JSON object of the form `\{"files"'), _canned_manifest),
+    (re.compile(r'source code for `(?P<path>[^`]+)` ONLY'), _canned_file),
+    (re.compile(r'JSON object for a brand color palette', re.IGNORECASE), _canned_palette),
+    (re.compile(r''), _canned_text),
+)
+
+
+class FakeModel:
+    """
+    Drop-in stand-in for `genai.GenerativeModel` that returns canned outputs
+    after a simulated latency.
+
+    Both the output and the latency are derived from the seed, the model name
+    and the prompt, so a given prompt behaves identically across runs and
+    regardless of how calls are interleaved.
+    """
+    def __init__(self, model_name: str, latency: LatencyDistribution = None, seed=None, responders=DEFAULT_RESPONDERS):
+        """
+        Args:
+            model_name (str): The name the model is registered under.
+            latency (LatencyDistribution): Per-call latency; defaults to the LLM_FAKE_* settings.
+            seed: Seed for outputs and latencies; defaults to LLM_FAKE_SEED.
+            responders: Ordered (compiled pattern, callable) pairs producing the canned text.
+        """
+        self.model_name = model_name
+        self.latency = latency or fake_latency()
+        self.seed = getattr(settings, 'LLM_FAKE_SEED', 0) if seed is None else seed
+        self.responders = responders
+
+    def _respond(self, prompt):
+        prompt = str(prompt)
+        rng = random.Random(f"{self.seed}:{self.model_name}:{prompt}")
+        delay = self.latency.sample(rng)
+        for pattern, responder in self.responders:
+            match = pattern.search(prompt)
+            if match:
+                return responder(prompt, match, rng), delay
+        return '', delay
+
+    def generate_content(self, prompt, stream: bool = False):
+        text, delay = self._respond(prompt)
+        if stream:
+            return self._stream(text, delay)
+        time.sleep(delay)
+        return FakeResponse(text)
+
+    def _stream(self, text: str, delay: float, chunk_size: int = 64):
+        chunks = [text[start:start + chunk_size] for start in range(0, len(text), chunk_size)] or ['']
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield FakeResponse(chunk)
+
+    async def generate_content_async(self, prompt):
+        text, delay = self._respond(prompt)
+        await asyncio.sleep(delay)
+        return FakeResponse(text)
+
+
+BACKENDS = {
+    'gemini': build_gemini_model,
+    'fake': FakeModel,
+}
+
+
+def build_model(model_name: str):
+    """
+    Builds a client for a model using the backend selected by `LLM_BACKEND`.
+    """
+    backend = get_backend_name()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend}'. Choose one of: {', '.join(BACKENDS)}.")
+    return BACKENDS[backend](model_name)
@@ -0,0 +1,121 @@
+import hashlib
+import time
+
+from django.conf import settings
+
+from applaude_api.redis_client import get_redis
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of model responses shared by every agent and task.
+
+    Entries are keyed by the model name and a SHA-256 of the full prompt, so
+    the same website analyzed for two projects reuses one response. Entries
+    expire a TTL after they were last read or written, and a sorted set of
+    the same last-access times lets the cache
+    evict the least recently used entries once it grows past its size cap.
+    Redis errors never fail a generation; the cache simply reports a miss.
+    """
+    def __init__(self, namespace: str = 'llm:cache', ttl: int = None, max_entries: int = None,
+                 max_value_bytes: int = None, connection=None):
+        """
+        Args:
+            namespace (str): Prefix for every Redis key owned by the cache.
+            ttl (int): Lifetime of an entry in seconds.
+            max_entries (int): Number of entries kept before LRU eviction starts.
+            max_value_bytes (int): Responses larger than this are not cached.
+            connection: Optional Redis client; defaults to the shared connection.
+        """
+        self.namespace = namespace
+        self.ttl = ttl or getattr(settings, 'LLM_CACHE_TTL_SECONDS', 86400)
+        self.max_entries = max_entries or getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 10000)
+        self.max_value_bytes = max_value_bytes or getattr(settings, 'LLM_CACHE_MAX_VALUE_BYTES', 1024 * 1024)
+        self._connection = connection
+
+    @property
+    def redis(self):
+        return self._connection or get_redis()
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'LLM_CACHE_ENABLED', True)
+
+    @staticmethod
+    def make_digest(model_name: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _entry_key(self, digest: str) -> str:
+        return f"{self.namespace}:entry:{digest}"
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.namespace}:lru"
+
+    @property
+    def _stats_key(self) -> str:
+        return f"{self.namespace}:stats"
+
+    def get(self, model_name: str, prompt: str):
+        """Returns the cached response text, or None on a miss."""
+        if not self.enabled:
+            return None
+        digest = self.make_digest(model_name, prompt)
+        try:
+            value = self.redis.get(self._entry_key(digest))
+            pipe = self.redis.pipeline()
+            if value is None:
+                pipe.hincrby(self._stats_key, 'misses', 1)
+            else:
+                pipe.hincrby(self._stats_key, 'hits', 1)
+                # The TTL restarts with the access time, so an index member
+                # older than the TTL always belongs to an expired entry.
+                pipe.expire(self._entry_key(digest), self.ttl)
+                pipe.zadd(self._index_key, {digest: time.time()})
+            pipe.execute()
+            return value
+        except Exception as e:
+            print(f"LLM cache lookup failed: {e}")
+            return None
+
+    def set(self, model_name: str, prompt: str, text: str):
+        """Stores a response and evicts the least recently used entries over the cap."""
+        if not self.enabled or not text or len(text.encode('utf-8')) > self.max_value_bytes:
+            return
+        digest = self.make_digest(model_name, prompt)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.set(self._entry_key(digest), text, ex=self.ttl)
+            pipe.zadd(self._index_key, {digest: time.time()})
+            pipe.execute()
+            self._evict()
+        except Exception as e:
+            print(f"LLM cache store failed: {e}")
+
+    def _evict(self):
+        # Index members whose entry has already expired are dropped first.
+        self.redis.zremrangebyscore(self._index_key, '-inf', time.time() - self.ttl)
+        overflow = self.redis.zcard(self._index_key) - self.max_entries
+        if overflow <= 0:
+            return
+        victims = self.redis.zrange(self._index_key, 0, overflow - 1)
+        if not victims:
+            return
+        pipe = self.redis.pipeline()
+        pipe.delete(*(self._entry_key(digest) for digest in victims))
+        pipe.zrem(self._index_key, *victims)
+        pipe.hincrby(self._stats_key, 'evictions', len(victims))
+        pipe.execute()
+
+    def stats(self) -> dict:
+        """Returns hit/miss/eviction counters and the current number of entries."""
+        counters = self.redis.hgetall(self._stats_key)
+        return {
+            'hits': int(counters.get('hits', 0)),
+            'misses': int(counters.get('misses', 0)),
+            'evictions': int(counters.get('evictions', 0)),
+            'size': self.redis.zcard(self._index_key),
+        }
+
+
+llm_cache = LLMResponseCache()
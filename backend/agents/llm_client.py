@@ -0,0 +1,176 @@
+import asyncio
+import os
+import random
+import threading
+
+from django.conf import settings
+
+from .llm_cache import llm_cache
+from .llm_singleflight import single_flight
+from .model_registry import get_model
+
+
+class LLMClient:
+    """
+    Asyncio-based client for the generative model shared by the agent tasks.
+
+    A single event loop runs in a background thread for the lifetime of the
+    worker process and the model comes from the process-wide registry, so
+    the underlying gRPC channel is reused across calls instead of being
+    rebuilt per request. Concurrent calls are bounded by a
+    semaphore and failed calls are retried with exponential backoff and full
+    jitter, without blocking the loop while waiting.
+    """
+    def __init__(self, model_name: str, max_concurrency: int = None, max_retries: int = None,
+                 backoff_base: float = None, backoff_max: float = None):
+        """
+        Args:
+            model_name (str): The name of the generative model to call.
+            max_concurrency (int): Maximum number of in-flight calls per process.
+            max_retries (int): Number of attempts before an error is raised.
+            backoff_base (float): Base delay in seconds for the backoff schedule.
+            backoff_max (float): Upper bound in seconds for a single backoff delay.
+        """
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency or getattr(settings, 'LLM_MAX_CONCURRENCY', 4)
+        self.max_retries = max_retries or getattr(settings, 'LLM_MAX_RETRIES', 3)
+        self.backoff_base = backoff_base or getattr(settings, 'LLM_BACKOFF_BASE_SECONDS', 1.0)
+        self.backoff_max = backoff_max or getattr(settings, 'LLM_BACKOFF_MAX_SECONDS', 30.0)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._model = None
+
+    def _ensure_started(self):
+        """
+        Lazily starts the background event loop. Celery's prefork pool forks
+        after import, so the loop is (re)created per process.
+        """
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return self._loop
+
+            try:
+                self._model = get_model(self.model_name)
+            except ValueError as e:
+                raise ConnectionError("Generative AI model is not configured.") from e
+
+            self._loop = asyncio.new_event_loop()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._thread = threading.Thread(
+                target=self._loop.run_forever,
+                name=f"llm-client-{self.model_name}",
+                daemon=True,
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+            return self._loop
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: uniform(0, min(max, base * 2^attempt))."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def agenerate(self, prompt: str) -> str:
+        """
+        Calls the model once the concurrency limit allows it, retrying on failure.
+        Returns the generated text or raises the last exception.
+        """
+        for attempt in range(self.max_retries):
+            try:
+                async with self._semaphore:
+                    response = await self._model.generate_content_async(prompt)
+                # Basic validation of response structure
+                if response and response.text:
+                    return response.text
+                raise ValueError("Received an empty or invalid response from the AI model.")
+            except Exception as e:
+                print(f"AI generation attempt {attempt + 1} failed: {e}")
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                else:
+                    raise
+
+    def _submit(self, coro):
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def generate(self, prompt: str) -> str:
+        """Synchronous entry point for Celery tasks and agents."""
+        return self.generate_many([prompt])[0]
+
+    def generate_many(self, prompts: list) -> list:
+        """
+        Synchronous entry point that fans independent prompts out concurrently.
+
+        Prompts already answered for this model are served from the shared
+        response cache. Of the misses, prompts that another worker is already
+        sending are awaited through the single-flight channel instead of
+        being sent again; only the rest reach the provider.
+        """
+        results = [llm_cache.get(self.model_name, prompt) for prompt in prompts]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+
+        # Started before any single-flight lock is taken, so a client that
+        # cannot start never leaves followers waiting on a lock it holds.
+        self._ensure_started()
+        keys = {i: llm_cache.make_digest(self.model_name, prompts[i]) for i in misses}
+        leading = {}
+        following = []
+        for i in misses:
+            token = single_flight.acquire(keys[i])
+            if token:
+                leading[i] = token
+            else:
+                following.append(i)
+
+        # Each leading call publishes as soon as it finishes, so two workers that
+        # lead one prompt and follow another never wait on each other.
+        futures = {}
+        try:
+            for i, token in leading.items():
+                futures[i] = self._submit(self._lead(prompts[i], keys[i], token))
+        except Exception:
+            for i, token in leading.items():
+                if i not in futures:
+                    single_flight.fail(keys[i], token)
+            raise
+
+        # Prompts whose leader failed or timed out are sent from here, side
+        # by side like the leading ones.
+        for i in following:
+            results[i] = single_flight.wait(keys[i])
+            if results[i] is None:
+                futures[i] = self._submit(self._fallback(prompts[i]))
+
+        for i, future in futures.items():
+            results[i] = future.result()
+        return results
+
+    async def _lead(self, prompt: str, key: str, token: str) -> str:
+        """
+        Makes a call this worker leads and settles it for the followers. The
+        cache and single-flight writes are blocking Redis calls, so they run
+        in the loop's executor rather than stalling the other calls.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            text = await self.agenerate(prompt)
+        except Exception:
+            await loop.run_in_executor(None, single_flight.fail, key, token)
+            raise
+        await loop.run_in_executor(None, self._settle, prompt, key, token, text)
+        return text
+
+    async def _fallback(self, prompt: str) -> str:
+        """Makes a call whose leader gave up, and caches the answer."""
+        text = await self.agenerate(prompt)
+        await asyncio.get_running_loop().run_in_executor(None, llm_cache.set, self.model_name, prompt, text)
+        return text
+
+    def _settle(self, prompt: str, key: str, token: str, text: str):
+        llm_cache.set(self.model_name, prompt, text)
+        single_flight.publish(key, token, text)
@@ -0,0 +1,149 @@
+import time
+import uuid
+
+from django.conf import settings
+
+from applaude_api.redis_client import get_redis
+
+# Deletes the lock only if it is still held by the caller's token.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+DONE = 'done'
+FAILED = 'failed'
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight model calls across Celery workers.
+
+    The first worker to take the Redis lock for a prompt becomes the leader and
+    calls the provider. Every other worker subscribes to the prompt's result
+    channel and reuses the leader's answer. If the leader fails, crashes or
+    takes longer than the wait timeout, followers fall back to calling the
+    provider themselves.
+    """
+    def __init__(self, namespace: str = 'llm:inflight', lock_ttl: int = None, wait_timeout: int = None,
+                 result_ttl: int = 60, connection=None):
+        """
+        Args:
+            namespace (str): Prefix for every Redis key and channel owned by the coalescer.
+            lock_ttl (int): Seconds after which a crashed leader's lock expires.
+            wait_timeout (int): Seconds a follower waits before calling the provider itself.
+            result_ttl (int): Seconds a leader's result stays readable for late followers.
+            connection: Optional Redis client; defaults to the shared connection.
+        """
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl or getattr(settings, 'LLM_SINGLE_FLIGHT_LOCK_SECONDS', 180)
+        self.wait_timeout = wait_timeout or getattr(settings, 'LLM_SINGLE_FLIGHT_WAIT_SECONDS', 120)
+        self.result_ttl = result_ttl
+        self._connection = connection
+
+    @property
+    def redis(self):
+        return self._connection or get_redis()
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'LLM_SINGLE_FLIGHT_ENABLED', True)
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.namespace}:lock:{key}"
+
+    def _result_key(self, key: str) -> str:
+        return f"{self.namespace}:result:{key}"
+
+    def _channel(self, key: str) -> str:
+        return f"{self.namespace}:channel:{key}"
+
+    def acquire(self, key: str):
+        """
+        Tries to become the leader for a key.
+
+        Returns a token when the caller should make the call itself (including
+        when coalescing is disabled or Redis is unavailable), or None when
+        another worker is already making it.
+        """
+        token = uuid.uuid4().hex
+        if not self.enabled:
+            return token
+        try:
+            # A result published moments ago is reused rather than re-requested.
+            if self.redis.exists(self._result_key(key)):
+                return None
+            if self.redis.set(self._lock_key(key), token, nx=True, ex=self.lock_ttl):
+                return token
+            return None
+        except Exception as e:
+            print(f"Single-flight lock failed, calling the provider directly: {e}")
+            return token
+
+    def _release(self, key: str, token: str):
+        self.redis.eval(RELEASE_LOCK_SCRIPT, 1, self._lock_key(key), token)
+
+    def publish(self, key: str, token: str, value: str):
+        """Hands the leader's result to every waiting follower and releases the lock."""
+        if not self.enabled:
+            return
+        try:
+            self.redis.set(self._result_key(key), value, ex=self.result_ttl)
+            self.redis.publish(self._channel(key), DONE)
+            self._release(key, token)
+        except Exception as e:
+            print(f"Single-flight publish failed: {e}")
+
+    def fail(self, key: str, token: str):
+        """Tells followers the leader failed so they fall back immediately."""
+        if not self.enabled:
+            return
+        try:
+            self.redis.publish(self._channel(key), FAILED)
+            self._release(key, token)
+        except Exception as e:
+            print(f"Single-flight failure notification failed: {e}")
+
+    def wait(self, key: str):
+        """
+        Waits for the leader's result.
+
+        Returns the result text, or None if the caller should fall back to
+        calling the provider (leader failed, vanished, or timed out).
+        """
+        try:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self._channel(key))
+        except Exception as e:
+            print(f"Single-flight subscribe failed: {e}")
+            return None
+
+        try:
+            deadline = time.monotonic() + self.wait_timeout
+            while True:
+                # Checked on every pass: the leader may have finished before we
+                # subscribed, or its lock may have expired without a result.
+                value = self.redis.get(self._result_key(key))
+                if value is not None:
+                    return value
+                if not self.redis.exists(self._lock_key(key)):
+                    # The leader may have published between the two reads.
+                    return self.redis.get(self._result_key(key))
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"Timed out waiting for in-flight LLM request {key}.")
+                    return None
+                message = pubsub.get_message(timeout=min(remaining, 1.0))
+                if message and message['data'] == FAILED:
+                    return None
+        except Exception as e:
+            print(f"Single-flight wait failed: {e}")
+            return None
+        finally:
+            pubsub.close()
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,157 @@
+import json
+import resource
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+
+from apps.projects.models import Project
+from agents.pipeline import ANALYSIS_PIPELINE, BUILD_PIPELINE, levels
+from agents.stage_events import percentile
+
+# Every stage of the analysis and build pipelines, in scheduling order. Stages
+# run one at a time so each can be timed and its queries counted on its own.
+PIPELINE_STAGES = tuple(
+    stage for pipeline in (ANALYSIS_PIPELINE, BUILD_PIPELINE) for level in levels(pipeline) for stage in level
+)
+
+
+BENCHMARK_PAGE = """<html><head><title>Benchmark shop {path}</title>
+<style>body {{ background: #F5F5F5; color: #212121; }} .cta {{ background: #0062FF; }}</style></head>
+<body><h1>Benchmark shop</h1><p>Products, delivery and support for {path}.</p></body></html>"""
+
+
+class BenchmarkSiteHandler(BaseHTTPRequestHandler):
+    """Serves the project websites locally so the fetch stage never leaves the machine."""
+    def do_GET(self):
+        body = BENCHMARK_PAGE.format(path=self.path).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives projects through the agent pipeline against the fake LLM backend and a '
+        'throwaway test database, and reports throughput, per-stage latency, query counts and peak RSS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=10, help='Number of projects to run through the pipeline.')
+        parser.add_argument('--app-type', default=Project.AppType.BOTH, choices=Project.AppType.values)
+        parser.add_argument('--deployment-option', default=Project.DeploymentOption.APPLAUSE, choices=Project.DeploymentOption.values)
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the fake backend outputs and latencies.')
+        parser.add_argument('--latency-median', type=float, default=0.05, help='Median fake LLM latency in seconds.')
+        parser.add_argument('--latency-p95', type=float, default=0.25, help='95th percentile fake LLM latency in seconds.')
+        parser.add_argument('--files-per-platform', type=int, default=4, help='Files in each canned code generation plan.')
+        parser.add_argument('--json', dest='json_path', help='Also write the report to this file as JSON.')
+
+    def handle(self, *args, **options):
+        benchmark_settings = override_settings(
+            LLM_BACKEND='fake',
+            LLM_FAKE_SEED=options['seed'],
+            LLM_FAKE_LATENCY_MEDIAN_SECONDS=options['latency_median'],
+            LLM_FAKE_LATENCY_P95_SECONDS=options['latency_p95'],
+            LLM_FAKE_FILES_PER_PLATFORM=options['files_per_platform'],
+            # Every run must pay for its model calls, and no broker or Redis is needed.
+            LLM_CACHE_ENABLED=False,
+            LLM_SINGLE_FLIGHT_ENABLED=False,
+            PROJECT_PROGRESS_COALESCE_SECONDS=0,
+            CHANNEL_LAYERS={},
+            WEBSITE_FETCH_ALLOWED_NETWORKS=['127.0.0.1/32'],
+            # Celery reads these through its CELERY_ settings namespace. Chords
+            # still read their results back from the backend when eager.
+            CELERY_TASK_ALWAYS_EAGER=True,
+            CELERY_TASK_EAGER_PROPAGATES=True,
+            CELERY_BROKER_URL='memory://',
+            CELERY_RESULT_BACKEND='cache+memory://',
+        )
+
+        site = ThreadingHTTPServer(('127.0.0.1', 0), BenchmarkSiteHandler)
+        threading.Thread(target=site.serve_forever, daemon=True).start()
+        site_url = f"http://127.0.0.1:{site.server_port}"
+
+        setup_test_environment()
+        old_db_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with benchmark_settings:
+                report = self.run_benchmark(options, site_url)
+        finally:
+            site.shutdown()
+            site.server_close()
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+            teardown_test_environment()
+
+        self.print_report(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+
+    def run_benchmark(self, options, site_url):
+        owner = get_user_model().objects.create_user('benchmark@applaude.ai', 'benchmark')
+        timings = {stage.name: [] for stage in PIPELINE_STAGES}
+        queries = {stage.name: [] for stage in PIPELINE_STAGES}
+        failed = 0
+
+        started = time.perf_counter()
+        for index in range(options['projects']):
+            project = Project.objects.create(
+                owner=owner,
+                name=f"Benchmark project {index}",
+                source_url=f"{site_url}/benchmark/{index}",
+                app_type=options['app_type'],
+                deployment_option=options['deployment_option'],
+            )
+            try:
+                for stage in PIPELINE_STAGES:
+                    stage_started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as captured:
+                        stage.task.apply(args=(project.id,), throw=True)
+                    timings[stage.name].append(time.perf_counter() - stage_started)
+                    queries[stage.name].append(len(captured))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Project {index} failed: {e}")
+        elapsed = time.perf_counter() - started
+
+        completed = options['projects'] - failed
+        return {
+            'projects': options['projects'],
+            'failed': failed,
+            'elapsed_seconds': round(elapsed, 3),
+            'projects_per_hour': round(completed / elapsed * 3600, 1) if elapsed else 0.0,
+            # ru_maxrss is reported in kilobytes on Linux.
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'stages': {
+                name: {
+                    'runs': len(timings[name]),
+                    'p50_ms': round(percentile(timings[name], 50) * 1000, 1),
+                    'p95_ms': round(percentile(timings[name], 95) * 1000, 1),
+                    'queries_mean': round(statistics.mean(queries[name]), 1),
+                    'queries_max': max(queries[name]),
+                }
+                for name in (stage.name for stage in PIPELINE_STAGES) if timings[name]
+            },
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['projects']} projects ({report['failed']} failed) in {report['elapsed_seconds']}s: "
+            f"{report['projects_per_hour']} projects/hour, peak RSS {report['peak_rss_mb']} MB"
+        )
+        self.stdout.write(f"{'stage':<18}{'runs':>6}{'p50 ms':>10}{'p95 ms':>10}{'queries':>10}{'max q':>8}")
+        for name, stage in report['stages'].items():
+            self.stdout.write(
+                f"{name:<18}{stage['runs']:>6}{stage['p50_ms']:>10}{stage['p95_ms']:>10}"
+                f"{stage['queries_mean']:>10}{stage['queries_max']:>8}"
+            )
@@ -1,10 +1,10 @@
 # File: backend/agents/market_analyst_agent.py
 from .base_agent import BaseAgent
 from .prompts.super_prompts import MARKET_ANALYST_PERSONA, MARKET_ANALYST_GOAL
+from .model_registry import ANALYSIS_MODEL
+from .website_snapshot import content_context
 from apps.projects.models import Project
-from django.db import transaction
-import google.generativeai as genai
-import os
+from .project_status import update_project_status
 
 class MarketAnalystAgent(BaseAgent):
     """
@@ -14,9 +14,9 @@ class MarketAnalystAgent(BaseAgent):
         super().__init__(
             agent_name="Market Analyst",
             agent_persona=MARKET_ANALYST_PERSONA,
-            goal=MARKET_ANALYST_GOAL
+            goal=MARKET_ANALYST_GOAL,
+            model_name=ANALYSIS_MODEL # Using a more capable model for prompt engineering
         )
-        self.model = genai.GenerativeModel('gemini-1.5-pro') # Using a more capable model for prompt engineering
 
     def execute(self, project_id: int):
         """
@@ -27,15 +27,11 @@ class MarketAnalystAgent(BaseAgent):
             project_id (int): The ID of the project to analyze.
         """
         print(f"Executing Market Analyst Agent for project {project_id}...")
-        try:
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status_message = "Initiating deep market and website analysis..."
-                project.status = Project.ProjectStatus.ANALYSIS_PENDING
-                project.save()
-        except Project.DoesNotExist:
+        project = Project.objects.filter(id=project_id).only('id', 'source_url').first()
+        if project is None:
             print(f"Error: Project with ID {project_id} not found.")
             return
+        update_project_status(project_id, Project.ProjectStatus.ANALYSIS_PENDING, "Initiating deep market and website analysis...")
 
         # 1. Construct the detailed task for the Gemini API, emphasizing comprehensive analysis
         task_description = f"""
@@ -50,6 +46,8 @@ class MarketAnalystAgent(BaseAgent):
         -   **Monetization/Value Proposition:** How does the website generate value or revenue? What is its unique selling proposition?
         -   **Implicit Codebase Insights (from user-facing experience):** While not analyzing raw code, infer potential underlying technology characteristics based on observable features (e.g., dynamic content suggests API interactions, complex forms imply robust backend).
 
+        {content_context(project.source_url)}
+
         **Deliverable:** Based on this exhaustive analysis, generate a comprehensive, highly detailed, and actionable user persona document. The document MUST be formatted in clean Markdown and include a memorable and representative name for the persona (e.g., 'Savvy Sarah', 'Tech-Forward Tom'). Emphasize how the mobile app can uniquely solve their problems or enhance their experience beyond the current website.
         """
         
@@ -60,8 +58,7 @@ class MarketAnalystAgent(BaseAgent):
             # In a final production version, this would be an actual API call,
             # potentially integrated with web scraping tools or simulated data inputs
             # based on real-world analysis.
-            # response = self.model.generate_content(full_prompt)
-            # persona_document = response.text
+            # persona_document = self.generate_content(full_prompt)
             
             # For now, we use a more detailed placeholder response that reflects
             # the depth of analysis requested.
@@ -101,20 +98,14 @@ A dedicated mobile app for {project.source_url} would truly 'wow' Diana by:
 * **Brand Loyalty:** Deepening her connection to the brand through a premium, always-available experience.
 """
 
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.user_persona_document = persona_document
-                project.status = Project.ProjectStatus.ANALYSIS_COMPLETE
-                project.status_message = "Market analysis complete. Comprehensive user persona generated."
-                project.save()
+            update_project_status(
+                project_id, Project.ProjectStatus.ANALYSIS_COMPLETE, "Market analysis complete. Comprehensive user persona generated.",
+                user_persona_document=persona_document,
+            )
             
             print(f"Market Analysis complete for project {project_id}. Persona generated reflecting deep insights.")
             
         except Exception as e:
-            with transaction.atomic():
-                project = Project.objects.select_for_update().get(id=project_id)
-                project.status = Project.ProjectStatus.FAILED
-                project.status_message = f"Market analysis failed: {e}"
-                project.save()
+            update_project_status(project_id, Project.ProjectStatus.FAILED, f"Market analysis failed: {e}")
             print(f"Error during market analysis for project {project_id}: {e}")
             raise
@@ -0,0 +1,68 @@
+import os
+import threading
+
+from .llm_backends import build_model, get_backend_name
+
+# Models used by the agents and tasks. Every one of them is warmed once per
+# worker process so no task pays for client setup on its hot path.
+DEFAULT_MODEL = 'gemini-pro'
+ANALYSIS_MODEL = 'gemini-1.5-pro'
+TASK_MODEL = 'gemini-1.5-pro-latest'
+CODE_GEN_MODEL = 'google/gemini-pro-2.5-experimental'
+
+WARM_MODELS = (DEFAULT_MODEL, ANALYSIS_MODEL, TASK_MODEL, CODE_GEN_MODEL)
+
+_lock = threading.Lock()
+_models = {}
+_pid = None
+
+
+def _process_models() -> dict:
+    # Clients built in a parent process hold sockets that must not be shared
+    # with forked children, so each process starts with an empty registry.
+    global _pid
+    if _pid != os.getpid():
+        _models.clear()
+        _pid = os.getpid()
+    return _models
+
+
+def get_model(model_name: str = DEFAULT_MODEL):
+    """
+    Returns the process-wide client for a model, building it with the
+    backend selected by `LLM_BACKEND` on first use.
+
+    Args:
+        model_name (str): The name of the generative model.
+    """
+    key = (get_backend_name(), model_name)
+    with _lock:
+        models = _process_models()
+        model = models.get(key)
+        if model is None:
+            model = build_model(model_name)
+            models[key] = model
+        return model
+
+
+def register_model(model_name: str, model):
+    """
+    Installs a client for a model name under the current backend, replacing
+    any existing one. Used to inject a stand-in model in tests.
+    """
+    with _lock:
+        _process_models()[(get_backend_name(), model_name)] = model
+
+
+def warm(model_names=WARM_MODELS):
+    """
+    Builds the clients for the given models ahead of the first task.
+    Failures are reported but never prevent the worker from starting.
+    """
+    for model_name in model_names:
+        try:
+            get_model(model_name)
+        except Exception as e:
+            print(f"Could not warm model {model_name}: {e}")
+            return
+    print(f"AI models configured successfully: {', '.join(model_names)}")
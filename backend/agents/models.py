@@ -0,0 +1,121 @@
+import gzip
+from django.db import models
+from apps.projects.models import Project
+
+
+class PromptMetric(models.Model):
+    """
+    Size of one prompt built by an agent, before and after budget trimming.
+    """
+    agent_name = models.CharField(max_length=100, db_index=True)
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name='prompt_metrics')
+    budget_tokens = models.PositiveIntegerField()
+    raw_tokens = models.PositiveIntegerField(help_text="Estimated input tokens before trimming.")
+    input_tokens = models.PositiveIntegerField(help_text="Estimated input tokens actually sent.")
+    section_tokens = models.JSONField(default=dict)
+    trimmed_sections = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.agent_name}: {self.input_tokens}/{self.budget_tokens} tokens"
+
+
+class ProjectStageEvent(models.Model):
+    """
+    One entry in a project's append-only pipeline log: a stage starting,
+    finishing, failing or being retried. Rows are never updated, so the log
+    keeps every attempt that `Project.status` overwrites.
+    """
+    class Event(models.TextChoices):
+        STARTED = 'STARTED', 'Started'
+        SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+        FAILED = 'FAILED', 'Failed'
+        RETRIED = 'RETRIED', 'Retried'
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='stage_events')
+    stage = models.CharField(max_length=50)
+    event = models.CharField(max_length=10, choices=Event.choices)
+    attempt = models.PositiveSmallIntegerField(default=1)
+    worker = models.CharField(max_length=255, blank=True, default='')
+    task_id = models.CharField(max_length=255, blank=True, default='')
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['project', 'created_at']),
+            models.Index(fields=['stage', 'event', 'finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.stage} {self.event} (attempt {self.attempt})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Stage events are append-only and cannot be changed.")
+        super().save(*args, **kwargs)
+
+
+class StageCheckpoint(models.Model):
+    """
+    The output of one finished step inside a pipeline stage. A retried or
+    resumed stage finds its finished steps here by idempotency key instead
+    of repeating them and their LLM calls.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='checkpoints')
+    stage = models.CharField(max_length=50)
+    step = models.CharField(max_length=255)
+    idempotency_key = models.CharField(max_length=64, help_text="SHA-256 of the stage, step and step inputs.")
+    output = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'idempotency_key'], name='unique_stage_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.stage}/{self.step}"
+
+
+class WebsiteSnapshot(models.Model):
+    """
+    A compressed copy of a project's source website, fetched once and shared
+    by every analysis stage that looks at the same URL.
+    """
+    url = models.URLField(max_length=1024)
+    url_hash = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the URL, used for lookups.")
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
+    title = models.CharField(max_length=512, blank=True, default='')
+    html_gz = models.BinaryField(default=b'')
+    css_gz = models.BinaryField(default=b'')
+    text_gz = models.BinaryField(default=b'')
+    raw_bytes = models.PositiveIntegerField(default=0, help_text="Uncompressed size of the HTML and CSS.")
+    fetched_at = models.DateTimeField(help_text="When the content last changed.")
+    checked_at = models.DateTimeField(help_text="When the content was last revalidated with the site.")
+
+    def __str__(self):
+        return self.url
+
+    @property
+    def html(self) -> str:
+        return _decompress(self.html_gz)
+
+    @property
+    def css(self) -> str:
+        return _decompress(self.css_gz)
+
+    @property
+    def text(self) -> str:
+        return _decompress(self.text_gz)
+
+
+def _decompress(data) -> str:
+    return gzip.decompress(bytes(data)).decode('utf-8') if data else ''
@@ -0,0 +1,186 @@
+from dataclasses import dataclass, replace
+
+from celery import chain, group
+
+from applaude_api.celery_routing import PRIORITY_STANDARD
+from apps.projects.models import Project
+from .checkpoints import clear_checkpoints
+from .tasks import (
+    fetch_website, run_market_analysis, run_design_analysis, complete_analysis,
+    run_code_generation, assemble_generated_code, run_qa_check, run_security_scan, run_deployment,
+)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of an agent pipeline.
+
+    Every stage task takes the project ID and reads whatever it needs from the
+    project, so `inputs` only orders the graph: a stage starts once all the
+    stages it names have finished.
+
+    A stage whose task hands its work off (as code generation does with its
+    chord) names the task that ends it in `finished_by`, so the stage's
+    timing covers the whole of its work.
+
+    `done_status` is the project status once the stage has finished, which
+    is where a resumed pipeline puts the project back to.
+    """
+    name: str
+    task: object
+    inputs: tuple = ()
+    finished_by: object = None
+    done_status: str = None
+
+
+# Runs when a project is created. The site is fetched once; persona and
+# palette both only read that snapshot, so they run side by side.
+ANALYSIS_PIPELINE = (
+    Stage('website', fetch_website),
+    Stage('persona', run_market_analysis, inputs=('website',)),
+    Stage('palette', run_design_analysis, inputs=('website',)),
+    Stage('analysis_complete', complete_analysis, inputs=('persona', 'palette'),
+          done_status=Project.ProjectStatus.DESIGN_COMPLETE),
+)
+
+# Runs once the project is paid for. QA and the security scan both only read
+# the generated code.
+BUILD_PIPELINE = (
+    Stage('code_generation', run_code_generation, finished_by=assemble_generated_code,
+          done_status=Project.ProjectStatus.CODE_GENERATION),
+    Stage('qa', run_qa_check, inputs=('code_generation',), done_status=Project.ProjectStatus.QA_COMPLETE),
+    Stage('security_scan', run_security_scan, inputs=('code_generation',)),
+    Stage('deployment', run_deployment, inputs=('qa', 'security_scan'), done_status=Project.ProjectStatus.COMPLETED),
+)
+
+
+def levels(stages) -> list:
+    """
+    Orders a pipeline into levels: every stage in a level only depends on
+    stages from earlier levels, so a level's stages can run concurrently.
+
+    Raises:
+        ValueError: If stage names repeat, an input is unknown, or the graph has a cycle.
+    """
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names in pipeline: {names}")
+    for stage in stages:
+        unknown = set(stage.inputs) - set(names)
+        if unknown:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {', '.join(sorted(unknown))}")
+
+    ordered = []
+    finished = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if set(stage.inputs) <= finished]
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle between: {', '.join(s.name for s in remaining)}")
+        ordered.append(ready)
+        finished.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage.name not in finished]
+    return ordered
+
+
+def build_signature(stages, project_id, priority=PRIORITY_STANDARD):
+    """
+    Compiles a pipeline into a Celery canvas for one project.
+
+    Each level becomes a group (a single signature when it has one stage) and
+    the levels are chained, which Celery turns into chords wherever a group
+    is followed by another step. Signatures are immutable so group results
+    are never passed on as arguments. Every stage is sent with `priority`;
+    the queue comes from the task routes.
+    """
+    steps = []
+    for level in levels(stages):
+        signatures = [stage.task.si(project_id).set(priority=priority) for stage in level]
+        steps.append(signatures[0] if len(signatures) == 1 else group(signatures))
+    return steps[0] if len(steps) == 1 else chain(*steps)
+
+
+def run_pipeline(stages, project_id, resume=False, priority=PRIORITY_STANDARD, on_finish=None):
+    """
+    Starts a pipeline for a project and returns its AsyncResult.
+
+    A fresh run forgets the step checkpoints its stages left behind; a
+    resumed run keeps them, so its stages pick up where they stopped.
+
+    Args:
+        stages: The pipeline to run.
+        project_id: The project to run it for.
+        resume (bool): Whether to keep the stages' checkpoints.
+        priority (int): Queue priority, one of the PRIORITY_* constants in
+            applaude_api.celery_routing.
+        on_finish: Optional immutable signature called once the pipeline
+            succeeds or a stage fails for good.
+    """
+    if not resume:
+        clear_checkpoints([project_id], [stage.name for stage in stages])
+    return _linked_signature(stages, project_id, priority, on_finish).delay()
+
+
+def run_pipelines(stages, project_ids, priority=PRIORITY_STANDARD, on_finish=None):
+    """
+    Starts fresh pipelines for several projects with one grouped publish,
+    and returns the group's result (None if there were no projects).
+
+    Args:
+        stages: The pipeline to run.
+        project_ids: The projects to run it for.
+        priority (int): Queue priority, as for `run_pipeline`.
+        on_finish: Optional callable taking a project ID and returning the
+            signature to call once that project's pipeline ends.
+    """
+    project_ids = list(project_ids)
+    if not project_ids:
+        return None
+    clear_checkpoints(project_ids, [stage.name for stage in stages])
+    return group(
+        _linked_signature(stages, project_id, priority, on_finish(project_id) if on_finish else None)
+        for project_id in project_ids
+    ).apply_async()
+
+
+def _linked_signature(stages, project_id, priority, on_finish):
+    signature = build_signature(stages, project_id, priority)
+    if on_finish is not None:
+        signature.link(on_finish)
+        signature.link_error(on_finish)
+    return signature
+
+
+def current_pipeline(stage_names):
+    """The pipeline a project is in, given the stages it has logged events for."""
+    return BUILD_PIPELINE if {stage.name for stage in BUILD_PIPELINE} & set(stage_names) else ANALYSIS_PIPELINE
+
+
+def resume_plan(project):
+    """
+    Works out how to resume a project's current pipeline from its stage
+    event log.
+
+    Returns:
+        A `(stages, status)` pair: the stages that have not succeeded yet,
+        with finished inputs removed, and the status the project had after
+        its last finished stage. `stages` is empty if the pipeline finished.
+    """
+    from .models import ProjectStageEvent
+
+    latest = dict(project.stage_events.order_by('created_at', 'id').values_list('stage', 'event'))
+    succeeded = {stage for stage, event in latest.items() if event == ProjectStageEvent.Event.SUCCEEDED}
+    pipeline = current_pipeline(latest)
+
+    status = Project.ProjectStatus.DESIGN_COMPLETE if pipeline is BUILD_PIPELINE else Project.ProjectStatus.PENDING
+    for level in levels(pipeline):
+        for stage in level:
+            if stage.name in succeeded and stage.done_status:
+                status = stage.done_status
+
+    remaining = tuple(
+        replace(stage, inputs=tuple(name for name in stage.inputs if name not in succeeded))
+        for stage in pipeline if stage.name not in succeeded
+    )
+    return remaining, status
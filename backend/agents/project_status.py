@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from applaude_api.redis_client import get_redis
+from apps.projects.models import Project
+from apps.projects.notifications import publish_project_state
+
+PROGRESS_NAMESPACE = 'project:progress'
+
+# status_message is a CharField(max_length=255).
+MAX_MESSAGE_LENGTH = 255
+
+
+def _progress_key(project_id) -> str:
+    return f"{PROGRESS_NAMESPACE}:{project_id}"
+
+
+def update_project_status(project_id, status, message=None, from_statuses=None, **fields) -> bool:
+    """
+    Writes a status transition as one conditional UPDATE of the status
+    columns, without locking the row or rewriting the project's large text
+    fields, and pushes it to clients watching the project. Repeating the
+    current status and message writes nothing.
+
+    Args:
+        project_id: The project to update.
+        status (str): The new `Project.ProjectStatus`.
+        message (str): Optional status message.
+        from_statuses (iterable): If given, the transition only happens from one of these statuses.
+        **fields: Other columns the stage produced, written in the same UPDATE.
+
+    Returns:
+        True if the row was updated.
+    """
+    state = {'status': status}
+    if message:
+        state['status_message'] = message[:MAX_MESSAGE_LENGTH]
+
+    queryset = Project.objects.filter(id=project_id)
+    if not fields:
+        queryset = queryset.exclude(Q(**state))
+    if from_statuses is not None:
+        queryset = queryset.filter(status__in=list(from_statuses))
+    try:
+        updated = queryset.update(**state, **fields, updated_at=timezone.now())
+    except Exception as e:
+        print(f"Error updating project status for {project_id}: {e}")
+        return False
+
+    # A transition carries its own message, so buffered progress is obsolete.
+    _discard_progress(project_id)
+    if updated:
+        publish_project_state(project_id, **state)
+    return bool(updated)
+
+
+def save_stage_output(project_id, message: str, **fields):
+    """
+    Stores what a stage produced together with a status message, without
+    changing the status, and pushes the message to clients.
+
+    Args:
+        project_id: The project to update.
+        message (str): The new status message.
+        **fields: The columns the stage produced.
+    """
+    message = message[:MAX_MESSAGE_LENGTH]
+    Project.objects.filter(id=project_id).update(status_message=message, updated_at=timezone.now(), **fields)
+    _discard_progress(project_id)
+    publish_project_state(project_id, status_message=message)
+
+
+def report_progress(project_id, message: str):
+    """
+    Records an informational status message without changing the status,
+    and pushes it to clients when it is written.
+
+    Bursts are coalesced across workers: the first message in a window of
+    PROJECT_PROGRESS_COALESCE_SECONDS is written straight away and later
+    ones only replace a buffered message in Redis. The buffer is written by
+    the first call after the window closes or by `flush_progress`, which
+    runs whenever a stage task ends, and is discarded by the next status
+    transition or stage output, which carry their own message.
+    """
+    window = getattr(settings, 'PROJECT_PROGRESS_COALESCE_SECONDS', 2.0)
+    message = message[:MAX_MESSAGE_LENGTH]
+    if window > 0:
+        key = _progress_key(project_id)
+        try:
+            redis = get_redis()
+            if not redis.set(f"{key}:window", 1, nx=True, px=int(window * 1000)):
+                redis.set(f"{key}:message", message, ex=max(int(window * 10), 60))
+                return
+            redis.delete(f"{key}:message")
+        except Exception as e:
+            print(f"Progress coalescing unavailable, writing directly: {e}")
+    _write_message(project_id, message)
+
+
+def flush_progress(project_id):
+    """
+    Writes the buffered progress message, if any, at the end of a burst.
+    The stage event log calls it whenever a stage task ends.
+    """
+    if getattr(settings, 'PROJECT_PROGRESS_COALESCE_SECONDS', 2.0) <= 0:
+        return
+    key = f"{_progress_key(project_id)}:message"
+    try:
+        message, _ = get_redis().pipeline().get(key).delete(key).execute()
+    except Exception as e:
+        print(f"Could not flush progress for {project_id}: {e}")
+        return
+    if message:
+        _write_message(project_id, message)
+
+
+def _write_message(project_id, message: str):
+    if Project.objects.filter(id=project_id).exclude(status_message=message).update(
+        status_message=message, updated_at=timezone.now()
+    ):
+        publish_project_state(project_id, status_message=message)
+
+
+def _discard_progress(project_id):
+    if getattr(settings, 'PROJECT_PROGRESS_COALESCE_SECONDS', 2.0) <= 0:
+        return
+    try:
+        get_redis().delete(f"{_progress_key(project_id)}:message")
+    except Exception:
+        pass
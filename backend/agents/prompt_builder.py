@@ -0,0 +1,138 @@
+import math
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+
+# Sections with this priority are always sent in full. Higher numbers are
+# less important and are compacted, truncated or dropped first.
+REQUIRED = 0
+
+# Rough size of a token for Gemini models on English text and code. Counting
+# exactly would cost a `count_tokens` round trip per prompt.
+CHARS_PER_TOKEN = 4
+
+# Sections that would be cut below this size are dropped instead.
+MIN_SECTION_TOKENS = 32
+
+TRUNCATION_MARKER = "\n[...truncated to fit the prompt budget]"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts text to roughly `max_tokens`, preferring a line or word boundary.
+    """
+    limit = max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER)
+    if len(text) <= max_tokens * CHARS_PER_TOKEN:
+        return text
+    if limit <= 0:
+        return ''
+    cut = text[:limit]
+    boundary = max(cut.rfind('\n'), cut.rfind(' '))
+    if boundary > limit // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + TRUNCATION_MARKER
+
+
+@dataclass
+class PromptSection:
+    name: str
+    text: str
+    priority: int = REQUIRED
+    compactor: Optional[Callable[[str], str]] = None
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+class PromptBuilder:
+    """
+    Assembles an agent prompt from named sections and keeps it within the
+    agent's input-token budget.
+
+    When the prompt is over budget, optional sections are reduced starting
+    with the least important one: first with the section's compactor (a
+    cheaper rendering of the same data), then by truncation, and finally by
+    dropping the section. Required sections are never touched. Every built
+    prompt is recorded as a `PromptMetric` so input-token growth can be
+    tracked per agent.
+    """
+    def __init__(self, agent_name: str, budget_tokens: int = None, project=None, record_metrics: bool = True):
+        """
+        Args:
+            agent_name (str): The agent the prompt belongs to, used for metrics.
+            budget_tokens (int): Maximum estimated input tokens; defaults to LLM_PROMPT_TOKEN_BUDGET.
+            project: Optional project the prompt was built for.
+            record_metrics (bool): Whether to store a PromptMetric row on build.
+        """
+        self.agent_name = agent_name
+        self.budget_tokens = budget_tokens or getattr(settings, 'LLM_PROMPT_TOKEN_BUDGET', 8000)
+        self.project = project
+        self.record_metrics = record_metrics and getattr(settings, 'LLM_PROMPT_METRICS_ENABLED', True)
+        self.sections = []
+
+    def add(self, name: str, text: str, priority: int = REQUIRED, compactor: Callable[[str], str] = None):
+        """
+        Appends a section. Sections are rendered in the order they are added.
+
+        Args:
+            name (str): Identifies the section in metrics.
+            text (str): The section's content.
+            priority (int): REQUIRED, or a positive number (higher is trimmed first).
+            compactor (callable): Optional function returning a shorter rendering of `text`.
+        """
+        if text:
+            self.sections.append(PromptSection(name, text.strip('\n'), priority, compactor))
+        return self
+
+    def build(self) -> str:
+        """
+        Renders the prompt, trimming optional sections until it fits the budget.
+        """
+        raw_tokens = sum(section.tokens for section in self.sections)
+        total = raw_tokens
+        trimmed = []
+
+        optional = [section for section in self.sections if section.priority > REQUIRED]
+        # Least important first; among equals, the section added last goes first.
+        for section in sorted(optional, key=lambda s: (s.priority, self.sections.index(s)), reverse=True):
+            if total <= self.budget_tokens:
+                break
+            before = section.tokens
+            if section.compactor:
+                section.text = section.compactor(section.text)
+            overage = total - before + section.tokens - self.budget_tokens
+            if overage > 0:
+                allowed = section.tokens - overage
+                section.text = truncate_to_tokens(section.text, allowed) if allowed >= MIN_SECTION_TOKENS else ''
+            total += section.tokens - before
+            trimmed.append(section.name)
+
+        self.sections = [section for section in self.sections if section.text]
+        if total > self.budget_tokens:
+            print(f"{self.agent_name} prompt needs ~{total} tokens for its required sections; budget is {self.budget_tokens}.")
+
+        self._record(raw_tokens, total, trimmed)
+        return "\n\n".join(section.text for section in self.sections)
+
+    def _record(self, raw_tokens: int, total: int, trimmed: list):
+        if not self.record_metrics:
+            return
+        from .models import PromptMetric
+        try:
+            PromptMetric.objects.create(
+                agent_name=self.agent_name,
+                project=self.project,
+                budget_tokens=self.budget_tokens,
+                raw_tokens=raw_tokens,
+                input_tokens=total,
+                section_tokens={section.name: section.tokens for section in self.sections},
+                trimmed_sections=trimmed,
+            )
+        except Exception as e:
+            print(f"Could not record prompt metrics for {self.agent_name}: {e}")
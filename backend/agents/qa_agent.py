@@ -1,6 +1,6 @@
 from .base_agent import BaseAgent
 from apps.projects.models import Project
-from django.db import transaction
+from .project_status import update_project_status
 from .prompts.super_prompts import QA_ENGINEER_PERSONA, QA_ENGINEER_GOAL
 
 class QAAgent(BaseAgent):
@@ -13,17 +13,12 @@ class QAAgent(BaseAgent):
 
     def execute(self, project_id: int):
         print(f"Executing QA Agent for project {project_id}...")
-        project = Project.objects.get(id=project_id)
-        project.status = "QA_PENDING"
-        project.save()
+        update_project_status(project_id, Project.ProjectStatus.QA_PENDING)
 
         # In a real scenario, this would analyze the generated code
         # For now, we simulate a successful QA check
         qa_report = "No critical, high, medium, or low severity issues found. The codebase meets all quality standards."
 
-        with transaction.atomic():
-            project.status = "QA_COMPLETE"
-            project.status_message = "QA checks passed successfully."
-            project.save()
+        update_project_status(project_id, Project.ProjectStatus.QA_COMPLETE, "QA checks passed successfully.")
         print(f"QA check complete for project {project_id}.")
         return qa_report
@@ -0,0 +1,217 @@
+import inspect
+import math
+import socket
+from datetime import timedelta
+from functools import lru_cache
+
+from celery import states
+from celery.signals import task_prerun, task_postrun
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.projects.models import Project
+from .models import ProjectStageEvent
+from .project_status import flush_progress
+
+# Aggregated durations are recomputed at most this often.
+STATS_CACHE_SECONDS = 300
+
+# Stage start times of tasks running in this process, by task ID, so a
+# stage that starts and ends in the same task needs no lookup to time it.
+_started_at = {}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+@lru_cache(maxsize=1)
+def _stage_tasks():
+    """
+    Maps task names to the pipeline stages they start and finish. Built on
+    first use because the pipelines import the tasks module.
+    """
+    from .pipeline import ANALYSIS_PIPELINE, BUILD_PIPELINE
+    starts, finishes = {}, {}
+    for pipeline in (ANALYSIS_PIPELINE, BUILD_PIPELINE):
+        for stage in pipeline:
+            starts[stage.task.name] = stage.name
+            finishes[(stage.finished_by or stage.task).name] = stage.name
+    return starts, finishes
+
+
+def _project_id(task, args, kwargs):
+    try:
+        bound = inspect.signature(task.run).bind_partial(*(args or ()), **(kwargs or {}))
+    except TypeError:
+        return None
+    return bound.arguments.get('project_id')
+
+
+def _attempt_and_worker(task):
+    request = task.request
+    return (request.retries or 0) + 1, request.hostname or socket.gethostname()
+
+
+@task_prerun.connect
+def record_stage_start(sender=None, task_id=None, task=None, args=None, kwargs=None, **extra):
+    stage = _stage_tasks()[0].get(getattr(task, 'name', None))
+    project_id = _project_id(task, args, kwargs) if stage else None
+    if project_id is None:
+        return
+    attempt, worker = _attempt_and_worker(task)
+    now = timezone.now()
+    try:
+        ProjectStageEvent.objects.create(
+            project_id=project_id, stage=stage, event=ProjectStageEvent.Event.STARTED,
+            attempt=attempt, worker=worker, task_id=task_id or '', started_at=now,
+        )
+        _started_at[task_id] = now
+    except Exception as e:
+        print(f"Could not record start of stage {stage} for project {project_id}: {e}")
+
+
+@task_postrun.connect
+def record_stage_end(sender=None, task_id=None, task=None, args=None, kwargs=None, state=None, **extra):
+    """
+    Logs the end of a stage. Success is only logged by the task that
+    finishes the stage; a failure or retry of any of its tasks is logged
+    as it happens. Progress the task buffered is written out either way.
+    """
+    starts, finishes = _stage_tasks()
+    name = getattr(task, 'name', None)
+    started_here = _started_at.pop(task_id, None)
+    if name not in starts and name not in finishes:
+        return
+    project_id = _project_id(task, args, kwargs)
+    if project_id is None:
+        return
+    # Nothing else may report before the next stage starts.
+    flush_progress(project_id)
+
+    if state == states.SUCCESS and name in finishes:
+        stage, event = finishes[name], ProjectStageEvent.Event.SUCCEEDED
+    elif state in (states.FAILURE, states.RETRY):
+        stage = starts.get(name) or finishes[name]
+        event = ProjectStageEvent.Event.FAILED if state == states.FAILURE else ProjectStageEvent.Event.RETRIED
+    else:
+        return
+
+    attempt, worker = _attempt_and_worker(task)
+    now = timezone.now()
+    try:
+        started_at = started_here or ProjectStageEvent.objects.filter(
+            project_id=project_id, stage=stage, event=ProjectStageEvent.Event.STARTED
+        ).order_by('-created_at', '-id').values_list('started_at', flat=True).first() or now
+        ProjectStageEvent.objects.create(
+            project_id=project_id, stage=stage, event=event, attempt=attempt, worker=worker,
+            task_id=task_id or '', started_at=started_at, finished_at=now,
+            duration_ms=int((now - started_at).total_seconds() * 1000),
+        )
+    except Exception as e:
+        print(f"Could not record {event.lower()} stage {stage} for project {project_id}: {e}")
+
+
+def stage_duration_stats(days: int = 30, sample_size: int = 1000) -> dict:
+    """
+    Per-stage duration percentiles of recent successful runs.
+
+    Args:
+        days (int): Only runs that finished within this many days are counted.
+        sample_size (int): At most this many of the latest runs are used per stage.
+
+    Returns:
+        A dict keyed by stage name with count, mean_ms, p50_ms, p95_ms and
+        p99_ms. Stages without successful runs are left out.
+    """
+    key = f"stage-duration-stats:{days}:{sample_size}"
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    since = timezone.now() - timedelta(days=days)
+    stats = {}
+    for stage in dict.fromkeys(_stage_tasks()[1].values()):
+        durations = list(
+            ProjectStageEvent.objects.filter(
+                stage=stage, event=ProjectStageEvent.Event.SUCCEEDED, finished_at__gte=since
+            ).order_by('-finished_at').values_list('duration_ms', flat=True)[:sample_size]
+        )
+        if durations:
+            stats[stage] = {
+                'count': len(durations),
+                'mean_ms': round(sum(durations) / len(durations)),
+                'p50_ms': percentile(durations, 50),
+                'p95_ms': percentile(durations, 95),
+                'p99_ms': percentile(durations, 99),
+            }
+    cache.set(key, stats, STATS_CACHE_SECONDS)
+    return stats
+
+
+def expected_duration_seconds(stages) -> float:
+    """
+    Historical median duration of a whole pipeline: the slowest stage of
+    each level, summed over its levels.
+    """
+    from .pipeline import levels
+
+    stats = stage_duration_stats()
+    return sum(
+        max(stats.get(stage.name, {}).get('p50_ms', 0) for stage in level) for level in levels(stages)
+    ) / 1000
+
+
+def estimate_completion(project) -> dict:
+    """
+    Estimates when a project's current pipeline will finish.
+
+    Every stage that has not succeeded yet is expected to take its
+    historical median; a running stage is credited with the time it has
+    already spent. Stages in the same level run side by side, so a level
+    costs as much as its slowest remaining stage.
+
+    Args:
+        project (Project): The project to estimate.
+
+    Returns:
+        A dict with the pipeline, running and remaining stages, the slowest
+        remaining stage, and eta_seconds / estimated_completion (None for a
+        failed project).
+    """
+    from .pipeline import BUILD_PIPELINE, current_pipeline, levels
+
+    latest = {}
+    for event in project.stage_events.only('stage', 'event', 'started_at').order_by('created_at', 'id'):
+        latest[event.stage] = event
+    pipeline = current_pipeline(latest)
+
+    stats = stage_duration_stats()
+    now = timezone.now()
+    running, remaining, eta_seconds = [], [], 0.0
+    for level in levels(pipeline):
+        level_seconds = 0.0
+        for stage in level:
+            event = latest.get(stage.name)
+            if event and event.event == ProjectStageEvent.Event.SUCCEEDED:
+                continue
+            expected = stats.get(stage.name, {}).get('p50_ms', 0) / 1000
+            if event and event.event == ProjectStageEvent.Event.STARTED:
+                running.append(stage.name)
+                expected = max(expected - (now - event.started_at).total_seconds(), 0.0)
+            remaining.append(stage.name)
+            level_seconds = max(level_seconds, expected)
+        eta_seconds += level_seconds
+
+    failed = project.status == Project.ProjectStatus.FAILED
+    return {
+        'pipeline': 'build' if pipeline is BUILD_PIPELINE else 'analysis',
+        'status': project.status,
+        'running_stages': running,
+        'remaining_stages': remaining,
+        'slowest_stage': max(remaining, key=lambda name: stats.get(name, {}).get('p50_ms', 0), default=None),
+        'eta_seconds': None if failed else round(eta_seconds, 1),
+        'estimated_completion': None if failed else now + timedelta(seconds=eta_seconds),
+    }
@@ -1,70 +1,83 @@
-import google.generativeai as genai
 import os
-from celery import shared_task, atexit
+from celery import shared_task, group, chord
+from celery.signals import worker_process_init, worker_shutdown
 from apps.projects.models import Project
-from django.db import transaction
+from apps.projects.artifacts import blob_name, create_build
 import time
-import random
 from django.utils import timezone
 from datetime import timedelta
 from django.core.mail import send_mail
+from .llm_client import LLMClient
+from .model_registry import TASK_MODEL, warm
+from .llm_backends import simulated_stage_seconds
+from .website_snapshot import fetch_snapshot, content_context, design_context
+from .project_status import update_project_status, save_stage_output, report_progress
+from .checkpoints import checkpointed
+from .code_generation_agent import CodeGenAgent, plan_regeneration
+from . import stage_events  # noqa: F401 -- connects the stage event log to the task signals
 
 
-try:
-    genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-    model = genai.GenerativeModel('gemini-1.5-pro-latest')
-    print("AI Model configured successfully.")
-except Exception as e:
-    print(f"Error configuring AI Model: {e}")
-    model = None
+# The client connects lazily, once per worker process, on first use.
+llm_client = LLMClient(model_name=TASK_MODEL)
 
-# --- Helper Functions ---
 
-def update_project_status(project_id, status, message=None):
-    """Atomically updates the project status and an optional message."""
-    try:
-        with transaction.atomic():
-            project = Project.objects.select_for_update().get(id=project_id)
-            project.status = status
-            if message:
-                project.status_message = message
-            project.save()
-    except Project.DoesNotExist:
-        # Handle cases where the project might be deleted during processing
-        print(f"Project with ID {project_id} not found for status update.")
-    except Exception as e:
-        print(f"Error updating project status for {project_id}: {e}")
+@worker_process_init.connect
+def warm_model_registry(**kwargs):
+    """
+    Builds the model clients once in every freshly forked worker process.
+    """
+    warm()
 
+# --- Helper Functions ---
 
-def get_ai_response(prompt, retries=3, delay=5):
+def get_ai_response(prompt):
     """
     Calls the generative AI model with retry logic.
     Returns the generated text or raises an exception.
     """
-    if not model:
-        raise ConnectionError("Generative AI model is not configured.")
+    return llm_client.generate(prompt)
 
-    for attempt in range(retries):
-        try:
-            response = model.generate_content(prompt)
-            # Basic validation of response structure
-            if response and response.text:
-                return response.text
-            else:
-                raise ValueError("Received an empty or invalid response from the AI model.")
-        except Exception as e:
-            print(f"AI generation attempt {attempt + 1} failed: {e}")
-            if attempt < retries - 1:
-                time.sleep(delay)
-            else:
-                raise  # Re-raise the final exception
+
+def retry_stage(task, project_id, label, exc):
+    """
+    Retries a failed stage task. The stage's checkpoints are kept, so the
+    retry resumes after its last finished step; the project is only marked
+    failed once the retries are used up.
+
+    Args:
+        task: The bound task that failed.
+        project_id: The project the stage runs for.
+        label (str): The stage as shown in status messages, e.g. "QA Check".
+        exc (Exception): The error that stopped the stage.
+    """
+    if task.request.retries >= task.max_retries:
+        update_project_status(project_id, Project.ProjectStatus.FAILED, f"{label} Failed: {exc}")
+    else:
+        report_progress(project_id, f"{label} hit an error, retrying: {exc}")
+    raise task.retry(exc=exc)
 
 # --- Core AI Agent Tasks ---
 
+@shared_task
+def fetch_website(project_id):
+    """
+    Downloads the project's source website into the shared snapshot read by
+    every analysis stage. A site that cannot be fetched is not fatal: the
+    analysis prompts then fall back to the bare URL.
+    """
+    project = Project.objects.get(id=project_id)
+    if project.source_url:
+        report_progress(project_id, "Fetching website content...")
+        try:
+            fetch_snapshot(project.source_url)
+        except Exception as e:
+            print(f"Could not fetch {project.source_url} for project {project_id}: {e}")
+    return project_id
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def run_market_analysis(self, project_id):
     """
-    Analyzes the provided source URL to generate a user persona and brand identity.
+    Analyzes the provided source URL to generate a user persona.
     """
     update_project_status(project_id, Project.ProjectStatus.ANALYSIS_PENDING, "Analyzing market and target user...")
     try:
@@ -81,64 +94,123 @@ def run_market_analysis(self, project_id):
         - Frustrations and pain points with existing solutions.
         - Their preferred technology and social media platforms.
         Format the output as a clean, readable text document.
+        {content_context(project.source_url)}
         """
-        user_persona = get_ai_response(persona_prompt)
+        user_persona = checkpointed(project_id, 'persona', 'persona_document', lambda: get_ai_response(persona_prompt), persona_prompt)
+
+        save_stage_output(project_id, "User persona ready.", user_persona_document=user_persona)
+
+        return project.id
+    except Exception as e:
+        retry_stage(self, project_id, "Market Analysis", e)
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def run_design_analysis(self, project_id):
+    """
+    Extracts a brand color palette from the provided source URL.
+    """
+    update_project_status(project_id, Project.ProjectStatus.DESIGN_PENDING, "Extracting brand palette...")
+    try:
+        project = Project.objects.get(id=project_id)
 
-        # --- Brand Palette Generation ---
         palette_prompt = f"""
         Based on the website at {project.source_url}, generate a JSON object for a brand color palette.
         The JSON object must include the following keys with hex color values:
         "primary", "secondary", "text_light", "text_dark", "background".
         Example: {{"primary": "#0062FF", "secondary": "#FFC107", "text_light": "#FFFFFF", "text_dark": "#212121", "background": "#F5F5F5"}}
         Return ONLY the raw JSON object.
+        {design_context(project.source_url)}
         """
-        brand_palette_str = get_ai_response(palette_prompt)
-
-        # Atomically update the project with the generated assets
-        with transaction.atomic():
-            project_to_update = Project.objects.select_for_update().get(id=project_id)
-            project_to_update.user_persona_document = user_persona
-            project_to_update.brand_palette = brand_palette_str # Storing as string, serializer will handle JSON
-            project_to_update.status = Project.ProjectStatus.ANALYSIS_COMPLETE
-            project_to_update.status_message = "Market analysis complete. Ready for design."
-            project_to_update.save()
-
-        return project.id # Pass the project ID to the next task in the chain
+        brand_palette_str = checkpointed(project_id, 'palette', 'brand_palette', lambda: get_ai_response(palette_prompt), palette_prompt)
+
+        # Storing as string, serializer will handle JSON
+        save_stage_output(project_id, "Brand palette ready.", brand_palette=brand_palette_str)
+
+        return project.id
     except Exception as e:
-        update_project_status(project_id, Project.ProjectStatus.FAILED, f"Market Analysis Failed: {e}")
-        self.retry(exc=e)
+        retry_stage(self, project_id, "Design Analysis", e)
+
+@shared_task
+def complete_analysis(project_id):
+    """
+    Marks the analysis phase complete once the persona and palette are both ready.
+    """
+    update_project_status(project_id, Project.ProjectStatus.DESIGN_COMPLETE, "Market and design analysis complete. Ready to build.")
+    return project_id
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def run_code_generation(self, project_id):
     """
     Generates the application code based on the project requirements.
-    This is a placeholder for a complex code generation process.
-    """
-    update_project_status(project_id, Project.ProjectStatus.CODE_GENERATION, "Generating application source code...")
-    try:
-        project = Project.objects.get(id=project_id)
-
-        # In a real system, this would involve a complex series of prompts
-        # and interactions with a code-specialized AI model.
-        # Here, we simulate the process and success.
 
-        # Simulate generation time
-        time.sleep(random.randint(20, 40))
+    A planning call produces the file manifest for every target platform.
+    Each file is then generated by its own `generate_code_file` task in a
+    Celery group, and `assemble_generated_code` validates the result once
+    all of them finish, so latency is bounded by the slowest file rather
+    than the sum of all files. This task replaces itself with that chord, so
+    the next stage of the chain runs after assembly.
 
-        # Simulate storing the generated code and getting a path
-        # This path would point to an S3 bucket or similar storage.
-        generated_code_path = f"s3://applause-code-bucket/{project.owner.username}/{project.id}/source_code.zip"
-
-        with transaction.atomic():
-            project_to_update = Project.objects.select_for_update().get(id=project_id)
-            project_to_update.generated_code_path = generated_code_path
-            project_to_update.status_message = "Code generation finished. Pending QA."
-            project_to_update.save()
+    A project that already has a build is regenerated incrementally: its
+    plan is kept and only the files whose inputs changed are generated
+    again (see `plan_regeneration`), unless a structural input changed.
+    """
+    update_project_status(project_id, Project.ProjectStatus.CODE_GENERATION, "Planning application source code...")
+    try:
+        regeneration = plan_regeneration(project_id)
+        if regeneration is None:
+            manifest = CodeGenAgent().plan(project_id)
+            files = manifest
+        else:
+            manifest, files = regeneration
+    except Exception as e:
+        retry_stage(self, project_id, "Code Generation", e)
+
+    if not files:
+        report_progress(project_id, "No project inputs changed since the last build.")
+        return self.replace(assemble_generated_code.si([], project_id, manifest))
+    if files is manifest:
+        report_progress(project_id, f"Generating {len(manifest)} source files in parallel...")
+    else:
+        report_progress(project_id, f"Regenerating {len(files)} of {len(manifest)} source files whose inputs changed...")
+    header = group(generate_code_file.s(project_id, entry, manifest) for entry in files)
+    return self.replace(chord(header, assemble_generated_code.s(project_id, manifest)))
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def generate_code_file(self, project_id, entry, manifest):
+    """
+    Generates and stores a single file from the code generation manifest.
+    """
+    try:
+        return CodeGenAgent().generate_file(project_id, entry, manifest)
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            update_project_status(project_id, Project.ProjectStatus.FAILED, f"Code Generation Failed for {entry['path']}: {e}")
+        raise self.retry(exc=e)
 
-        return project.id # Pass ID to the next task
+@shared_task(bind=True)
+def assemble_generated_code(self, generated_paths, project_id, manifest):
+    """
+    Chord callback: validates that every planned file was generated, stores
+    them as the project's next build in the artifact store, and records
+    where its manifest lives. Files left over from an earlier plan are
+    deleted first, so they do not end up in the build.
+    """
+    try:
+        agent = CodeGenAgent()
+        agent.validate(project_id, manifest)
+        agent.discard_unplanned(project_id, manifest)
+        build = create_build(project_id)
+
+        save_stage_output(
+            project_id,
+            f"Code generation finished ({len(generated_paths)} of {len(manifest)} files generated, build {build.build_number}). Pending QA.",
+            generated_code_path=blob_name(build.digest),
+        )
+
+        return project_id # Pass ID to the next task
     except Exception as e:
         update_project_status(project_id, Project.ProjectStatus.FAILED, f"Code Generation Failed: {e}")
-        self.retry(exc=e)
+        raise
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def run_qa_check(self, project_id):
@@ -152,15 +224,33 @@ def run_qa_check(self, project_id):
             raise ValueError("Generated code path not found. Cannot run QA.")
 
         # Simulate QA process (e.g., running static analysis, linting, tests)
-        time.sleep(random.randint(15, 30))
+        time.sleep(simulated_stage_seconds('qa', project_id))
 
         # Simulate a successful QA outcome
         update_project_status(project_id, Project.ProjectStatus.QA_COMPLETE, "QA checks passed. Ready for deployment.")
 
         return project.id # Pass ID to the next task
     except Exception as e:
-        update_project_status(project_id, Project.ProjectStatus.FAILED, f"QA Check Failed: {e}")
-        self.retry(exc=e)
+        retry_stage(self, project_id, "QA Check", e)
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def run_security_scan(self, project_id):
+    """
+    Performs a simulated security scan of the generated code. Runs alongside
+    the QA check, so it reports progress without changing the project status.
+    """
+    report_progress(project_id, "Scanning generated code for vulnerabilities...")
+    try:
+        project = Project.objects.get(id=project_id)
+        if not project.generated_code_path:
+            raise ValueError("Generated code path not found. Cannot run security scan.")
+
+        # Simulate the scan (e.g., dependency audit, secret detection, SAST)
+        time.sleep(simulated_stage_seconds('security_scan', project_id))
+
+        return project.id
+    except Exception as e:
+        retry_stage(self, project_id, "Security Scan", e)
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def run_deployment(self, project_id):
@@ -177,15 +267,14 @@ def run_deployment(self, project_id):
             return project.id
 
         # Simulate deployment time
-        time.sleep(random.randint(25, 50))
+        time.sleep(simulated_stage_seconds('deployment', project_id))
 
         final_message = f"Deployment successful! Your app is now live on the {project.deployment_option} platform."
         update_project_status(project_id, Project.ProjectStatus.COMPLETED, final_message)
 
         return project.id
     except Exception as e:
-        update_project_status(project_id, Project.ProjectStatus.FAILED, f"Deployment Failed: {e}")
-        self.retry(exc=e)
+        retry_stage(self, project_id, "Deployment", e)
 
 @shared_task(name="send_testimonial_requests")
 def send_testimonial_requests():
@@ -261,7 +350,7 @@ def send_testimonial_requests():
 
 # --- Cleanup ---
 
-@atexit.register
+@worker_shutdown.connect
 def cleanup_resources(*args, **kwargs):
     """
     A cleanup function to be executed when the Celery worker shuts down.
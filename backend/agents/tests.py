@@ -0,0 +1,718 @@
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import fakeredis
+from celery import states
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from applaude_api.celery_routing import PRIORITY_BULK, route_task
+from apps.projects.artifacts import create_build
+from apps.projects.models import MobileApp, Project
+from . import llm_backends, model_registry
+from .code_stream import CodeBlockStreamParser
+from .llm_cache import LLMResponseCache
+from .llm_client import LLMClient
+from .llm_singleflight import SingleFlight
+from .pipeline import BUILD_PIPELINE, Stage, build_signature, levels, resume_plan
+from .checkpoints import checkpointed
+from .code_generation_agent import CodeGenAgent, input_digests, plan_regeneration
+from .prompt_builder import PromptBuilder, REQUIRED, estimate_tokens
+from .website_snapshot import BlockedURLError, css_colors, fetch_snapshot
+from .project_status import update_project_status, report_progress
+from .models import ProjectStageEvent
+from .stage_events import estimate_completion, percentile, record_stage_end, stage_duration_stats
+from .tasks import assemble_generated_code, complete_analysis, run_code_generation, run_security_scan
+
+STREAMED_RESPONSE = """**Step 3: Propose Logical File Structure**
+```
+app/
+└── build.gradle
+```
+
+**Step 4: Generate Code**
+
+```kotlin
+// File: app/src/main/java/com/example/ui/theme/Color.kt
+package com.example.ui.theme
+
+val PrimaryColor = Color(0xFF0062FF)
+```
+
+```swift
+// File: Example/Views/ContentView.swift
+import SwiftUI
+```
+"""
+
+
+class CodeBlockStreamParserTests(SimpleTestCase):
+
+    def parse_in_chunks(self, text, size):
+        parser = CodeBlockStreamParser()
+        files = []
+        for start in range(0, len(text), size):
+            files.extend(parser.feed(text[start:start + size]))
+        files.extend(parser.close())
+        return files
+
+    def test_extracts_files_regardless_of_chunk_boundaries(self):
+        """
+        Ensure every "// File:" block is extracted whatever the chunk size.
+        """
+        for size in (1, 7, 64, len(STREAMED_RESPONSE)):
+            files = self.parse_in_chunks(STREAMED_RESPONSE, size)
+            self.assertEqual(
+                [f.path for f in files],
+                ['app/src/main/java/com/example/ui/theme/Color.kt', 'Example/Views/ContentView.swift']
+            )
+            self.assertEqual(files[0].platform, 'Android')
+            self.assertEqual(files[1].platform, 'iOS')
+            self.assertEqual(files[1].content, 'import SwiftUI\n')
+
+    def test_file_is_emitted_when_its_fence_closes(self):
+        """
+        Ensure a file is available before the rest of the response arrives.
+        """
+        parser = CodeBlockStreamParser()
+        first_file_end = STREAMED_RESPONSE.index('```swift')
+        files = parser.feed(STREAMED_RESPONSE[:first_file_end])
+        self.assertEqual(len(files), 1)
+        self.assertIn('PrimaryColor', files[0].content)
+
+    def test_unterminated_block_is_flushed_on_close(self):
+        """
+        Ensure a truncated response still yields its last file.
+        """
+        parser = CodeBlockStreamParser()
+        parser.feed("```kotlin\n// File: Main.kt\nfun main() {}")
+        files = parser.close()
+        self.assertEqual(len(files), 1)
+        self.assertEqual(files[0].content, 'fun main() {}\n')
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    @mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+    def test_model_is_built_once_per_process(self):
+        """
+        Ensure repeated lookups reuse one client and registered models take precedence.
+        """
+        with mock.patch.object(llm_backends.genai, 'configure') as configure, \
+                mock.patch.object(llm_backends.genai, 'GenerativeModel') as generative_model:
+            first = model_registry.get_model('registry-test-model')
+            second = model_registry.get_model('registry-test-model')
+            self.assertIs(first, second)
+            self.assertEqual(generative_model.call_count, 1)
+            self.assertLessEqual(configure.call_count, 1)
+
+            stand_in = object()
+            model_registry.register_model('registry-test-model', stand_in)
+            self.assertIs(model_registry.get_model('registry-test-model'), stand_in)
+
+
+class CountingModel:
+    """Stand-in model that records how many calls are in flight at once."""
+    def __init__(self, failures=0, delay=0.02):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("transient")
+            return mock.Mock(text=f"answer to {prompt}")
+        finally:
+            self.in_flight -= 1
+
+
+@mock.patch('agents.llm_client.single_flight', **{'acquire.return_value': 'token'})
+@mock.patch('agents.llm_client.llm_cache', **{'get.return_value': None})
+class LLMClientTests(SimpleTestCase):
+
+    def llm_client(self, model, **kwargs):
+        client = LLMClient('client-test-model', backoff_base=0.001, backoff_max=0.001, **kwargs)
+        patcher = mock.patch('agents.llm_client.get_model', return_value=model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return client
+
+    def test_concurrency_is_bounded_by_the_semaphore(self, llm_cache, single_flight):
+        """
+        Ensure fanned-out prompts never have more calls in flight than the client allows.
+        """
+        model = CountingModel()
+        prompts = [f"prompt {i}" for i in range(8)]
+        publishing_threads = set()
+        single_flight.publish.side_effect = lambda *args: publishing_threads.add(threading.current_thread().name)
+        results = self.llm_client(model, max_concurrency=3).generate_many(prompts)
+        self.assertEqual(results, [f"answer to {prompt}" for prompt in prompts])
+        self.assertEqual(model.peak, 3)
+        self.assertEqual(single_flight.publish.call_count, 8)
+        # Results are published off the event loop's thread.
+        self.assertNotIn('llm-client-client-test-model', publishing_threads)
+
+    def test_transient_errors_are_retried_until_attempts_run_out(self, llm_cache, single_flight):
+        """
+        Ensure a failed call is retried with backoff and the last error is raised once retries are used up.
+        """
+        model = CountingModel(failures=2)
+        self.assertEqual(self.llm_client(model, max_retries=3).generate('prompt'), "answer to prompt")
+        self.assertEqual(model.calls, 3)
+
+        model = CountingModel(failures=2)
+        with self.assertRaises(ConnectionError):
+            self.llm_client(model, max_retries=2).generate('prompt')
+        self.assertEqual(model.calls, 2)
+        single_flight.fail.assert_called()
+
+    def test_locks_are_not_taken_or_kept_when_calls_cannot_start(self, llm_cache, single_flight):
+        """
+        Ensure a client that cannot start takes no lock and a failed submission releases the locks it held.
+        """
+        client = LLMClient('client-test-model')
+        with mock.patch('agents.llm_client.get_model', side_effect=ValueError('not configured')):
+            with self.assertRaises(ConnectionError):
+                client.generate_many(['a', 'b'])
+        single_flight.acquire.assert_not_called()
+
+        single_flight.acquire.side_effect = ['token-a', 'token-b']
+        llm_cache.make_digest.side_effect = lambda model, prompt: f'key-{prompt}'
+        client = self.llm_client(CountingModel())
+        def submit(coro):
+            coro.close()
+            raise ConnectionError('loop gone')
+
+        with mock.patch.object(client, '_submit', side_effect=submit):
+            with self.assertRaises(ConnectionError):
+                client.generate_many(['a', 'b'])
+        self.assertEqual(
+            sorted(call.args for call in single_flight.fail.call_args_list), [('key-a', 'token-a'), ('key-b', 'token-b')]
+        )
+
+    def test_followers_fall_back_concurrently(self, llm_cache, single_flight):
+        """
+        Ensure prompts whose leaders gave up are sent side by side and cached.
+        """
+        single_flight.acquire.return_value = None
+        single_flight.wait.return_value = None
+        model = CountingModel()
+        prompts = [f"prompt {i}" for i in range(4)]
+        self.assertEqual(self.llm_client(model).generate_many(prompts), [f"answer to {prompt}" for prompt in prompts])
+        self.assertEqual(model.peak, 4)
+        self.assertEqual(llm_cache.set.call_count, 4)
+
+
+class LLMCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.cache = LLMResponseCache(namespace='test:llm', ttl=100, max_entries=2, connection=self.redis)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """
+        Ensure a read keeps an entry alive and the cache evicts the entry read least recently.
+        """
+        with mock.patch('agents.llm_cache.time', **{'time.side_effect': itertools.count(1)}):
+            self.cache.set('model', 'a', 'A')
+            self.cache.set('model', 'b', 'B')
+            self.assertEqual(self.cache.get('model', 'a'), 'A')
+            self.cache.set('model', 'c', 'C')
+        self.assertIsNone(self.cache.get('model', 'b'))
+        self.assertEqual(self.cache.get('model', 'a'), 'A')
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_hit_restarts_the_entry_ttl(self):
+        """
+        Ensure a hit refreshes the entry's expiry along with its position in the LRU index.
+        """
+        self.cache.set('model', 'prompt', 'response')
+        key = f"test:llm:entry:{self.cache.make_digest('model', 'prompt')}"
+        self.redis.expire(key, 5)
+        self.assertEqual(self.cache.get('model', 'prompt'), 'response')
+        self.assertGreater(self.redis.ttl(key), 5)
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight(
+            namespace='test:inflight', lock_ttl=5, wait_timeout=5, connection=fakeredis.FakeRedis(decode_responses=True)
+        )
+
+    def settle_later(self, settle, *args):
+        timer = threading.Timer(0.1, settle, args)
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_followers_reuse_the_leaders_result(self):
+        """
+        Ensure only one caller leads a key and followers receive what it publishes.
+        """
+        token = self.flight.acquire('key')
+        self.assertIsNotNone(token)
+        self.assertIsNone(self.flight.acquire('key'))
+        self.settle_later(self.flight.publish, 'key', token, 'result')
+        self.assertEqual(self.flight.wait('key'), 'result')
+        # The published result also serves callers that come after it.
+        self.assertIsNone(self.flight.acquire('key'))
+
+    def test_followers_fall_back_when_the_leader_fails(self):
+        """
+        Ensure a failed leader releases its lock and waiting followers stop waiting at once.
+        """
+        token = self.flight.acquire('key')
+        self.settle_later(self.flight.fail, 'key', token)
+        started = time.monotonic()
+        self.assertIsNone(self.flight.wait('key'))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertIsNotNone(self.flight.acquire('key'))
+
+
+class FakeBackendTests(SimpleTestCase):
+
+    def test_outputs_and_latency_are_deterministic(self):
+        """
+        Ensure the fake model answers a prompt identically across instances and streams parseable files.
+        """
+        latency = llm_backends.LatencyDistribution(median=0.0, p95=0.0)
+        prompt = "Generate the full, production-ready source code for `ApplauseApp/Theme.swift` ONLY."
+        first = llm_backends.FakeModel('fake-model', latency=latency, seed=7)
+        second = llm_backends.FakeModel('fake-model', latency=latency, seed=7)
+        self.assertEqual(first.generate_content(prompt).text, second.generate_content(prompt).text)
+
+        parser = CodeBlockStreamParser()
+        files = []
+        for chunk in first.generate_content(prompt, stream=True):
+            files.extend(parser.feed(chunk.text))
+        files.extend(parser.close())
+        self.assertEqual([f.path for f in files], ['ApplauseApp/Theme.swift'])
+
+        rng = llm_backends.random.Random(1)
+        samples = sorted(llm_backends.LatencyDistribution(median=1.0, p95=3.0).sample(rng) for _ in range(2000))
+        self.assertAlmostEqual(samples[1000], 1.0, delta=0.1)
+        self.assertAlmostEqual(samples[1900], 3.0, delta=0.4)
+
+
+class PipelineTests(SimpleTestCase):
+
+    def test_independent_stages_share_a_level(self):
+        """
+        Ensure stages that only depend on earlier levels are scheduled together.
+        """
+        self.assertEqual(
+            [[stage.name for stage in level] for level in levels(BUILD_PIPELINE)],
+            [['code_generation'], ['qa', 'security_scan'], ['deployment']]
+        )
+
+    def test_invalid_graphs_are_rejected(self):
+        """
+        Ensure unknown inputs and dependency cycles raise a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            levels([Stage('a', None, inputs=('missing',))])
+        with self.assertRaises(ValueError):
+            levels([Stage('a', None, inputs=('b',)), Stage('b', None, inputs=('a',))])
+
+    def test_stages_are_routed_by_kind_and_sent_with_the_pipeline_priority(self):
+        """
+        Ensure LLM stages and bulk jobs land on separate queues and every stage carries the priority.
+        """
+        self.assertEqual(route_task('agents.tasks.generate_code_file', (), {}, {}), {'queue': 'llm'})
+        self.assertEqual(route_task('send_testimonial_requests', (), {}, {}), {'queue': 'email', 'priority': PRIORITY_BULK})
+        signature = build_signature(BUILD_PIPELINE, 'project', priority=1)
+        self.assertEqual(signature.tasks[0].options['priority'], 1)
+        self.assertEqual([task.options['priority'] for task in signature.tasks[1].tasks], [1, 1])
+
+
+class PromptBuilderTests(SimpleTestCase):
+
+    def build(self, budget_tokens):
+        builder = PromptBuilder('Test', budget_tokens=budget_tokens, record_metrics=False)
+        builder.add('task', 'Task: build the app.', priority=REQUIRED)
+        builder.add('persona', 'persona ' * 100, priority=1)
+        builder.add('survey', 'question ' * 400, priority=2, compactor=lambda text: 'three questions')
+        return builder.build()
+
+    def test_compaction_is_tried_before_truncation(self):
+        """
+        Ensure a section's compactor is used when it brings the prompt within budget.
+        """
+        prompt = self.build(300)
+        self.assertIn('three questions', prompt)
+        self.assertIn('persona ' * 100, prompt + ' ')
+        self.assertNotIn('[...truncated', prompt)
+
+    def test_least_important_sections_are_trimmed_first(self):
+        """
+        Ensure required sections survive and lower-priority sections go first when over budget.
+        """
+        prompt = self.build(150)
+        self.assertTrue(prompt.startswith('Task: build the app.'))
+        self.assertNotIn('three questions', prompt)
+        self.assertIn('[...truncated to fit the prompt budget]', prompt)
+        self.assertLessEqual(estimate_tokens(prompt), 150)
+
+
+STUB_PAGE = b"""<html><head><title>Stub Shop</title>
+<link rel="stylesheet" href="/site.css"><style>body { background: #F5F5F5; }</style>
+<script>var ignored = true;</script></head>
+<body><h1>Fresh produce</h1><p>Delivered to your door.</p></body></html>"""
+STUB_CSS = b".button { color: #0062FF; } a { color: #0062ff; }"
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+    hosts_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        self.hosts_seen.append(self.headers.get('Host'))
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', 'http://169.254.169.254/latest/meta-data/')
+            self.end_headers()
+            return
+        if self.path == '/' and self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = STUB_CSS if self.path == '/site.css' else STUB_PAGE
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(WEBSITE_FETCH_ALLOWED_NETWORKS=['127.0.0.1/32'])
+class WebsiteSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubSiteHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def test_snapshot_is_stored_and_revalidated(self):
+        """
+        Ensure the page and its CSS are stored, and a stale snapshot is revalidated with its ETag.
+        """
+        StubSiteHandler.requests_seen = []
+        snapshot = fetch_snapshot(self.url)
+        self.assertEqual(snapshot.title, 'Stub Shop')
+        self.assertIn('Fresh produce', snapshot.text)
+        self.assertNotIn('ignored', snapshot.text)
+        self.assertEqual(css_colors(snapshot.css)[0], ('#0062ff', 2))
+
+        # Fresh snapshots are served without a request; stale ones send the ETag.
+        fetch_snapshot(self.url)
+        self.assertEqual(len(StubSiteHandler.requests_seen), 2)
+        revalidated = fetch_snapshot(self.url, max_age=0)
+        self.assertEqual(StubSiteHandler.requests_seen[-1], ('/', '"v1"'))
+        self.assertEqual(revalidated.pk, snapshot.pk)
+        self.assertIn('Fresh produce', revalidated.text)
+
+    def test_non_public_addresses_are_not_fetched(self):
+        """
+        Ensure private and link-local addresses are refused, including as a redirect target.
+        """
+        StubSiteHandler.requests_seen = []
+        with self.assertRaises(BlockedURLError):
+            fetch_snapshot(self.url + 'redirect')
+        self.assertEqual(StubSiteHandler.requests_seen, [('/redirect', None)])
+        for url in ('http://169.254.169.254/latest/meta-data/', 'http://10.0.0.1/', 'file:///etc/passwd'):
+            with self.assertRaises(BlockedURLError):
+                fetch_snapshot(url)
+        with override_settings(WEBSITE_FETCH_ALLOWED_NETWORKS=[]), self.assertRaises(BlockedURLError):
+            fetch_snapshot(self.url, max_age=0)
+
+    def test_connections_use_the_checked_address(self):
+        """
+        Ensure the page is fetched from the address that was checked, not from a second lookup of its host.
+        """
+        StubSiteHandler.hosts_seen = []
+        port = self.server.server_port
+        # Only the check resolves the host to the stub site; a lookup made
+        # when connecting would fail, as .invalid names never resolve.
+        with mock.patch('agents.website_snapshot.socket', wraps=socket) as resolver:
+            resolver.getaddrinfo.return_value = [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', ('127.0.0.1', port))]
+            resolver.IPPROTO_TCP = socket.IPPROTO_TCP
+            snapshot = fetch_snapshot(f"http://rebind.invalid:{port}/")
+        self.assertEqual(snapshot.title, 'Stub Shop')
+        self.assertEqual(css_colors(snapshot.css)[0], ('#0062ff', 2))
+        self.assertEqual(set(StubSiteHandler.hosts_seen), {f"rebind.invalid:{port}"})
+
+
+class ProjectStatusTests(TestCase):
+
+    def setUp(self):
+        owner = get_user_model().objects.create_user('status@example.com', 'password')
+        self.project = Project.objects.create(owner=owner, name='Status', status=Project.ProjectStatus.QA_COMPLETE)
+
+    @override_settings(PROJECT_PROGRESS_COALESCE_SECONDS=0)
+    def test_transitions_are_conditional_single_updates(self):
+        """
+        Ensure a guarded transition is one UPDATE and is skipped when the guard does not match.
+        """
+        with self.assertNumQueries(1):
+            moved = update_project_status(
+                self.project.id, Project.ProjectStatus.DEPLOYMENT_PENDING, "Deploying...",
+                from_statuses=[Project.ProjectStatus.QA_COMPLETE]
+            )
+        self.assertTrue(moved)
+        self.assertFalse(update_project_status(
+            self.project.id, Project.ProjectStatus.COMPLETED, from_statuses=[Project.ProjectStatus.QA_COMPLETE]
+        ))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.status, Project.ProjectStatus.DEPLOYMENT_PENDING)
+
+    def test_progress_inside_an_open_window_is_buffered(self):
+        """
+        Ensure progress reported while another worker holds the window only touches Redis.
+        """
+        redis = mock.MagicMock()
+        redis.set.side_effect = lambda key, *args, **kwargs: not key.endswith(':window')
+        with mock.patch('agents.project_status.get_redis', return_value=redis), self.assertNumQueries(0):
+            report_progress(self.project.id, "Generated app/Main.kt")
+        redis.set.assert_any_call(f"project:progress:{self.project.id}:message", "Generated app/Main.kt", ex=60)
+
+    def test_buffered_progress_is_written_when_the_stage_task_ends(self):
+        """
+        Ensure the last message of a burst is not lost when nothing reports after it.
+        """
+        with mock.patch('agents.project_status.get_redis', return_value=fakeredis.FakeRedis(decode_responses=True)):
+            report_progress(self.project.id, "Running security scan...")
+            report_progress(self.project.id, "Security scan passed.")
+            self.project.refresh_from_db()
+            self.assertEqual(self.project.status_message, "Running security scan...")
+            record_stage_end(task=run_security_scan, task_id='scan', args=(self.project.id,), state=states.SUCCESS)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.status_message, "Security scan passed.")
+
+
+class StageEventTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        owner = get_user_model().objects.create_user('stages@example.com', 'password')
+        self.project = Project.objects.create(owner=owner, name='Stages')
+
+    def log(self, stage, event, seconds_ago, duration_ms=None):
+        started_at = timezone.now() - timedelta(seconds=seconds_ago)
+        ProjectStageEvent.objects.create(
+            project=self.project, stage=stage, event=event, started_at=started_at,
+            finished_at=started_at + timedelta(milliseconds=duration_ms) if duration_ms is not None else None,
+            duration_ms=duration_ms,
+        )
+
+    def test_percentile_is_nearest_rank(self):
+        """
+        Ensure percentiles take the smallest value with at least pct% of the values at or below it.
+        """
+        self.assertEqual(percentile(range(1, 101), 95), 95)
+        self.assertEqual(percentile(range(1, 101), 99), 99)
+        self.assertEqual(percentile([20, 10], 50), 10)
+        self.assertEqual(percentile(range(1, 7), 50), 3)
+        self.assertEqual(percentile([7], 0), 7)
+
+    def test_stage_tasks_append_start_and_end_events(self):
+        """
+        Ensure running a stage task logs a STARTED and a SUCCEEDED row with the duration.
+        """
+        complete_analysis.apply(args=(self.project.id,), throw=True)
+        events = list(self.project.stage_events.values_list('stage', 'event', 'attempt'))
+        self.assertEqual(events, [('analysis_complete', 'STARTED', 1), ('analysis_complete', 'SUCCEEDED', 1)])
+        self.assertIsNotNone(self.project.stage_events.last().duration_ms)
+        with self.assertRaises(ValueError):
+            self.project.stage_events.first().save()
+
+    def test_eta_sums_the_slowest_remaining_stage_of_each_level(self):
+        """
+        Ensure the ETA credits elapsed time and counts parallel stages once.
+        """
+        for duration_ms in (1000, 2000, 3000):
+            self.log('website', 'SUCCEEDED', 60, duration_ms)
+            self.log('persona', 'SUCCEEDED', 60, duration_ms * 10)
+            self.log('palette', 'SUCCEEDED', 60, duration_ms * 5)
+            self.log('analysis_complete', 'SUCCEEDED', 60, 100)
+        self.assertEqual(stage_duration_stats()['persona']['p50_ms'], 20000)
+
+        ProjectStageEvent.objects.all().delete()
+        self.log('website', 'SUCCEEDED', 30, 2000)
+        self.log('persona', 'STARTED', 5)
+        eta = estimate_completion(self.project)
+        self.assertEqual(eta['pipeline'], 'analysis')
+        self.assertEqual(eta['running_stages'], ['persona'])
+        self.assertEqual(eta['slowest_stage'], 'persona')
+        # persona has ~15s left, palette 10s alongside it, then analysis_complete.
+        self.assertAlmostEqual(eta['eta_seconds'], 15.1, delta=0.5)
+
+    def test_resume_plan_skips_succeeded_stages(self):
+        """
+        Ensure a resumed build restarts at the failed stage with the status its finished stages left.
+        """
+        self.log('code_generation', 'SUCCEEDED', 60, 1000)
+        self.log('qa', 'FAILED', 10, 500)
+        stages, status = resume_plan(self.project)
+        self.assertEqual([stage.name for stage in stages], ['qa', 'security_scan', 'deployment'])
+        self.assertEqual(stages[0].inputs, ())
+        self.assertEqual(status, Project.ProjectStatus.CODE_GENERATION)
+
+
+class CheckpointTests(TestCase):
+
+    def test_step_runs_once_per_inputs(self):
+        """
+        Ensure a checkpointed step is reused for the same inputs and re-run for new ones.
+        """
+        owner = get_user_model().objects.create_user('checkpoints@example.com', 'password')
+        project = Project.objects.create(owner=owner, name='Checkpoints')
+        compute = mock.Mock(side_effect=['first', 'second'])
+        self.assertEqual(checkpointed(project.id, 'persona', 'persona_document', compute, 'prompt'), 'first')
+        self.assertEqual(checkpointed(project.id, 'persona', 'persona_document', compute, 'prompt'), 'first')
+        self.assertEqual(checkpointed(project.id, 'persona', 'persona_document', compute, 'new prompt'), 'second')
+        self.assertEqual(compute.call_count, 2)
+
+
+@override_settings(LLM_BACKEND='fake', LLM_FAKE_FILES_PER_PLATFORM=2)
+class CodeGenerationTests(TestCase):
+
+    def setUp(self):
+        owner = get_user_model().objects.create_user('codegen@example.com', 'password')
+        self.project = Project.objects.create(owner=owner, name='Code Generation', app_type='BOTH')
+        model = llm_backends.FakeModel('fake-code-model', latency=llm_backends.LatencyDistribution(median=0.0, p95=0.0))
+        patcher = mock.patch('agents.base_agent.get_model', return_value=model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_manifest_keeps_files_of_targeted_platforms_only(self):
+        """
+        Ensure unknown, untargeted and duplicate files are dropped and a missing platform is rejected.
+        """
+        response = """{"files": [
+            {"platform": "Android", "path": "Main.kt", "purpose": "Entry point.", "depends_on": ["persona", "bogus"]},
+            {"platform": "ios", "path": "Main.swift"},
+            {"platform": "Web", "path": "index.js"},
+            {"platform": "Android", "path": "Main.kt"}
+        ]}"""
+        agent = CodeGenAgent()
+        manifest = agent._parse_manifest(response, 'BOTH')
+        self.assertEqual([(entry['platform'], entry['path']) for entry in manifest], [('Android', 'Main.kt'), ('iOS', 'Main.swift')])
+        self.assertEqual(manifest[0]['depends_on'], ['persona'])
+        self.assertEqual(manifest[1]['language'], 'swift')
+        self.assertEqual(manifest[1]['depends_on'], ['persona', 'brand_palette', 'ux_survey', 'pmf_survey'])
+
+        self.assertEqual([entry['path'] for entry in agent._parse_manifest(response, 'ANDROID')], ['Main.kt'])
+        with self.assertRaises(ValueError):
+            agent._parse_manifest('{"files": [{"platform": "Android", "path": "Main.kt"}]}', 'IOS')
+
+    def test_manifest_drops_paths_outside_the_project(self):
+        """
+        Ensure paths are normalized and absolute or climbing paths are dropped before they can become ZIP entry names.
+        """
+        response = json.dumps({'files': [
+            {'platform': 'Android', 'path': path}
+            for path in ('../../etc/cron.d/job', '/etc/passwd', 'C:\\evil.kt', 'app/../../x.kt', 'app\\src\\Main.kt', './app//ui/Home.kt')
+        ]})
+        manifest = CodeGenAgent()._parse_manifest(response, 'ANDROID')
+        self.assertEqual([entry['path'] for entry in manifest], ['app/src/Main.kt', 'app/ui/Home.kt'])
+
+    def test_plan_fans_out_one_task_per_file(self):
+        """
+        Ensure code generation plans once and replaces itself with a chord of one task per planned file.
+        """
+        with mock.patch.object(run_code_generation, 'replace') as replace:
+            run_code_generation.apply(args=[self.project.id])
+        signature = replace.call_args.args[0]
+        paths = [task.args[1]['path'] for task in signature.tasks]
+        self.assertEqual(len(paths), 4)
+        self.assertEqual(len(set(paths)), 4)
+        self.assertEqual(signature.body.task, 'agents.tasks.assemble_generated_code')
+        self.assertEqual([entry['path'] for entry in signature.body.args[1]], paths)
+
+
+class RegenerationTests(TestCase):
+
+    def test_only_files_whose_inputs_changed_are_regenerated(self):
+        """
+        Ensure a palette change only marks the files that depend on the palette as stale.
+        """
+        owner = get_user_model().objects.create_user('regeneration@example.com', 'password')
+        project = Project.objects.create(
+            owner=owner, name='Regeneration', app_type='ANDROID', brand_palette={'primary': '#000000'}
+        )
+        digests = input_digests(project)
+        for path, dependencies in (('Theme.kt', ['brand_palette']), ('MainScreen.kt', ['persona'])):
+            MobileApp.objects.create(
+                project=project, platform='Android', file_path=path, language='kotlin', code_snippet=f'// {path}',
+                input_digests={name: digests[name] for name in ['app_type', 'source_url'] + dependencies},
+            )
+        create_build(project.id)
+
+        manifest, stale = plan_regeneration(project.id)
+        self.assertEqual(len(manifest), 2)
+        self.assertEqual(stale, [])
+
+        Project.objects.filter(id=project.id).update(brand_palette={'primary': '#FFFFFF'})
+        manifest, stale = plan_regeneration(project.id)
+        self.assertEqual([entry['path'] for entry in stale], ['Theme.kt'])
+        self.assertEqual(stale[0]['depends_on'], ['brand_palette'])
+
+        Project.objects.filter(id=project.id).update(app_type='BOTH')
+        self.assertIsNone(plan_regeneration(project.id))
+
+    @mock.patch('agents.base_agent.get_model')
+    def test_full_rebuild_drops_files_missing_from_the_new_plan(self, get_model):
+        """
+        Ensure files of a platform the new plan dropped are deleted and left out of the build.
+        """
+        storage_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_root, ignore_errors=True)
+        self.enterContext(override_settings(STORAGES={
+            **settings.STORAGES,
+            'artifacts': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': storage_root}},
+        }))
+        owner = get_user_model().objects.create_user('replan@example.com', 'password')
+        project = Project.objects.create(owner=owner, name='Re-plan', app_type='BOTH')
+        for platform, path in (('Android', 'Main.kt'), ('iOS', 'Main.swift')):
+            MobileApp.objects.create(project=project, platform=platform, file_path=path, language='kotlin', code_snippet=f'// {path}')
+        self.assertEqual(create_build(project.id).file_count, 2)
+
+        Project.objects.filter(id=project.id).update(app_type='ANDROID')
+        manifest = [{'platform': 'Android', 'path': 'Main.kt', 'language': 'kotlin', 'purpose': '', 'depends_on': []}]
+        assemble_generated_code(['Main.kt'], project.id, manifest)
+
+        build = project.builds.order_by('-build_number').first()
+        self.assertEqual([(entry['platform'], entry['path']) for entry in build.files], [('Android', 'Main.kt')])
+        self.assertEqual(list(MobileApp.objects.filter(project=project).values_list('file_path', flat=True)), ['Main.kt'])
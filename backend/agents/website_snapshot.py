@@ -0,0 +1,300 @@
+import gzip
+import hashlib
+import ipaddress
+import os
+import re
+import socket
+import threading
+from collections import Counter
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .models import WebsiteSnapshot
+
+USER_AGENT = "ApplauseBot/1.0 (+https://applaude.ai)"
+
+# Tags whose content is not visible page text.
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template', 'svg'}
+
+CSS_COLOR_RE = re.compile(r'#(?:[0-9a-fA-F]{6}|[0-9a-fA-F]{3})\b|rgba?\([^)]*\)|hsla?\([^)]*\)')
+
+
+
+class BlockedURLError(requests.exceptions.InvalidURL):
+    """A URL that resolves to an address the workers must not fetch from."""
+
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """
+    Connects requests that carry a `pinned_address` to that address instead
+    of resolving their host again, so the host cannot resolve to a different
+    address between `check_url` and the connection (DNS rebinding). TLS
+    still uses the URL's host name for SNI and certificate checks.
+    """
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        address = getattr(request, 'pinned_address', None)
+        if address:
+            hostname = host_params['host']
+            host_params['host'] = address
+            if host_params['scheme'] == 'https':
+                pool_kwargs['server_hostname'] = hostname
+                pool_kwargs['assert_hostname'] = hostname
+        return host_params, pool_kwargs
+
+
+_session_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide HTTP session, so connections to a site are
+    pooled across fetches. Rebuilt after a fork, like the Redis client.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=('GET',))
+            adapter = PinnedAddressAdapter(pool_connections=16, pool_maxsize=16, max_retries=retries)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+class _PageParser(HTMLParser):
+    """Collects the visible text, title, inline CSS and stylesheet links of a page."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ''
+        self.text = []
+        self.css = []
+        self.stylesheets = []
+        self._skipping = 0
+        self._in_title = False
+        self._in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+            self._in_style = tag == 'style'
+        elif tag == 'title':
+            self._in_title = True
+        elif tag == 'link' and 'stylesheet' in (attrs.get('rel') or '').lower() and attrs.get('href'):
+            self.stylesheets.append(attrs['href'])
+        if attrs.get('style'):
+            self.css.append(attrs['style'])
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+            self._in_style = False
+        elif tag == 'title':
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            self.css.append(data)
+        if self._skipping:
+            return
+        if self._in_title:
+            self.title += data.strip()
+        elif data.strip():
+            self.text.append(' '.join(data.split()))
+
+
+def check_url(url: str) -> str:
+    """
+    Rejects URLs the workers must not fetch: anything but http(s), and hosts
+    that resolve to a private, loopback, link-local or otherwise non-public
+    address (such as the cloud instance-metadata service), unless the
+    address is in WEBSITE_FETCH_ALLOWED_NETWORKS.
+
+    Returns:
+        The checked address to connect to.
+
+    Raises:
+        BlockedURLError: If the URL is not safe to fetch.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise BlockedURLError(f"Only http(s) URLs can be fetched: {url}")
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = list(dict.fromkeys(
+            info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)
+        ))
+    except (OSError, ValueError) as e:
+        raise BlockedURLError(f"Could not resolve {parts.hostname}: {e}") from e
+
+    allowed = [ipaddress.ip_network(network) for network in getattr(settings, 'WEBSITE_FETCH_ALLOWED_NETWORKS', [])]
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global and not any(ip in network for network in allowed):
+            raise BlockedURLError(f"{parts.hostname} resolves to a non-public address ({ip}).")
+    return addresses[0].split('%')[0]
+
+
+def _get(session, url: str, headers=None, **kwargs):
+    """
+    GETs a URL, following redirects by hand so every hop is checked with
+    `check_url` first and connects to the address it checked (see
+    PinnedAddressAdapter). At most WEBSITE_FETCH_MAX_REDIRECTS are followed.
+    """
+    for _ in range(getattr(settings, 'WEBSITE_FETCH_MAX_REDIRECTS', 5) + 1):
+        address = check_url(url)
+        request = session.prepare_request(requests.Request('GET', url, headers=headers))
+        parts = urlsplit(url)
+        request.headers['Host'] = parts.netloc.rpartition('@')[2]
+        request.pinned_address = address
+        response = session.send(request, allow_redirects=False, stream=True, **kwargs)
+        if not response.is_redirect:
+            return response
+        url = urljoin(url, response.headers['Location'])
+        response.close()
+    raise requests.TooManyRedirects(f"Too many redirects fetching {url}.")
+
+
+def _url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def _read_limited(response, limit: int) -> str:
+    """Reads at most `limit` bytes of a streamed response body."""
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=65536):
+        body.extend(chunk)
+        if len(body) >= limit:
+            break
+    response.close()
+    return bytes(body[:limit]).decode(response.encoding or 'utf-8', errors='replace')
+
+
+def get_snapshot(url: str):
+    """Returns the stored snapshot for a URL, or None if it was never fetched."""
+    if not url:
+        return None
+    return WebsiteSnapshot.objects.filter(url_hash=_url_hash(url)).first()
+
+
+def fetch_snapshot(url: str, max_age: int = None) -> WebsiteSnapshot:
+    """
+    Downloads a website into its shared snapshot.
+
+    A snapshot checked within `max_age` seconds is returned without any
+    request. Older snapshots are revalidated with the stored ETag and
+    Last-Modified validators, so an unchanged site costs a single 304.
+    The page and its stylesheets are untrusted, so every request and
+    redirect is checked with `check_url`.
+
+    Args:
+        url (str): The page to fetch.
+        max_age (int): Seconds a snapshot is trusted without revalidation;
+            defaults to WEBSITE_SNAPSHOT_MAX_AGE_SECONDS.
+    """
+    max_age = getattr(settings, 'WEBSITE_SNAPSHOT_MAX_AGE_SECONDS', 86400) if max_age is None else max_age
+    timeout = getattr(settings, 'WEBSITE_FETCH_TIMEOUT_SECONDS', 10)
+    max_bytes = getattr(settings, 'WEBSITE_FETCH_MAX_BYTES', 2 * 1024 * 1024)
+    now = timezone.now()
+
+    snapshot = get_snapshot(url)
+    if snapshot and (now - snapshot.checked_at).total_seconds() < max_age:
+        return snapshot
+
+    headers = {}
+    if snapshot and snapshot.etag:
+        headers['If-None-Match'] = snapshot.etag
+    if snapshot and snapshot.last_modified:
+        headers['If-Modified-Since'] = snapshot.last_modified
+
+    session = get_session()
+    response = _get(session, url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and snapshot:
+        response.close()
+        snapshot.checked_at = now
+        snapshot.save(update_fields=['checked_at'])
+        return snapshot
+    response.raise_for_status()
+    html = _read_limited(response, max_bytes)
+
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+    css = list(parser.css)
+    for href in parser.stylesheets[:getattr(settings, 'WEBSITE_FETCH_MAX_STYLESHEETS', 5)]:
+        try:
+            stylesheet = _get(session, urljoin(response.url, href), timeout=timeout)
+            stylesheet.raise_for_status()
+            css.append(_read_limited(stylesheet, max_bytes))
+        except requests.RequestException as e:
+            print(f"Could not fetch stylesheet {href} for {url}: {e}")
+    css = "\n".join(css)
+    text = "\n".join(parser.text)
+
+    snapshot, _ = WebsiteSnapshot.objects.update_or_create(
+        url_hash=_url_hash(url),
+        defaults={
+            'url': url,
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'title': parser.title[:512],
+            'html_gz': gzip.compress(html.encode('utf-8')),
+            'css_gz': gzip.compress(css.encode('utf-8')),
+            'text_gz': gzip.compress(text.encode('utf-8')),
+            'raw_bytes': len(html.encode('utf-8')) + len(css.encode('utf-8')),
+            'fetched_at': now,
+            'checked_at': now,
+        }
+    )
+    return snapshot
+
+
+def css_colors(css: str, limit: int = 12) -> list:
+    """The most frequent colors declared in a stylesheet, as (color, count) pairs."""
+    return Counter(color.lower().replace(' ', '') for color in CSS_COLOR_RE.findall(css)).most_common(limit)
+
+
+def content_context(url: str, max_chars: int = None) -> str:
+    """
+    The page title and visible text of a site's snapshot, for analysis
+    prompts. Empty when the site has not been fetched.
+    """
+    snapshot = get_snapshot(url)
+    if not snapshot:
+        return ''
+    max_chars = max_chars or getattr(settings, 'WEBSITE_PROMPT_TEXT_CHARS', 6000)
+    return f"""
+        **Website Snapshot (fetched {snapshot.fetched_at:%Y-%m-%d}):**
+        - **Title:** {snapshot.title}
+        - **Visible Text (excerpt):**
+        {snapshot.text[:max_chars]}
+        """
+
+
+def design_context(url: str) -> str:
+    """
+    The colors declared in a site's CSS, most frequent first, for palette
+    prompts. Empty when the site has not been fetched or declares no colors.
+    """
+    snapshot = get_snapshot(url)
+    colors = css_colors(snapshot.css) if snapshot else []
+    if not colors:
+        return ''
+    listed = ", ".join(f"{color} ({count})" for color, count in colors)
+    return f"""
+        **Colors declared in the website's CSS (most frequent first):** {listed}
+        """
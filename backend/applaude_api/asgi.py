@@ -3,7 +3,6 @@ import django
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
-import apps.projects.routing
 
 # Set the default settings module for the 'asgi' program.
 # It's crucial this points to your production settings in the deployed environment.
@@ -15,11 +14,15 @@ django.setup()
 # The default ASGI application for standard HTTP requests
 django_asgi_app = get_asgi_application()
 
+# The websocket routes import consumers and models, so they can only be
+# loaded once the app registry is ready.
+import apps.api.routing  # noqa: E402
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            apps.projects.routing.websocket_urlpatterns
+            apps.api.routing.websocket_urlpatterns
         )
     ),
 })
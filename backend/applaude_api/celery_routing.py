@@ -0,0 +1,71 @@
+"""
+Celery queue topology.
+
+Tasks are routed to a queue by name, so each worker profile in
+supervisord.conf only consumes the kind of work it is sized for:
+
+- `llm`: pipeline stages that wait on the language model.
+- `io`: pipeline stages that fetch websites or only touch the database.
+- `email`: outgoing mail.
+- `analytics`: feedback and usage aggregation.
+- `default`: anything not listed below.
+
+Within a queue, messages are ordered by priority (0 is served first).
+Pipelines are started with a priority that reflects who is waiting on
+them, and background queues default to PRIORITY_BULK.
+"""
+from kombu import Queue
+
+DEFAULT_QUEUE = 'default'
+LLM_QUEUE = 'llm'
+IO_QUEUE = 'io'
+EMAIL_QUEUE = 'email'
+ANALYTICS_QUEUE = 'analytics'
+
+TASK_QUEUES = tuple(Queue(name) for name in (DEFAULT_QUEUE, LLM_QUEUE, IO_QUEUE, EMAIL_QUEUE, ANALYTICS_QUEUE))
+
+PRIORITY_PARTNER = 0     # Projects created by API partners.
+PRIORITY_SUBSCRIBER = 1  # Builds paid for by a monthly or yearly plan.
+PRIORITY_PAID = 2        # Builds paid for once.
+PRIORITY_STANDARD = 5    # Free analysis of a new project.
+PRIORITY_BULK = 8        # Background jobs nobody is waiting on.
+
+# Build priority by `Payment.PlanType`.
+PLAN_PRIORITIES = {
+    'ONETIME': PRIORITY_PAID,
+    'MONTHLY': PRIORITY_SUBSCRIBER,
+    'YEARLY': PRIORITY_SUBSCRIBER,
+}
+
+TASK_ROUTES = {
+    'agents.tasks.run_market_analysis': LLM_QUEUE,
+    'agents.tasks.run_design_analysis': LLM_QUEUE,
+    'agents.tasks.run_code_generation': LLM_QUEUE,
+    'agents.tasks.generate_code_file': LLM_QUEUE,
+    'agents.tasks.fetch_website': IO_QUEUE,
+    'agents.tasks.complete_analysis': IO_QUEUE,
+    'agents.tasks.assemble_generated_code': IO_QUEUE,
+    'agents.tasks.run_qa_check': IO_QUEUE,
+    'agents.tasks.run_security_scan': IO_QUEUE,
+    'agents.tasks.run_deployment': IO_QUEUE,
+    'apps.api.tasks.release_partner_pipeline': IO_QUEUE,
+    'apps.api.tasks.dispatch_partner_pipelines': IO_QUEUE,
+    'send_testimonial_requests': EMAIL_QUEUE,
+    'apps.users.tasks.send_project_reminder_emails': EMAIL_QUEUE,
+    'agents.tasks.process_feedback_data': ANALYTICS_QUEUE,
+    'apps.api.tasks.flush_usage_counters': ANALYTICS_QUEUE,
+}
+
+BULK_QUEUES = {EMAIL_QUEUE, ANALYTICS_QUEUE}
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router: picks the queue for a task by name. Background queues get
+    PRIORITY_BULK unless the caller set a priority, which always wins.
+    """
+    queue = TASK_ROUTES.get(name, DEFAULT_QUEUE)
+    route = {'queue': queue}
+    if queue in BULK_QUEUES:
+        route['priority'] = PRIORITY_BULK
+    return route
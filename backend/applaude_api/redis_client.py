@@ -0,0 +1,24 @@
+import os
+import threading
+
+import redis
+from django.conf import settings
+
+_lock = threading.Lock()
+_connection = None
+_connection_pid = None
+
+
+def get_redis():
+    """
+    Returns a process-wide Redis client backed by a connection pool.
+
+    The pool is rebuilt after a fork so Celery prefork children never share
+    sockets with their parent.
+    """
+    global _connection, _connection_pid
+    with _lock:
+        if _connection is None or _connection_pid != os.getpid():
+            _connection = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            _connection_pid = os.getpid()
+        return _connection
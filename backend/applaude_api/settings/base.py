@@ -2,6 +2,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from applaude_api.celery_routing import DEFAULT_QUEUE, PRIORITY_STANDARD, TASK_QUEUES
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -106,6 +108,31 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Generated code artifacts (see apps.projects.artifacts), stored by content
+# hash on the local filesystem or in any S3-compatible bucket.
+ARTIFACT_STORAGE = os.environ.get("ARTIFACT_STORAGE", "local")
+if ARTIFACT_STORAGE == "s3":
+    ARTIFACT_STORAGE_CONFIG = {
+        "BACKEND": "storages.backends.s3.S3Storage",
+        "OPTIONS": {
+            "bucket_name": os.environ.get("ARTIFACT_S3_BUCKET"),
+            "endpoint_url": os.environ.get("ARTIFACT_S3_ENDPOINT_URL") or None,
+            "file_overwrite": False,
+            "default_acl": None,
+        },
+    }
+else:
+    ARTIFACT_STORAGE_CONFIG = {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": os.environ.get("ARTIFACT_STORAGE_ROOT") or BASE_DIR / "artifacts"},
+    }
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "artifacts": ARTIFACT_STORAGE_CONFIG,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -145,3 +172,99 @@ CORS_URLS_REGEX = r'^/api/.*$'
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+API_USAGE_FLUSH_INTERVAL_SECONDS = int(os.environ.get("API_USAGE_FLUSH_INTERVAL_SECONDS", 60))
+API_PARTNER_DISPATCH_INTERVAL_SECONDS = int(os.environ.get("API_PARTNER_DISPATCH_INTERVAL_SECONDS", 60))
+CELERY_BEAT_SCHEDULE = {
+    'flush-api-usage-counters': {
+        'task': 'apps.api.tasks.flush_usage_counters',
+        'schedule': API_USAGE_FLUSH_INTERVAL_SECONDS,
+    },
+    'dispatch-partner-pipelines': {
+        'task': 'apps.api.tasks.dispatch_partner_pipelines',
+        'schedule': API_PARTNER_DISPATCH_INTERVAL_SECONDS,
+    },
+}
+
+# Queues, routes and priorities (see applaude_api.celery_routing). Redis
+# emulates priorities with one list per priority step; a prefetch of one
+# lets a worker pick up urgent work as soon as it frees a slot. Tasks sent
+# from a task (code generation's file fan-out, chord callbacks) keep the
+# priority their pipeline was started with.
+CELERY_TASK_DEFAULT_QUEUE = DEFAULT_QUEUE
+CELERY_TASK_QUEUES = TASK_QUEUES
+CELERY_TASK_ROUTES = ('applaude_api.celery_routing.route_task',)
+CELERY_TASK_DEFAULT_PRIORITY = PRIORITY_STANDARD
+CELERY_TASK_INHERIT_PARENT_PRIORITY = True
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Redis (shared by the LLM response cache and other hot-path counters)
+REDIS_URL = os.environ.get("REDIS_URL", CELERY_BROKER_URL)
+
+# Channels (live project progress over `ProjectStatusConsumer`)
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [REDIS_URL],
+        },
+    },
+}
+
+# Generative AI client
+# 'gemini' calls the provider; 'fake' returns canned outputs after a seeded,
+# log-normal latency (used by tests and `manage.py benchmark_pipeline`).
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+LLM_FAKE_SEED = int(os.environ.get("LLM_FAKE_SEED", 0))
+LLM_FAKE_LATENCY_MEDIAN_SECONDS = float(os.environ.get("LLM_FAKE_LATENCY_MEDIAN_SECONDS", 0.05))
+LLM_FAKE_LATENCY_P95_SECONDS = float(os.environ.get("LLM_FAKE_LATENCY_P95_SECONDS", 0.25))
+LLM_FAKE_FILES_PER_PLATFORM = int(os.environ.get("LLM_FAKE_FILES_PER_PLATFORM", 4))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", 1.0))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", 30.0))
+
+# Prompt size accounting (see agents.prompt_builder)
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get("LLM_PROMPT_TOKEN_BUDGET", 8000))
+LLM_PROMPT_METRICS_ENABLED = os.environ.get("LLM_PROMPT_METRICS_ENABLED", "True").lower() in ("true", "1", "t")
+
+# Informational project status messages written within this window are
+# coalesced into a single row update (see agents.project_status).
+PROJECT_PROGRESS_COALESCE_SECONDS = float(os.environ.get("PROJECT_PROGRESS_COALESCE_SECONDS", 2.0))
+
+# Website snapshots shared by the analysis agents (see agents.website_snapshot)
+WEBSITE_SNAPSHOT_MAX_AGE_SECONDS = int(os.environ.get("WEBSITE_SNAPSHOT_MAX_AGE_SECONDS", 86400))
+WEBSITE_FETCH_TIMEOUT_SECONDS = int(os.environ.get("WEBSITE_FETCH_TIMEOUT_SECONDS", 10))
+WEBSITE_FETCH_MAX_BYTES = int(os.environ.get("WEBSITE_FETCH_MAX_BYTES", 2 * 1024 * 1024))
+WEBSITE_FETCH_MAX_STYLESHEETS = int(os.environ.get("WEBSITE_FETCH_MAX_STYLESHEETS", 5))
+WEBSITE_PROMPT_TEXT_CHARS = int(os.environ.get("WEBSITE_PROMPT_TEXT_CHARS", 6000))
+WEBSITE_FETCH_MAX_REDIRECTS = int(os.environ.get("WEBSITE_FETCH_MAX_REDIRECTS", 5))
+# Only public addresses are fetched; these comma-separated CIDR networks are
+# let through as well (e.g. 127.0.0.1/32 for a local test site).
+WEBSITE_FETCH_ALLOWED_NETWORKS = [network for network in os.environ.get("WEBSITE_FETCH_ALLOWED_NETWORKS", "").split(",") if network]
+
+# Generative AI response cache
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+LLM_CACHE_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", 86400))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 10000))
+LLM_CACHE_MAX_VALUE_BYTES = int(os.environ.get("LLM_CACHE_MAX_VALUE_BYTES", 1024 * 1024))
+
+# Coalescing of identical in-flight generative AI requests across workers
+LLM_SINGLE_FLIGHT_ENABLED = os.environ.get("LLM_SINGLE_FLIGHT_ENABLED", "True").lower() in ("true", "1", "t")
+LLM_SINGLE_FLIGHT_LOCK_SECONDS = int(os.environ.get("LLM_SINGLE_FLIGHT_LOCK_SECONDS", 180))
+LLM_SINGLE_FLIGHT_WAIT_SECONDS = int(os.environ.get("LLM_SINGLE_FLIGHT_WAIT_SECONDS", 120))
+
+# Fair scheduling of API partner pipelines (see apps.api.scheduler)
+API_PARTNER_MAX_CONCURRENT_PIPELINES = int(os.environ.get("API_PARTNER_MAX_CONCURRENT_PIPELINES", 20))
+API_CLIENT_MAX_CONCURRENT_PIPELINES = int(os.environ.get("API_CLIENT_MAX_CONCURRENT_PIPELINES", 3))
+API_PARTNER_PIPELINE_LEASE_SECONDS = int(os.environ.get("API_PARTNER_PIPELINE_LEASE_SECONDS", 3600))
+API_BULK_CREATE_MAX_PROJECTS = int(os.environ.get("API_BULK_CREATE_MAX_PROJECTS", 500))
+
+# Cache of authenticated API keys (see apps.api.key_cache)
+API_KEY_CACHE_SECONDS = int(os.environ.get("API_KEY_CACHE_SECONDS", 60))
+API_KEY_LOCAL_CACHE_SECONDS = int(os.environ.get("API_KEY_LOCAL_CACHE_SECONDS", 10))
+API_KEY_LOCAL_CACHE_SIZE = int(os.environ.get("API_KEY_LOCAL_CACHE_SIZE", 1024))
@@ -15,6 +15,7 @@ urlpatterns = [
     # API V1
     path('api/v1/users/', include('apps.users.urls')),
     path('api/v1/projects/', include('apps.projects.urls')),
+    path('api/v1/partners/', include('apps.api.urls')),
 
     # API Schema (Swagger/Redoc)
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -1,14 +1,35 @@
-from django.contrib import admin
-from .models import ApiClient
+from django.contrib import admin, messages
+from .models import ApiClient, ApiUsage
 
 @admin.register(ApiClient)
 class ApiClientAdmin(admin.ModelAdmin):
     list_display = ('business_name', 'user', 'is_active', 'apps_created_count', 'created_at')
     list_filter = ('is_active', 'created_at')
-    search_fields = ('business_name', 'user__username', 'user__email', 'api_key')
-    readonly_fields = ('api_key', 'created_at', 'updated_at')
+    search_fields = ('business_name', 'user__email', 'key_prefix')
+    readonly_fields = ('key_prefix', 'created_at', 'updated_at')
+    actions = ('issue_api_key', 'deactivate_clients')
     fieldsets = (
         ('Client Information', {'fields': ('user', 'business_name', 'website_link')}),
-        ('API Details', {'fields': ('api_key', 'is_active', 'apps_created_count')}),
+        ('API Details', {'fields': ('key_prefix', 'is_active', 'apps_created_count')}),
+        ('Scheduling', {'fields': ('max_concurrent_pipelines', 'scheduling_weight')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
+
+    @admin.action(description="Issue a new API key (the old one stops working)")
+    def issue_api_key(self, request, queryset):
+        for api_client in queryset:
+            raw_key = api_client.issue_key()
+            self.message_user(request, f"New API key for {api_client}: {raw_key} (it will not be shown again)", messages.WARNING)
+
+    @admin.action(description="Deactivate selected clients")
+    def deactivate_clients(self, request, queryset):
+        for api_client in queryset:
+            api_client.deactivate()
+
+
+@admin.register(ApiUsage)
+class ApiUsageAdmin(admin.ModelAdmin):
+    list_display = ('client', 'date', 'metric', 'count', 'updated_at')
+    list_filter = ('metric', 'date')
+    search_fields = ('client__business_name',)
+    readonly_fields = ('client', 'date', 'metric', 'count', 'updated_at')
@@ -1,23 +1,77 @@
+import hmac
+
+from django.contrib.auth import get_user_model
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
-from .models import ApiClient
+from . import key_cache, metering
+from .models import ApiClient, ApiUsage, hash_api_key
+
+User = get_user_model()
+
+# Fields kept in the cached principal. Views and the scheduler only read
+# these; anything else is loaded from the database on first access.
+CLIENT_FIELDS = ('id', 'user_id', 'business_name', 'is_active', 'max_concurrent_pipelines', 'scheduling_weight', 'key_hash')
+USER_FIELDS = ('id', 'email', 'is_active')
+
 
 class APIKeyAuthentication(BaseAuthentication):
     """
     Custom authentication class for API key validation.
     Authenticates against the `X-API-Key` header.
+
+    Resolved clients are cached by key hash (see apps.api.key_cache), so a
+    busy partner's requests do not touch the database to authenticate.
     """
     def authenticate(self, request):
         api_key = request.headers.get('X-API-Key')
         if not api_key:
             return None # No API key provided
 
-        try:
-            api_client = ApiClient.objects.get(api_key=api_key, is_active=True)
-        except ApiClient.DoesNotExist:
-            raise AuthenticationFailed('Invalid API Key or Inactive Client')
+        key_hash = hash_api_key(api_key)
+        principal = key_cache.get(key_hash)
+        if principal is None:
+            principal = self._load_principal(api_key, key_hash)
+            if principal is None:
+                raise AuthenticationFailed('Invalid API Key or Inactive Client')
+            key_cache.store(key_hash, principal)
 
+        api_client = self._build_client(principal)
+        metering.record(api_client.id, ApiUsage.Metric.API_REQUESTS)
         return (api_client.user, None) # Return user and no auth token
 
     def authenticate_header(self, request):
         return 'X-API-Key'
+
+    @staticmethod
+    def _load_principal(api_key, key_hash):
+        candidates = ApiClient.objects.filter(
+            key_prefix=api_key[:ApiClient.KEY_PREFIX_LENGTH], is_active=True, user__is_active=True
+        ).select_related('user')
+        for api_client in candidates:
+            if hmac.compare_digest(api_client.key_hash or '', key_hash):
+                return {
+                    'client': {field: getattr(api_client, field) for field in CLIENT_FIELDS},
+                    'user': {field: getattr(api_client.user, field) for field in USER_FIELDS},
+                }
+        return None
+
+    @staticmethod
+    def _build_client(principal):
+        """
+        Rebuilds the client and its user from a cached principal, linked
+        both ways, as if they had been loaded with `only()`.
+        """
+        user = _from_principal(User, principal['user'])
+        api_client = _from_principal(ApiClient, principal['client'])
+        api_client.user = user
+        ApiClient.user.field.remote_field.set_cached_value(user, api_client)
+        return api_client
+
+
+def _from_principal(model, values):
+    # from_db takes the loaded values in the model's field order. Principals
+    # read back from Redis hold JSON types, e.g. UUIDs as strings.
+    fields = [field for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(
+        'default', [field.attname for field in fields], [field.to_python(values[field.attname]) for field in fields]
+    )
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from applaude_api.redis_client import get_redis
+
+NAMESPACE = 'api-key'
+
+
+class LocalLRU:
+    """
+    Small thread-safe LRU with a per-entry TTL, kept in each process in
+    front of Redis. Its TTL is short because other processes cannot reach
+    it to invalidate an entry.
+    """
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = LocalLRU(
+    getattr(settings, 'API_KEY_LOCAL_CACHE_SIZE', 1024),
+    getattr(settings, 'API_KEY_LOCAL_CACHE_SECONDS', 10),
+)
+
+
+def _key(key_hash: str) -> str:
+    return f"{NAMESPACE}:{key_hash}"
+
+
+def get(key_hash: str):
+    """
+    Returns the cached principal for a hashed API key, or None on a miss.
+    Principals are plain dicts of the client's and user's fields.
+    """
+    principal = _local.get(key_hash)
+    if principal is not None:
+        return principal
+    try:
+        value = get_redis().get(_key(key_hash))
+    except Exception as e:
+        print(f"API key cache lookup failed: {e}")
+        return None
+    if value is None:
+        return None
+    principal = json.loads(value)
+    _local.set(key_hash, principal)
+    return principal
+
+
+def store(key_hash: str, principal: dict):
+    _local.set(key_hash, principal)
+    try:
+        get_redis().set(_key(key_hash), json.dumps(principal, default=str), ex=getattr(settings, 'API_KEY_CACHE_SECONDS', 60))
+    except Exception as e:
+        print(f"Could not cache API key principal: {e}")
+
+
+def invalidate(key_hash: str):
+    """Drops a key's principal, e.g. after the client is deactivated or rotates its key."""
+    if not key_hash:
+        return
+    _local.delete(key_hash)
+    try:
+        get_redis().delete(_key(key_hash))
+    except Exception as e:
+        print(f"Could not invalidate cached API key principal: {e}")
@@ -0,0 +1,140 @@
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from applaude_api.redis_client import get_redis
+from .models import ApiClient, ApiUsage, ApiUsageBatch
+
+# Counts recorded since the last flush, by "<client>|<date>|<metric>".
+PENDING_KEY = 'metering:pending'
+# Counts taken by a flush that has not been written to the database yet.
+FLUSHING_KEY = 'metering:flushing'
+# ID of the batch in FLUSHING_KEY, recorded with its counts (see ApiUsageBatch).
+BATCH_KEY = 'metering:flushing-batch'
+BATCH_RETENTION = timedelta(days=7)
+FLUSH_LOCK_KEY = 'metering:flush-lock'
+FLUSH_LOCK_SECONDS = 300
+
+
+def record(client_id, metric: str, amount: int = 1):
+    """
+    Counts usage by an API client. The count is added to a Redis hash and
+    reaches the database on the next flush, so callers never wait on a
+    write to a shared usage row.
+
+    Args:
+        client_id: The ApiClient's ID.
+        metric (str): One of ApiUsage.Metric.
+        amount (int): How much to add.
+    """
+    field = f"{client_id}|{timezone.localdate().isoformat()}|{metric}"
+    try:
+        get_redis().hincrby(PENDING_KEY, field, amount)
+    except Exception as e:
+        print(f"Metering buffer unavailable, writing {metric} for client {client_id} directly: {e}")
+        _apply({field: amount})
+
+
+def flush() -> int:
+    """
+    Adds the buffered counts to the daily usage rows. Counts recorded while
+    a flush runs go to a fresh buffer and are picked up by the next one; a
+    batch whose write failed is retried first. Each batch is named when it
+    is taken and the name is stored with its counts, so a batch that was
+    written but not cleared from Redis is never added twice. Returns how
+    many counters were written.
+    """
+    redis = get_redis()
+    lock = redis.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_SECONDS)
+    if not lock.acquire(blocking=False):
+        return 0
+    try:
+        if not redis.exists(FLUSHING_KEY):
+            if not redis.exists(PENDING_KEY):
+                return 0
+            redis.pipeline().rename(PENDING_KEY, FLUSHING_KEY).set(BATCH_KEY, uuid.uuid4().hex).execute()
+        # A batch taken before batches were named gets its name now.
+        redis.set(BATCH_KEY, uuid.uuid4().hex, nx=True)
+        counts, batch_id = redis.pipeline().hgetall(FLUSHING_KEY).get(BATCH_KEY).execute()
+        _apply({field: int(value) for field, value in counts.items()}, batch_id)
+        redis.delete(FLUSHING_KEY, BATCH_KEY)
+        ApiUsageBatch.objects.filter(applied_at__lt=timezone.now() - BATCH_RETENTION).delete()
+        return len(counts)
+    finally:
+        lock.release()
+
+
+def usage(client_id, start: date, end: date) -> dict:
+    """
+    Usage of an API client between two dates (inclusive), including counts
+    that have not been flushed yet.
+
+    Returns:
+        {(date, metric): count}
+    """
+    prefix = f"{client_id}|"
+    buffers, batch_id = ({}, {}), None
+    try:
+        batch_id, *buffers = get_redis().pipeline().get(BATCH_KEY).hgetall(FLUSHING_KEY).hgetall(PENDING_KEY).execute()
+    except Exception as e:
+        print(f"Could not read pending usage for client {client_id}: {e}")
+
+    counts = defaultdict(int)
+    # The rows and the batch check share one snapshot, so a batch being
+    # flushed is counted either from its rows or from Redis, never both.
+    with transaction.atomic():
+        for day, metric, count in ApiUsage.objects.filter(
+            client_id=client_id, date__range=(start, end)
+        ).values_list('date', 'metric', 'count'):
+            counts[(day, metric)] += count
+        if batch_id and ApiUsageBatch.objects.filter(batch_id=batch_id).exists():
+            buffers = buffers[1:]
+
+    for buffer in buffers:
+        for field, value in buffer.items():
+            if not field.startswith(prefix):
+                continue
+            _, day, metric = field.split('|')
+            day = date.fromisoformat(day)
+            if start <= day <= end:
+                counts[(day, metric)] += int(value)
+    return dict(counts)
+
+
+def _apply(counts: dict, batch_id: str = None):
+    """
+    Adds {"<client>|<date>|<metric>": amount} to the usage table, unless
+    the batch with the given ID was already added.
+    """
+    now = timezone.now()
+    rows = {}
+    projects_created = defaultdict(int)
+    for field, amount in counts.items():
+        if not amount:
+            continue
+        client_id, day, metric = field.split('|')
+        rows[(client_id, date.fromisoformat(day), metric)] = amount
+        if metric == ApiUsage.Metric.PROJECTS_CREATED:
+            projects_created[client_id] += amount
+    if not rows:
+        return
+
+    with transaction.atomic():
+        if batch_id is not None:
+            _, created = ApiUsageBatch.objects.get_or_create(batch_id=batch_id)
+            if not created:
+                return
+        ApiUsage.objects.bulk_create(
+            [ApiUsage(client_id=client_id, date=day, metric=metric) for client_id, day, metric in rows],
+            ignore_conflicts=True,
+        )
+        for (client_id, day, metric), amount in rows.items():
+            ApiUsage.objects.filter(client_id=client_id, date=day, metric=metric).update(
+                count=F('count') + amount, updated_at=now
+            )
+        for client_id, amount in projects_created.items():
+            ApiClient.objects.filter(pk=client_id).update(apps_created_count=F('apps_created_count') + amount)
@@ -1,14 +1,25 @@
+import hashlib
 import uuid
 import secrets
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.conf import settings
 
+from . import key_cache
+
 def generate_api_key():
     """
     Generates a secure, random API key.
     """
     return secrets.token_hex(32)
 
+def hash_api_key(raw_key):
+    """
+    Hashes an API key for storage and lookup. Keys are long random strings,
+    so a plain SHA-256 is enough.
+    """
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
 class APIKey(models.Model):
     """
     Represents a unique API key for a user to access Applaude services programmatically.
@@ -35,3 +46,105 @@ class APIKey(models.Model):
         verbose_name_plural = "API Keys"
         ordering = ['-created_at']
 
+
+class ApiClient(models.Model):
+    """
+    A partner business that creates projects through the API with its own
+    key. Clients are inactive until their setup fee is paid.
+
+    Only a hash of the key is stored, along with its first characters so a
+    request can be matched to its client through an index and the key can
+    be recognised in the admin. The raw key is returned once by `issue_key`.
+    """
+    KEY_PREFIX_LENGTH = 8
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='api_client')
+    business_name = models.CharField(max_length=255)
+    website_link = models.URLField(max_length=500)
+    key_prefix = models.CharField(max_length=KEY_PREFIX_LENGTH, blank=True, db_index=True, editable=False)
+    key_hash = models.CharField(max_length=64, unique=True, null=True, editable=False)
+    is_active = models.BooleanField(default=False)
+    apps_created_count = models.PositiveIntegerField(default=0)
+    max_concurrent_pipelines = models.PositiveSmallIntegerField(
+        null=True, blank=True,
+        help_text="Pipelines this client may run at once; defaults to API_CLIENT_MAX_CONCURRENT_PIPELINES."
+    )
+    scheduling_weight = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1)], help_text="Relative share of partner capacity when several clients have work queued."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.business_name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Authentication caches the client, so any change (deactivation
+        # above all) must drop it.
+        key_cache.invalidate(self.key_hash)
+
+    def issue_key(self) -> str:
+        """
+        Replaces the client's API key and returns the new raw key. It cannot
+        be recovered later.
+
+        The old key is dropped from Redis at once, but other processes keep
+        it in their local cache for up to API_KEY_LOCAL_CACHE_SECONDS.
+        """
+        raw_key = generate_api_key()
+        previous_hash = self.key_hash
+        self.key_prefix = raw_key[:self.KEY_PREFIX_LENGTH]
+        self.key_hash = hash_api_key(raw_key)
+        self.save(update_fields=['key_prefix', 'key_hash', 'updated_at'])
+        key_cache.invalidate(previous_hash)
+        return raw_key
+
+    def deactivate(self):
+        self.is_active = False
+        self.save(update_fields=['is_active', 'updated_at'])
+
+    @property
+    def pipeline_limit(self) -> int:
+        return self.max_concurrent_pipelines or getattr(settings, 'API_CLIENT_MAX_CONCURRENT_PIPELINES', 3)
+
+
+class ApiUsage(models.Model):
+    """
+    Daily usage of an API client, one row per metric. Counts are buffered
+    in Redis and added here in batches by apps.api.metering.
+    """
+    class Metric(models.TextChoices):
+        API_REQUESTS = 'API_REQUESTS', 'API Requests'
+        PROJECTS_CREATED = 'PROJECTS_CREATED', 'Projects Created'
+
+    client = models.ForeignKey(ApiClient, on_delete=models.CASCADE, related_name='usage')
+    date = models.DateField()
+    metric = models.CharField(max_length=32, choices=Metric.choices)
+    count = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.client} | {self.date} | {self.metric}: {self.count}"
+
+    class Meta:
+        verbose_name = "API Usage"
+        verbose_name_plural = "API Usage"
+        ordering = ['-date', 'metric']
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'date', 'metric'], name='unique_api_usage_per_day'),
+        ]
+
+
+class ApiUsageBatch(models.Model):
+    """
+    A batch of buffered usage counts that has been added to ApiUsage. It is
+    written in the same transaction as the counts, so a flush retried after
+    a crash can tell that its batch was already applied.
+    """
+    batch_id = models.CharField(max_length=32, primary_key=True)
+    applied_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.batch_id
@@ -2,5 +2,5 @@ from django.urls import re_path
 from apps.projects import consumers
 
 websocket_urlpatterns = [
-    re_path(r'ws/project/(?P<project_id>\w+)/$', consumers.ProjectStatusConsumer.as_asgi()),
+    re_path(r'ws/project/(?P<project_id>[0-9a-fA-F-]+)/$', consumers.ProjectStatusConsumer.as_asgi()),
 ]
@@ -0,0 +1,244 @@
+import math
+import time
+
+from django.conf import settings
+
+from applaude_api.celery_routing import PRIORITY_PARTNER
+from applaude_api.redis_client import get_redis
+
+NAMESPACE = 'partner:pipelines'
+
+# Starts as many queued partner pipelines as capacity allows, one deficit
+# round robin pass over the clients with queued work at a time.
+#
+# Keys, under the ARGV[1] prefix:
+#   :ring              list of client IDs with queued projects, in turn order
+#   :queue:<client>    list of the client's queued project IDs, oldest first
+#   :client:<client>   hash with the client's `cap` and `weight`
+#   :deficit           hash of unspent turns per client
+#   :turn              the client whose turn the shared capacity cut short
+#   :running           zset of "<client>|<project>" by start time, all clients
+#   :running:<client>  zset of the client's running project IDs by start time
+#   :enqueued          hash of queued project ID -> enqueue time
+#
+# Every turn, a client's deficit grows by its weight and it may start one
+# pipeline per whole unit, until its own cap or the shared capacity is
+# reached. A turn cut short by the shared capacity resumes first, without
+# a new quantum, once a slot frees up, so weights hold when slots free up
+# one at a time. Clients whose queue empties leave the ring and forfeit
+# their deficit, as in DRR; a client held back by its cap keeps at most one
+# turn's worth, so it cannot burst past the others later. Leases older than
+# ARGV[4] seconds are dropped first, so a pipeline that never reported back
+# cannot hold a slot forever; the dispatch-partner-pipelines beat entry
+# runs this even when no partner submits or finishes work.
+DISPATCH_SCRIPT = """
+local prefix = ARGV[1]
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+local ring = prefix .. ':ring'
+local running = prefix .. ':running'
+local turn = prefix .. ':turn'
+
+for _, member in ipairs(redis.call('ZRANGEBYSCORE', running, '-inf', now - lease)) do
+  local sep = string.find(member, '|', 1, true)
+  redis.call('ZREM', prefix .. ':running:' .. string.sub(member, 1, sep - 1), string.sub(member, sep + 1))
+  redis.call('ZREM', running, member)
+end
+
+local started = {}
+local idle_turns = 0
+while redis.call('ZCARD', running) < capacity and idle_turns < redis.call('LLEN', ring) do
+  local client = redis.call('LPOP', ring)
+  local queue = prefix .. ':queue:' .. client
+  local client_running = prefix .. ':running:' .. client
+  local limits = redis.call('HMGET', prefix .. ':client:' .. client, 'cap', 'weight')
+  local cap = tonumber(limits[1]) or 1
+  -- A client with no weight would never build a deficit and starve.
+  local weight = math.max(tonumber(limits[2]) or 1, 1)
+  local deficit = tonumber(redis.call('HGET', prefix .. ':deficit', client) or '0')
+  if redis.call('GET', turn) == client then
+    redis.call('DEL', turn)
+  else
+    deficit = deficit + weight
+  end
+
+  local progressed = false
+  while deficit >= 1 and redis.call('ZCARD', client_running) < cap and redis.call('ZCARD', running) < capacity do
+    local project = redis.call('LPOP', queue)
+    if not project then break end
+    redis.call('ZADD', client_running, now, project)
+    redis.call('ZADD', running, now, client .. '|' .. project)
+    redis.call('HDEL', prefix .. ':enqueued', project)
+    deficit = deficit - 1
+    table.insert(started, client)
+    table.insert(started, project)
+    progressed = true
+  end
+
+  if redis.call('LLEN', queue) == 0 then
+    redis.call('HDEL', prefix .. ':deficit', client)
+  elseif deficit >= 1 and redis.call('ZCARD', client_running) < cap then
+    -- Only the shared capacity stopped the turn; it resumes next.
+    redis.call('HSET', prefix .. ':deficit', client, deficit)
+    redis.call('LPUSH', ring, client)
+    redis.call('SET', turn, client)
+  else
+    redis.call('HSET', prefix .. ':deficit', client, math.min(deficit, weight))
+    redis.call('RPUSH', ring, client)
+  end
+  if progressed then idle_turns = 0 else idle_turns = idle_turns + 1 end
+end
+return started
+"""
+
+_dispatch_script = None
+
+
+def _key(*parts) -> str:
+    return ':'.join((NAMESPACE,) + tuple(str(part) for part in parts))
+
+
+def submit(api_client, project_id) -> dict:
+    """
+    Queues a partner project's analysis pipeline and starts whatever the
+    partner's share of capacity allows.
+
+    Args:
+        api_client (ApiClient): The partner that created the project.
+        project_id: The new project.
+
+    Returns:
+        The project's scheduling state, as returned by `queue_status`.
+    """
+    return submit_many(api_client, [project_id])[0]
+
+
+def submit_many(api_client, project_ids) -> list:
+    """
+    Like `submit`, for a batch of projects queued in one go, in order.
+    Returns their scheduling states in the same order.
+    """
+    client_id = str(api_client.id)
+    project_ids = [str(project_id) for project_id in project_ids]
+    if not project_ids:
+        return []
+    try:
+        redis = get_redis()
+        now = time.time()
+        pipe = redis.pipeline()
+        pipe.hset(_key('client', client_id), mapping={'cap': api_client.pipeline_limit, 'weight': api_client.scheduling_weight})
+        pipe.hset(_key('enqueued'), mapping={project_id: now for project_id in project_ids})
+        pipe.rpush(_key('queue', client_id), *project_ids)
+        queued = pipe.execute()[-1]
+        if queued == len(project_ids):
+            # The client had nothing queued, so it is not in the ring yet.
+            redis.rpush(_key('ring'), client_id)
+    except Exception as e:
+        print(f"Partner scheduler unavailable, starting {len(project_ids)} project(s) directly: {e}")
+        _start([(client_id, project_id) for project_id in project_ids])
+        return [{'state': 'running', 'queue_position': 0, 'estimated_wait_seconds': 0} for _ in project_ids]
+
+    dispatch()
+    return queue_statuses(api_client, project_ids)
+
+
+def release(client_id, project_id):
+    """Frees a finished pipeline's slot and starts the next queued ones."""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zrem(_key('running', client_id), str(project_id))
+        pipe.zrem(_key('running'), f"{client_id}|{project_id}")
+        pipe.execute()
+    except Exception as e:
+        print(f"Could not release partner pipeline for project {project_id}: {e}")
+        return
+    dispatch()
+
+
+def dispatch() -> int:
+    """
+    Starts queued partner pipelines up to the shared capacity, sharing it
+    across clients by deficit round robin. Returns how many were started.
+    """
+    global _dispatch_script
+    try:
+        redis = get_redis()
+        if _dispatch_script is None:
+            _dispatch_script = redis.register_script(DISPATCH_SCRIPT)
+        started = _dispatch_script(client=redis, args=[
+            NAMESPACE,
+            getattr(settings, 'API_PARTNER_MAX_CONCURRENT_PIPELINES', 20),
+            time.time(),
+            getattr(settings, 'API_PARTNER_PIPELINE_LEASE_SECONDS', 3600),
+        ])
+    except Exception as e:
+        print(f"Could not dispatch partner pipelines: {e}")
+        return 0
+
+    _start(list(zip(started[::2], started[1::2])))
+    return len(started) // 2
+
+
+def queue_status(api_client, project_id) -> dict:
+    """
+    Where a partner project stands in the scheduler.
+
+    Returns:
+        A dict with `state` ('queued', 'running' or 'finished'), the
+        1-based `queue_position` within the partner's own queue (0 unless
+        queued), and `estimated_wait_seconds` until it starts.
+    """
+    return queue_statuses(api_client, [project_id])[0]
+
+
+def queue_statuses(api_client, project_ids) -> list:
+    """`queue_status` for several projects of one partner, read in one round trip."""
+    from agents.pipeline import ANALYSIS_PIPELINE
+    from agents.stage_events import expected_duration_seconds
+
+    client_id = str(api_client.id)
+    project_ids = [str(project_id) for project_id in project_ids]
+    try:
+        pipe = get_redis().pipeline()
+        pipe.lrange(_key('queue', client_id), 0, -1)
+        pipe.zrange(_key('running', client_id), 0, -1)
+        pipe.llen(_key('ring'))
+        queue, running, active_clients = pipe.execute()
+    except Exception as e:
+        print(f"Could not read partner queue status for client {client_id}: {e}")
+        return [{'state': 'unknown', 'queue_position': None, 'estimated_wait_seconds': None} for _ in project_ids]
+
+    positions = {project_id: index + 1 for index, project_id in enumerate(queue)}
+    running = set(running)
+    # The client can count on its fair share of the shared capacity (or its
+    # own cap, if lower); each of those slots frees up once a pipeline ends.
+    capacity = getattr(settings, 'API_PARTNER_MAX_CONCURRENT_PIPELINES', 20)
+    slots = max(1, min(api_client.pipeline_limit, capacity // max(active_clients, 1)))
+    pipeline_seconds = expected_duration_seconds(ANALYSIS_PIPELINE) if positions else 0
+
+    statuses = []
+    for project_id in project_ids:
+        position = positions.get(project_id)
+        if position is None:
+            state = 'running' if project_id in running else 'finished'
+            statuses.append({'state': state, 'queue_position': 0, 'estimated_wait_seconds': 0})
+        else:
+            statuses.append({
+                'state': 'queued',
+                'queue_position': position,
+                'estimated_wait_seconds': round(math.ceil(position / slots) * pipeline_seconds),
+            })
+    return statuses
+
+
+def _start(runs):
+    """Starts the analysis pipelines of (client ID, project ID) pairs in one publish."""
+    from agents.pipeline import ANALYSIS_PIPELINE, run_pipelines
+    from .tasks import release_partner_pipeline
+
+    clients = {project_id: client_id for client_id, project_id in runs}
+    run_pipelines(
+        ANALYSIS_PIPELINE, list(clients), priority=PRIORITY_PARTNER,
+        on_finish=lambda project_id: release_partner_pipeline.si(clients[project_id], project_id),
+    )
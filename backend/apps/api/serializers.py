@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from apps.projects.models import Project
 
@@ -17,4 +18,17 @@ class APIProjectCreateSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Project
-        fields = ['source_url', 'app_type']
+        fields = ['id', 'source_url', 'app_type']
+        read_only_fields = ['id']
+
+
+class APIProjectBulkCreateSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of projects created via the API. Only the shape
+    of the batch is checked here; each item is validated on its own with
+    APIProjectCreateSerializer so one bad item does not reject the rest.
+    """
+    projects = serializers.ListField(
+        child=serializers.DictField(), min_length=1,
+        max_length=getattr(settings, 'API_BULK_CREATE_MAX_PROJECTS', 500),
+    )
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import key_cache
+from .authentication import USER_FIELDS
+from .models import ApiClient
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_api_key(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Drops the cached principal of a user's API client when the user's
+    cached fields may have changed, so a deactivated user's key stops
+    authenticating. Saves of other fields only, such as the `last_login`
+    update on every login, are skipped.
+    """
+    if created or (update_fields is not None and not set(update_fields) & set(USER_FIELDS)):
+        return
+    key_hash = ApiClient.objects.filter(user_id=instance.pk).values_list('key_hash', flat=True).first()
+    key_cache.invalidate(key_hash)
+
+
+@receiver(post_delete, sender=ApiClient)
+def invalidate_deleted_client_api_key(sender, instance, **kwargs):
+    # Also runs for clients deleted along with their user, which never
+    # reach ApiClient.delete().
+    key_cache.invalidate(instance.key_hash)
@@ -0,0 +1,32 @@
+from celery import shared_task
+
+from . import metering, scheduler
+
+
+@shared_task
+def release_partner_pipeline(client_id, project_id):
+    """
+    Runs when a partner pipeline ends, whether it succeeded or failed, so
+    the client's slot goes to the next queued project.
+    """
+    scheduler.release(client_id, project_id)
+
+
+@shared_task
+def dispatch_partner_pipelines():
+    """
+    Periodically reclaims expired partner pipeline leases and starts queued
+    projects, so a pipeline whose release callback was lost cannot stall
+    its client's queue when no new work arrives.
+    """
+    started = scheduler.dispatch()
+    if started:
+        print(f"Started {started} queued partner pipelines.")
+
+
+@shared_task
+def flush_usage_counters():
+    """Writes the buffered API usage counts to the daily usage table."""
+    flushed = metering.flush()
+    if flushed:
+        print(f"Flushed {flushed} API usage counters.")
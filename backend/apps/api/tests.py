@@ -0,0 +1,349 @@
+from unittest import mock
+
+import fakeredis
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from . import key_cache, metering, scheduler
+from .authentication import APIKeyAuthentication
+from .models import ApiClient, ApiUsage, hash_api_key
+from .views import project_name_for
+from apps.projects.models import Project
+
+User = get_user_model()
+
+
+class PartnerTestCase(TestCase):
+    """Partner clients backed by an in-memory Redis, with pipeline starts recorded instead of run."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.started = []
+        key_cache._local.clear()
+        self.addCleanup(key_cache._local.clear)
+        for patcher in (
+            mock.patch('apps.api.scheduler.get_redis', return_value=self.redis),
+            mock.patch('apps.api.metering.get_redis', return_value=self.redis),
+            mock.patch('apps.api.key_cache.get_redis', return_value=self.redis),
+            mock.patch('apps.api.scheduler._start', side_effect=self.started.extend),
+            mock.patch.object(scheduler, '_dispatch_script', None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def make_client(self, name, **fields):
+        user = User.objects.create_user(email=f'{name}@example.com', password='password123')
+        return ApiClient.objects.create(
+            user=user, business_name=name, website_link=f'https://{name}.example.com', is_active=True, **fields
+        )
+
+    def started_by(self, api_client):
+        return [project for client, project in self.started if client == str(api_client.id)]
+
+
+@override_settings(API_PARTNER_MAX_CONCURRENT_PIPELINES=4, API_PARTNER_PIPELINE_LEASE_SECONDS=60)
+class PartnerSchedulerTests(PartnerTestCase):
+
+    def test_client_cap_holds_back_the_rest_of_its_queue(self):
+        """
+        Ensure a client never runs more than its cap and a release starts its next project.
+        """
+        client = self.make_client('capped', max_concurrent_pipelines=2)
+        statuses = scheduler.submit_many(client, ['p1', 'p2', 'p3', 'p4'])
+        self.assertEqual(self.started_by(client), ['p1', 'p2'])
+        self.assertEqual([status['state'] for status in statuses], ['running', 'running', 'queued', 'queued'])
+        self.assertEqual([status['queue_position'] for status in statuses], [0, 0, 1, 2])
+
+        scheduler.release(client.id, 'p1')
+        self.assertEqual(self.started_by(client), ['p1', 'p2', 'p3'])
+        self.assertEqual(scheduler.queue_status(client, 'p1')['state'], 'finished')
+
+    def test_capacity_is_shared_by_weight(self):
+        """
+        Ensure clients with queued work split the shared capacity in proportion to their weights.
+        """
+        heavy = self.make_client('heavy', max_concurrent_pipelines=10, scheduling_weight=3)
+        light = self.make_client('light', max_concurrent_pipelines=10, scheduling_weight=1)
+        with override_settings(API_PARTNER_MAX_CONCURRENT_PIPELINES=0):
+            scheduler.submit_many(heavy, [f'h{i}' for i in range(8)])
+            scheduler.submit_many(light, [f'l{i}' for i in range(8)])
+        self.assertEqual(self.started, [])
+
+        self.assertEqual(scheduler.dispatch(), 4)
+        self.assertEqual((len(self.started_by(heavy)), len(self.started_by(light))), (3, 1))
+        for client, project in list(self.started):
+            scheduler.release(client, project)
+        self.assertEqual((len(self.started_by(heavy)), len(self.started_by(light))), (6, 2))
+
+    def test_expired_leases_are_reclaimed(self):
+        """
+        Ensure a pipeline that never released its slot loses it once its lease expires.
+        """
+        client = self.make_client('stalled', max_concurrent_pipelines=1)
+        with mock.patch('apps.api.scheduler.time', **{'time.return_value': 1000.0}):
+            scheduler.submit_many(client, ['p1', 'p2'])
+            self.assertEqual(scheduler.dispatch(), 0)
+        with mock.patch('apps.api.scheduler.time', **{'time.return_value': 1061.0}):
+            self.assertEqual(scheduler.dispatch(), 1)
+        self.assertEqual(self.started_by(client), ['p1', 'p2'])
+
+    def test_queue_statuses_follow_the_requested_order(self):
+        """
+        Ensure batch statuses come back in request order, with queue positions and waits that grow with them.
+        """
+        client = self.make_client('ordered', max_concurrent_pipelines=1)
+        scheduler.submit_many(client, ['p1', 'p2', 'p3'])
+        with mock.patch('agents.stage_events.expected_duration_seconds', return_value=60):
+            statuses = scheduler.queue_statuses(client, ['p3', 'gone', 'p1', 'p2'])
+        self.assertEqual([status['state'] for status in statuses], ['queued', 'finished', 'running', 'queued'])
+        self.assertEqual([status['queue_position'] for status in statuses], [2, 0, 0, 1])
+        self.assertEqual([status['estimated_wait_seconds'] for status in statuses], [120, 0, 0, 60])
+        self.assertEqual(scheduler.submit_many(client, []), [])
+
+
+@override_settings(API_PARTNER_MAX_CONCURRENT_PIPELINES=4, API_PARTNER_PIPELINE_LEASE_SECONDS=60)
+class APIProjectBulkCreateTests(PartnerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api_client = self.make_client('bulk', max_concurrent_pipelines=2)
+        self.api_key = self.api_client.issue_key()
+
+    def bulk_create(self, projects):
+        return self.client.post(
+            reverse('api:api-project-bulk-create'), {'projects': projects}, content_type='application/json',
+            HTTP_X_API_KEY=self.api_key,
+        )
+
+    def test_results_keep_request_order(self):
+        """
+        Ensure valid, invalid and duplicate items each get a result at their own index.
+        """
+        Project.objects.create(owner=self.api_client.user, name=project_name_for('https://old.example.com'), source_url='https://old.example.com')
+        response = self.bulk_create([
+            {'source_url': 'https://one.example.com', 'app_type': 'ANDROID'},
+            {'source_url': 'not a url'},
+            {'source_url': 'https://one.example.com', 'app_type': 'IOS'},
+            {'source_url': 'https://old.example.com'},
+            {'source_url': 'https://two.example.com', 'app_type': 'WATCH'},
+            {'source_url': 'https://two.example.com', 'app_type': 'IOS'},
+        ])
+        self.assertEqual(response.status_code, 207)
+        results = response.data['results']
+        self.assertEqual([result['index'] for result in results], list(range(6)))
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['created', 'invalid', 'duplicate', 'duplicate', 'invalid', 'created'],
+        )
+        self.assertIn('source_url', results[1]['errors'])
+        self.assertIn('app_type', results[4]['errors'])
+        self.assertEqual((response.data['created'], response.data['duplicate'], response.data['invalid']), (2, 2, 2))
+        self.assertEqual(results[5]['app_type'], 'IOS')
+        self.assertEqual(
+            set(Project.objects.filter(owner=self.api_client.user).values_list('source_url', flat=True)),
+            {'https://old.example.com', 'https://one.example.com', 'https://two.example.com'},
+        )
+        self.assertEqual(self.started_by(self.api_client), [str(results[0]['id']), str(results[5]['id'])])
+
+    def test_client_cap_applies_to_a_batch(self):
+        """
+        Ensure a batch starts no more pipelines than the client's cap and queues the rest in order.
+        """
+        response = self.bulk_create([{'source_url': f'https://site{n}.example.com'} for n in range(4)])
+        self.assertEqual(response.status_code, 201)
+        results = response.data['results']
+        self.assertEqual([result['pipeline']['state'] for result in results], ['running', 'running', 'queued', 'queued'])
+        self.assertEqual([result['pipeline']['queue_position'] for result in results], [0, 0, 1, 2])
+        self.assertEqual(self.started_by(self.api_client), [str(result['id']) for result in results[:2]])
+        metering.flush()
+        self.assertEqual(
+            ApiUsage.objects.get(client=self.api_client, metric=ApiUsage.Metric.PROJECTS_CREATED).count, 4
+        )
+
+    def test_retried_batch_reports_duplicates_without_failing(self):
+        """
+        Ensure a batch whose items all exist already gets per-item results rather than a 400, and queues nothing new.
+        """
+        projects = [{'source_url': f'https://site{n}.example.com'} for n in range(2)]
+        self.assertEqual(self.bulk_create(projects).status_code, 201)
+        started = list(self.started)
+
+        response = self.bulk_create(projects)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']], ['duplicate', 'duplicate'])
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(self.started, started)
+
+    def test_malformed_batch_is_rejected(self):
+        """
+        Ensure a body that is not a batch, or is over the size limit, returns 400 and creates nothing.
+        """
+        self.assertEqual(self.bulk_create([]).status_code, 400)
+        self.assertEqual(self.bulk_create(['https://site.example.com']).status_code, 400)
+        response = self.bulk_create([{'source_url': f'https://site{n}.example.com'} for n in range(501)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Project.objects.exists())
+        self.assertEqual(self.started, [])
+
+
+class APIKeyAuthenticationTests(PartnerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api_client = self.make_client('keyed', max_concurrent_pipelines=2, scheduling_weight=3)
+        self.api_key = self.api_client.issue_key()
+
+    def authenticate(self, api_key):
+        request = APIRequestFactory().get('/', HTTP_X_API_KEY=api_key)
+        return APIKeyAuthentication().authenticate(request)
+
+    def test_only_a_hash_and_prefix_of_the_key_are_stored(self):
+        """
+        Ensure the raw key is not stored and the client is found by its key's prefix and hash.
+        """
+        self.api_client.refresh_from_db()
+        self.assertEqual(self.api_client.key_prefix, self.api_key[:ApiClient.KEY_PREFIX_LENGTH])
+        self.assertEqual(self.api_client.key_hash, hash_api_key(self.api_key))
+        self.assertNotIn(self.api_key, self.api_client.key_hash)
+
+        user, _ = self.authenticate(self.api_key)
+        self.assertEqual(user.api_client.id, self.api_client.id)
+        forged = self.api_key[:ApiClient.KEY_PREFIX_LENGTH] + '0' * (len(self.api_key) - ApiClient.KEY_PREFIX_LENGTH)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(forged)
+
+    def test_cached_principal_rebuilds_the_same_client(self):
+        """
+        Ensure a client rebuilt from the Redis cache has the same field values as one loaded from the database.
+        """
+        user, _ = self.authenticate(self.api_key)
+        self.assertTrue(self.redis.exists(key_cache._key(hash_api_key(self.api_key))))
+        key_cache._local.clear()
+
+        with self.assertNumQueries(0):
+            cached_user, _ = self.authenticate(self.api_key)
+            cached_client = cached_user.api_client
+        self.assertIs(cached_client.user, cached_user)
+        for field in ('id', 'user_id', 'business_name', 'is_active', 'max_concurrent_pipelines', 'scheduling_weight', 'key_hash'):
+            self.assertEqual(getattr(cached_client, field), getattr(self.api_client, field), field)
+        self.assertEqual((cached_user.pk, cached_user.email, cached_user.is_active), (user.pk, user.email, True))
+        self.assertEqual(cached_client.pipeline_limit, 2)
+
+    def test_deactivation_drops_the_cached_key(self):
+        """
+        Ensure deactivating the client or its user stops a cached key from authenticating.
+        """
+        self.authenticate(self.api_key)
+        self.api_client.deactivate()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.api_key)
+
+        self.api_client.is_active = True
+        self.api_client.save()
+        self.authenticate(self.api_key)
+        self.api_client.user.is_active = False
+        self.api_client.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.api_key)
+
+    def test_saving_uncached_user_fields_keeps_the_cached_key(self):
+        """
+        Ensure a login's last_login update neither queries for the client nor drops its cached key.
+        """
+        self.authenticate(self.api_key)
+        user = self.api_client.user
+        user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+        self.assertTrue(self.redis.exists(key_cache._key(hash_api_key(self.api_key))))
+
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        self.assertFalse(self.redis.exists(key_cache._key(hash_api_key(self.api_key))))
+
+    def test_rotation_replaces_the_key(self):
+        """
+        Ensure rotating returns a new key that works and drops the old one from the cache.
+        """
+        self.authenticate(self.api_key)
+        response = self.client.post(reverse('api:api-key-rotate'), HTTP_X_API_KEY=self.api_key)
+        self.assertEqual(response.status_code, 201)
+        new_key = response.data['api_key']
+        self.assertNotEqual(new_key, self.api_key)
+
+        self.assertFalse(self.redis.exists(key_cache._key(hash_api_key(self.api_key))))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.api_key)
+        user, _ = self.authenticate(new_key)
+        self.assertEqual(user.api_client.id, self.api_client.id)
+
+
+class MeteringTests(PartnerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client_a = self.make_client('metered')
+        self.today = timezone.localdate()
+
+    def usage_row(self, metric):
+        return ApiUsage.objects.get(client=self.client_a, date=self.today, metric=metric).count
+
+    def test_flush_writes_recorded_counts(self):
+        """
+        Ensure recorded counts reach the usage rows and the apps created counter on flush.
+        """
+        metering.record(self.client_a.id, ApiUsage.Metric.API_REQUESTS)
+        metering.record(self.client_a.id, ApiUsage.Metric.API_REQUESTS, 2)
+        metering.record(self.client_a.id, ApiUsage.Metric.PROJECTS_CREATED, 2)
+        self.assertFalse(ApiUsage.objects.exists())
+
+        self.assertEqual(metering.flush(), 2)
+        self.assertEqual(self.usage_row(ApiUsage.Metric.API_REQUESTS), 3)
+        self.assertEqual(self.usage_row(ApiUsage.Metric.PROJECTS_CREATED), 2)
+        self.client_a.refresh_from_db()
+        self.assertEqual(self.client_a.apps_created_count, 2)
+        self.assertEqual(metering.flush(), 0)
+
+    def test_flush_retried_after_a_failed_cleanup_does_not_count_twice(self):
+        """
+        Ensure a batch written to the database but left in Redis is not added again, or reported twice meanwhile.
+        """
+        metering.record(self.client_a.id, ApiUsage.Metric.API_REQUESTS, 5)
+        with mock.patch.object(self.redis, 'delete', side_effect=ConnectionError('Redis went away')):
+            with self.assertRaises(ConnectionError):
+                metering.flush()
+        self.assertEqual(self.usage_row(ApiUsage.Metric.API_REQUESTS), 5)
+        self.assertTrue(self.redis.exists(metering.FLUSHING_KEY))
+
+        metering.record(self.client_a.id, ApiUsage.Metric.API_REQUESTS, 1)
+        usage = metering.usage(self.client_a.id, self.today, self.today)
+        self.assertEqual(usage[(self.today, ApiUsage.Metric.API_REQUESTS)], 6)
+
+        metering.flush()
+        self.assertFalse(self.redis.exists(metering.FLUSHING_KEY))
+        self.assertEqual(self.usage_row(ApiUsage.Metric.API_REQUESTS), 5)
+        metering.flush()
+        self.assertEqual(self.usage_row(ApiUsage.Metric.API_REQUESTS), 6)
+
+    def test_usage_view_includes_unflushed_counts(self):
+        """
+        Ensure the usage view reports flushed and buffered counts, including the request itself.
+        """
+        api_key = self.client_a.issue_key()
+        metering.record(self.client_a.id, ApiUsage.Metric.PROJECTS_CREATED, 3)
+        metering.flush()
+        metering.record(self.client_a.id, ApiUsage.Metric.PROJECTS_CREATED, 1)
+
+        response = self.client.get(reverse('api:api-usage'), HTTP_X_API_KEY=api_key)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals'], {
+            ApiUsage.Metric.API_REQUESTS: 1,
+            ApiUsage.Metric.PROJECTS_CREATED: 4,
+        })
+
+        response = self.client.get(reverse('api:api-usage'), {'start': 'yesterday'}, HTTP_X_API_KEY=api_key)
+        self.assertEqual(response.status_code, 400)
@@ -1,9 +1,13 @@
 from django.urls import path
-from .views import InitializeAPIPaymentView, APIProjectCreateView
+from .views import InitializeAPIPaymentView, APIProjectCreateView, APIProjectBulkCreateView, APIProjectQueueView, APIUsageView, APIKeyRotateView
 
 app_name = 'api'
 
 urlpatterns = [
     path('initialize-payment/', InitializeAPIPaymentView.as_view(), name='api-initialize-payment'),
     path('projects/create/', APIProjectCreateView.as_view(), name='api-project-create'),
+    path('projects/bulk-create/', APIProjectBulkCreateView.as_view(), name='api-project-bulk-create'),
+    path('projects/<uuid:pk>/queue/', APIProjectQueueView.as_view(), name='api-project-queue'),
+    path('usage/', APIUsageView.as_view(), name='api-usage'),
+    path('keys/rotate/', APIKeyRotateView.as_view(), name='api-key-rotate'),
 ]
@@ -1,22 +1,30 @@
 import os
 import requests
 import uuid
+from datetime import date, timedelta
 from decimal import Decimal
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from . import metering, scheduler
 from .authentication import APIKeyAuthentication
-from .models import ApiClient
-from .serializers import ApiClientCreateSerializer, APIProjectCreateSerializer
+from .models import ApiClient, ApiUsage
+from .serializers import ApiClientCreateSerializer, APIProjectCreateSerializer, APIProjectBulkCreateSerializer
 from apps.projects.models import Project
-from agents.tasks import run_market_analysis, run_design_analysis
-from celery import chain
 
 User = get_user_model()
 API_CLIENT_SETUP_FEE = Decimal('99.00') # One-time setup fee for API access
 
+
+def project_name_for(source_url):
+    """The auto-generated name of a partner project, cut to fit the name column."""
+    return f"App for {source_url}"[:Project._meta.get_field('name').max_length]
+
 class InitializeAPIPaymentView(generics.CreateAPIView):
     """
     Initializes the payment process for a new API partner.
@@ -91,26 +99,149 @@ class APIProjectCreateView(generics.CreateAPIView):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data['pipeline'] = self.pipeline_status
+        return response
+
     def perform_create(self, serializer):
         """
-        Assigns the owner from the authenticated API client, starts the
-        AI pipeline, and increments the usage counter.
+        Assigns the owner from the authenticated API client, queues the
+        AI pipeline with the partner scheduler, and counts the project
+        towards the client's usage.
         """
         api_client = self.request.user.api_client
         
         # Create the project instance
         project = serializer.save(
             owner=self.request.user,
-            name=f"App for {serializer.validated_data['source_url']}" # Auto-generate a name
+            name=project_name_for(serializer.validated_data['source_url']) # Auto-generate a name
         )
 
-        # Start the AI agent workflow
-        pipeline = chain(
-            run_market_analysis.s(project.id),
-            run_design_analysis.s(project.id)
+        # Start the AI agent workflow, or queue it behind the client's running ones
+        self.pipeline_status = scheduler.submit(api_client, project.id)
+
+        # Count the project towards the client's usage
+        metering.record(api_client.id, ApiUsage.Metric.PROJECTS_CREATED)
+
+
+class APIProjectBulkCreateView(APIView):
+    """
+    Creates up to API_BULK_CREATE_MAX_PROJECTS projects in one request.
+
+    Items are validated one by one, valid ones are inserted with a single
+    bulk_create, and their pipelines are queued with the partner scheduler
+    together. The response has one result per item, in request order:
+    `created` (with the project ID and its pipeline state), `invalid` (with
+    the validation errors) or `duplicate` (the partner already has a project
+    for that URL, or it appears earlier in the batch).
+
+    The status is 201 when every item was created and 207 otherwise, so a
+    retried batch whose items all exist already is not mistaken for a bad
+    request. 400 is only returned when the body itself is malformed.
+    """
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = APIProjectBulkCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['projects']
+        api_client = request.user.api_client
+
+        results = [None] * len(items)
+        pending = []
+        seen = {}
+        for index, item in enumerate(items):
+            item_serializer = APIProjectCreateSerializer(data=item)
+            if not item_serializer.is_valid():
+                results[index] = {'index': index, 'status': 'invalid', 'errors': item_serializer.errors}
+                continue
+            name = project_name_for(item_serializer.validated_data['source_url'])
+            if name in seen:
+                results[index] = {'index': index, 'status': 'duplicate', 'error': f"Same source_url as item {seen[name]}."}
+                continue
+            seen[name] = index
+            pending.append((index, Project(owner=request.user, name=name, **item_serializer.validated_data)))
+
+        # Projects the partner already has (same owner and name) are skipped
+        # by the insert and reported as duplicates below.
+        Project.objects.bulk_create([project for _, project in pending], ignore_conflicts=True)
+        inserted = set(Project.objects.filter(id__in=[project.id for _, project in pending]).values_list('id', flat=True))
+
+        created = [(index, project) for index, project in pending if project.id in inserted]
+        statuses = scheduler.submit_many(api_client, [project.id for _, project in created])
+        for (index, project), pipeline_status in zip(created, statuses):
+            results[index] = {
+                'index': index, 'status': 'created', 'id': project.id,
+                'source_url': project.source_url, 'app_type': project.app_type, 'pipeline': pipeline_status,
+            }
+        for index, project in pending:
+            if project.id not in inserted:
+                results[index] = {'index': index, 'status': 'duplicate', 'error': "A project for this source_url already exists."}
+
+        if created:
+            metering.record(api_client.id, ApiUsage.Metric.PROJECTS_CREATED, len(created))
+        counts = {outcome: sum(result['status'] == outcome for result in results) for outcome in ('created', 'duplicate', 'invalid')}
+        return Response(
+            {**counts, 'results': results},
+            status=status.HTTP_201_CREATED if counts['created'] == len(items) else status.HTTP_207_MULTI_STATUS,
         )
-        pipeline.delay()
 
-        # Increment the usage counter
-        api_client.apps_created_count += 1
-        api_client.save()
+
+class APIProjectQueueView(APIView):
+    """
+    Reports whether a partner project's pipeline is queued or running, its
+    place in the partner's queue, and the estimated wait before it starts.
+    """
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        project = get_object_or_404(Project, pk=pk, owner=request.user)
+        return Response(scheduler.queue_status(request.user.api_client, project.id))
+
+
+class APIUsageView(APIView):
+    """
+    Reports an API client's usage per day and in total, for billing.
+
+    Query parameters `start` and `end` (YYYY-MM-DD, inclusive) default to
+    the current month. Counts not yet flushed to the usage table are
+    included.
+    """
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    MAX_DAYS = 366
+
+    def get(self, request):
+        today = timezone.localdate()
+        try:
+            start = date.fromisoformat(request.query_params.get('start', today.replace(day=1).isoformat()))
+            end = date.fromisoformat(request.query_params.get('end', today.isoformat()))
+        except ValueError:
+            return Response({'error': 'start and end must be dates in YYYY-MM-DD format.'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end or end - start > timedelta(days=self.MAX_DAYS):
+            return Response({'error': f'The range must start before it ends and span at most {self.MAX_DAYS} days.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts = metering.usage(request.user.api_client.id, start, end)
+        totals = {metric: 0 for metric in ApiUsage.Metric.values}
+        daily = []
+        for (day, metric), count in sorted(counts.items()):
+            totals[metric] = totals.get(metric, 0) + count
+            daily.append({'date': day, 'metric': metric, 'count': count})
+        return Response({'start': start, 'end': end, 'totals': totals, 'daily': daily})
+
+
+class APIKeyRotateView(APIView):
+    """
+    Replaces the calling client's API key. The new key is only shown in
+    this response; the old one stops working within
+    API_KEY_LOCAL_CACHE_SECONDS.
+    """
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        api_client = ApiClient.objects.get(pk=request.user.api_client.pk)
+        return Response({'api_key': api_client.issue_key()}, status=status.HTTP_201_CREATED)
@@ -12,8 +12,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from apps.projects.models import Project
 from .models import Payment
-from agents.tasks import run_code_generation, run_qa_check, run_deployment
-from celery import chain
+from agents.pipeline import BUILD_PIPELINE, run_pipeline
+from applaude_api.celery_routing import PLAN_PRIORITIES, PRIORITY_PAID
 
 # Base prices in USD
 BASE_PLAN_PRICES_USD = {
@@ -120,3 +120,36 @@ class InitializePaymentView(APIView):
                 return Response({'error': f"Failed to initialize payment: {response_data.get('message')}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         except requests.exceptions.RequestException as e:
             return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class PaystackWebhookView(APIView):
+    """
+    Receives Paystack events. A successful charge marks the payment as paid
+    and starts the build pipeline for its project.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def post(self, request, *args, **kwargs):
+        secret = os.getenv('PAYSTACK_SECRET_KEY', '')
+        signature = request.headers.get('x-paystack-signature', '')
+        expected = hmac.new(secret.encode('utf-8'), request.body, hashlib.sha512).hexdigest()
+        if not secret or not hmac.compare_digest(expected, signature):
+            return Response({'error': 'Invalid signature.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        event = json.loads(request.body)
+        if event.get('event') != 'charge.success':
+            return Response(status=status.HTTP_200_OK)
+
+        reference = event.get('data', {}).get('reference')
+        # Paystack retries webhooks, so only the delivery that flips the status starts a build.
+        updated = Payment.objects.filter(
+            paystack_reference=reference
+        ).exclude(status=Payment.PaymentStatus.SUCCESSFUL).update(status=Payment.PaymentStatus.SUCCESSFUL)
+        payment = Payment.objects.filter(paystack_reference=reference).first()
+
+        if payment is None:
+            return Response({'error': 'Payment not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if updated:
+            run_pipeline(BUILD_PIPELINE, payment.project_id, priority=PLAN_PRIORITIES.get(payment.plan_type, PRIORITY_PAID))
+        return Response(status=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project
+from .models import BuildManifest, Project
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
@@ -15,3 +15,10 @@ class ProjectAdmin(admin.ModelAdmin):
         ('Aggregated Analytics', {'fields': ('app_ratings_summary', 'user_feedback_summary', 'survey_response_analytics')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
+
+
+@admin.register(BuildManifest)
+class BuildManifestAdmin(admin.ModelAdmin):
+    list_display = ('project', 'build_number', 'file_count', 'total_size_bytes', 'new_bytes', 'created_at')
+    search_fields = ('project__name', 'digest')
+    readonly_fields = ('project', 'build_number', 'digest', 'files', 'file_count', 'total_size_bytes', 'new_bytes', 'created_at')
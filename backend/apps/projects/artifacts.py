@@ -0,0 +1,105 @@
+import hashlib
+import json
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Artifact, BuildManifest, MobileApp, Project
+
+
+def artifact_storage():
+    """The storage behind the artifact store (STORAGES['artifacts'])."""
+    return storages['artifacts']
+
+
+def blob_name(sha256: str) -> str:
+    return f"blobs/{sha256[:2]}/{sha256}"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def save_once(storage, name: str, content) -> bool:
+    """
+    Saves content under a content-addressed name unless it is already there.
+    When another writer wins a race to the same name, the storage saves this
+    copy under a mangled name instead; that copy is deleted, since nothing
+    would ever read it. Returns whether this call's copy was kept.
+    """
+    if storage.exists(name):
+        return False
+    saved = storage.save(name, content)
+    if saved != name:
+        storage.delete(saved)
+        return False
+    return True
+
+
+def store_blobs(blobs: dict) -> int:
+    """
+    Stores {sha256: bytes} blobs that the store does not have yet, found
+    with one query, and returns how many bytes were written.
+    """
+    known = set(Artifact.objects.filter(sha256__in=list(blobs)).values_list('sha256', flat=True))
+    storage = artifact_storage()
+    written = 0
+    new_artifacts = []
+    for sha256, data in blobs.items():
+        if sha256 in known:
+            continue
+        name = blob_name(sha256)
+        # A blob without a row is left over from an interrupted build.
+        if save_once(storage, name, ContentFile(data)):
+            written += len(data)
+        new_artifacts.append(Artifact(sha256=sha256, size_bytes=len(data)))
+    Artifact.objects.bulk_create(new_artifacts, ignore_conflicts=True)
+    return written
+
+
+def read_blob(sha256: str) -> bytes:
+    with artifact_storage().open(blob_name(sha256), 'rb') as blob:
+        return blob.read()
+
+
+def create_build(project_id) -> BuildManifest:
+    """
+    Stores a project's generated files and records them as its next build.
+
+    Only files the store does not already hold are written. If the files
+    are exactly those of the project's latest build, that build is
+    returned instead of a new one.
+
+    Args:
+        project_id: The project whose MobileApp rows make up the build.
+
+    Returns:
+        The BuildManifest of the build.
+    """
+    files, blobs = [], {}
+    for path, platform, language, code in MobileApp.objects.filter(project_id=project_id).order_by(
+        'file_path', 'platform'
+    ).values_list('file_path', 'platform', 'language', 'code_snippet'):
+        data = code.encode('utf-8')
+        sha256 = content_hash(data)
+        blobs[sha256] = data
+        files.append({'path': path, 'platform': platform, 'language': language, 'sha256': sha256, 'size_bytes': len(data)})
+
+    manifest = json.dumps({'files': files}, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    digest = content_hash(manifest)
+    latest = BuildManifest.objects.filter(project_id=project_id).order_by('-build_number').first()
+    if latest is not None and latest.digest == digest:
+        return latest
+
+    blobs[digest] = manifest
+    new_bytes = store_blobs(blobs)
+    with transaction.atomic():
+        # Serializes build numbering per project.
+        list(Project.objects.select_for_update().filter(id=project_id).values_list('id', flat=True))
+        number = (BuildManifest.objects.filter(project_id=project_id).aggregate(last=Max('build_number'))['last'] or 0) + 1
+        return BuildManifest.objects.create(
+            project_id=project_id, build_number=number, digest=digest, files=files, file_count=len(files),
+            total_size_bytes=sum(entry['size_bytes'] for entry in files), new_bytes=new_bytes,
+        )
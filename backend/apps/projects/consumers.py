@@ -1,35 +1,51 @@
 import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.core.exceptions import ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .models import Project
+from .notifications import project_group_name, project_state_message
+
 
 class ProjectStatusConsumer(AsyncWebsocketConsumer):
+    """
+    Streams a project's progress to its owner. A client first receives the
+    project's full state, then the `project_state` deltas and other events
+    (such as generated files) the pipeline pushes as it runs. Messages sent
+    by clients are ignored.
+
+    Clients authenticate with their session or an access token passed as
+    `?token=` in the URL.
+    """
+    project_group_name = None
+
     async def connect(self):
         self.project_id = self.scope['url_route']['kwargs']['project_id']
-        self.project_group_name = f'project_{self.project_id}'
+        state = await self.get_project_state()
+        if state is None:
+            await self.close()
+            return
 
+        self.project_group_name = project_group_name(self.project_id)
         await self.channel_layer.group_add(
             self.project_group_name,
             self.channel_name
         )
-
         await self.accept()
+        await self.send(text_data=json.dumps({
+            'message': project_state_message(state)
+        }))
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.project_group_name,
-            self.channel_name
-        )
-
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
-
-        await self.channel_layer.group_send(
-            self.project_group_name,
-            {
-                'type': 'project_update',
-                'message': message
-            }
-        )
+        if self.project_group_name:
+            await self.channel_layer.group_discard(
+                self.project_group_name,
+                self.channel_name
+            )
 
     async def project_update(self, event):
         message = event['message']
@@ -37,3 +53,27 @@ class ProjectStatusConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'message': message
         }))
+
+    @database_sync_to_async
+    def get_project_state(self):
+        """The project's status fields, or None if the user may not watch it."""
+        user = self.get_user()
+        if user is None or not user.is_authenticated:
+            return None
+        try:
+            state = Project.objects.filter(id=self.project_id, owner=user).values('status', 'status_message').first()
+        except ValidationError:
+            return None
+        if state is None:
+            return None
+        return {name: value or '' for name, value in state.items()}
+
+    def get_user(self):
+        token = parse_qs(self.scope.get('query_string', b'').decode()).get('token')
+        if not token:
+            return self.scope.get('user')
+        authentication = JWTAuthentication()
+        try:
+            return authentication.get_user(authentication.get_validated_token(token[0]))
+        except (InvalidToken, TokenError):
+            return None
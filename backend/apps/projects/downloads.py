@@ -0,0 +1,173 @@
+import os
+import re
+import tempfile
+import zipfile
+
+from django.core.files import File
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .artifacts import artifact_storage, blob_name, save_once
+
+CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Every entry gets the same timestamp, so an archive depends only on the
+# build's files, like its cache name and ETag.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def archive_name(build) -> str:
+    """Where the ZIP of a build is cached. Builds with the same files share it."""
+    return f"archives/{build.digest}.zip"
+
+
+class _ChunkSink:
+    """
+    Write-only file handed to ZipFile. It cannot seek, so ZipFile writes
+    each entry's sizes after its data and everything can be streamed.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(build):
+    """
+    Yields a ZIP of a build's files, reading each blob in chunks so memory
+    stays flat whatever the size of the app. Entries carry a fixed
+    timestamp, so builds with the same files produce the same bytes.
+    """
+    sink = _ChunkSink()
+    storage = artifact_storage()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for entry in build.files:
+            info = zipfile.ZipInfo(f"{entry['platform']}/{entry['path']}", date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with storage.open(blob_name(entry['sha256']), 'rb') as blob, archive.open(info, 'w') as member:
+                for chunk in blob.chunks(CHUNK_SIZE):
+                    member.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def _iter_and_cache(build):
+    """
+    Streams a freshly built archive and, once the client has received all
+    of it, stores it in the cache. An interrupted download caches nothing.
+    """
+    spool = tempfile.TemporaryFile()
+    try:
+        for data in iter_zip(build):
+            spool.write(data)
+            yield data
+        _save_archive(build, spool)
+    finally:
+        spool.close()
+
+
+def _save_archive(build, spool):
+    # Another download of the same build may have finished first.
+    spool.seek(0)
+    save_once(artifact_storage(), archive_name(build), File(spool))
+
+
+def _cache_archive(build):
+    """Builds a build's archive into the cache without sending it anywhere."""
+    with tempfile.TemporaryFile() as spool:
+        for data in iter_zip(build):
+            spool.write(data)
+        _save_archive(build, spool)
+
+
+def _iter_file_range(name, start, length):
+    with artifact_storage().open(name, 'rb') as archive:
+        archive.seek(start)
+        while length > 0:
+            data = archive.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def _parse_range(header, size):
+    """
+    Parses a single `bytes=` range. Returns (start, end) inclusive, None to
+    send the whole file, or False when the range cannot be satisfied.
+    """
+    match = RANGE_PATTERN.match(header or '')
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # A suffix range: the last N bytes.
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def download_response(request, build, filename):
+    """
+    The ZIP of a build as a streamed response.
+
+    The first download of a build streams the archive as it is built and
+    caches it; later ones stream the cached copy and honour single byte
+    `Range` requests (with `If-Range`), so interrupted downloads can resume.
+    The ETag is the build's manifest digest.
+    """
+    storage = artifact_storage()
+    name = archive_name(build)
+    etag = f'"{build.digest}"'
+    wants_range = 'HTTP_RANGE' in request.META and request.META.get('HTTP_IF_RANGE', etag) == etag
+
+    if not storage.exists(name):
+        if not wants_range:
+            response = StreamingHttpResponse(_iter_and_cache(build), content_type='application/zip')
+            return _with_headers(response, filename, etag)
+        # A range needs the finished archive's offsets.
+        _cache_archive(build)
+
+    size = storage.size(name)
+    byte_range = _parse_range(request.META.get('HTTP_RANGE'), size) if wants_range else None
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = StreamingHttpResponse(_iter_file_range(name, 0, size), content_type='application/zip')
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _iter_file_range(name, start, end - start + 1), status=206, content_type='application/zip'
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return _with_headers(response, filename, etag)
+
+
+def _with_headers(response, filename, etag):
+    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(filename)}"'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
@@ -3,6 +3,8 @@ from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from .utils import highlight_code
+
 class Project(models.Model):
     class AppType(models.TextChoices):
         ANDROID = 'ANDROID', _('Android')
@@ -22,6 +24,12 @@ class Project(models.Model):
         COMPLETED = 'COMPLETED', _('Completed')
         FAILED = 'FAILED', _('Failed')
 
+    class DeploymentOption(models.TextChoices):
+        NOT_CHOSEN = 'NOT_CHOSEN', _('Not Chosen')
+        APP_STORE = 'APP_STORE', _('App Store')
+        PLAY_STORE = 'PLAY_STORE', _('Play Store')
+        APPLAUSE = 'APPLAUSE', _('Applause')
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='projects')
     name = models.CharField(max_length=255)
@@ -32,12 +40,119 @@ class Project(models.Model):
     user_persona_document = models.TextField(blank=True, null=True)
     brand_palette = models.JSONField(blank=True, null=True)
     generated_code_path = models.CharField(max_length=1024, blank=True, null=True)
+    deployment_url = models.URLField(max_length=1024, blank=True, null=True)
+    enable_ux_survey = models.BooleanField(default=False)
+    ux_survey_questions = models.JSONField(blank=True, null=True)
+    enable_pmf_survey = models.BooleanField(default=False)
+    pmf_survey_questions = models.JSONField(blank=True, null=True)
+    deployment_option = models.CharField(max_length=20, choices=DeploymentOption.choices, default=DeploymentOption.NOT_CHOSEN)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
         unique_together = ('owner', 'name')
+        indexes = [
+            # Keyset pagination of a user's projects (see ProjectCursorPagination).
+            models.Index(fields=['owner', '-created_at', '-id'], name='project_owner_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class MobileApp(models.Model):
+    """
+    A generated source file for one of the project's target platforms.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='apps')
+    platform = models.CharField(max_length=20)
+    file_path = models.CharField(max_length=512, blank=True, default='')
+    language = models.CharField(max_length=50, blank=True, default='')
+    code_snippet = models.TextField(blank=True, default='')
+    highlighted_code = models.TextField(
+        blank=True, default='', editable=False,
+        help_text="Highlighted HTML of code_snippet, refreshed whenever the snippet or language is saved."
+    )
+    size_bytes = models.PositiveIntegerField(default=0, editable=False)
+    line_count = models.PositiveIntegerField(default=0, editable=False)
+    purpose = models.TextField(blank=True, default='', help_text="What the code plan says the file implements.")
+    input_digests = models.JSONField(
+        default=dict, blank=True, editable=False,
+        help_text="Digest of every project input the file was generated from, by input name."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['platform', 'file_path']
+
+    def __str__(self):
+        return f"{self.project.name} - {self.file_path or self.platform}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._highlighted_source = (instance.__dict__.get('code_snippet'), instance.__dict__.get('language'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Highlights and measures the snippet when it or its language changed,
+        so reads never run Pygments or scan the code.
+        """
+        source = (self.code_snippet, self.language)
+        if source != getattr(self, '_highlighted_source', None):
+            self.highlighted_code = highlight_code(self.code_snippet, self.language) if self.code_snippet and self.language else ''
+            self.size_bytes = len(self.code_snippet.encode('utf-8'))
+            self.line_count = len(self.code_snippet.splitlines())
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'highlighted_code', 'size_bytes', 'line_count'}
+        super().save(*args, **kwargs)
+        self._highlighted_source = source
+
+
+class Artifact(models.Model):
+    """
+    A blob of generated code in the artifact store, named by the SHA-256 of
+    its content. Identical files share one blob across projects and builds.
+    A row is only written once its blob is stored.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size_bytes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+class BuildManifest(models.Model):
+    """
+    The files of one build of a project's generated code, each pointing at
+    an Artifact by hash. Builds are numbered per project and immutable; a
+    build identical to the previous one is not recorded again.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='builds')
+    build_number = models.PositiveIntegerField()
+    digest = models.CharField(max_length=64, help_text="SHA-256 of the manifest, which is itself stored as an artifact.")
+    files = models.JSONField(help_text="Path, platform, language, sha256 and size_bytes of every file.")
+    file_count = models.PositiveIntegerField()
+    total_size_bytes = models.PositiveBigIntegerField()
+    new_bytes = models.PositiveBigIntegerField(help_text="Bytes this build added to the store; the rest was already there.")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['project', '-build_number']
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'build_number'], name='unique_build_number_per_project'),
+        ]
+
+    def __str__(self):
+        return f"{self.project.name} - build {self.build_number}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Build manifests are immutable.")
+        super().save(*args, **kwargs)
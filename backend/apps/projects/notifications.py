@@ -0,0 +1,71 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from applaude_api.redis_client import get_redis
+
+# Last values pushed to clients, per project, so only changes are sent.
+PUSHED_STATE_NAMESPACE = 'project:pushed'
+PUSHED_STATE_TTL_SECONDS = 24 * 60 * 60
+
+
+def project_group_name(project_id) -> str:
+    """The channel group `ProjectStatusConsumer` subscribes clients to."""
+    return f'project_{project_id}'
+
+
+def send_project_update(project_id, message: dict):
+    """
+    Pushes a progress message to every client watching the project.
+    Delivery is best-effort: a missing or unreachable channel layer never
+    interrupts the pipeline stage that is reporting progress.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            project_group_name(project_id),
+            {
+                'type': 'project_update',
+                'message': message,
+            }
+        )
+    except Exception as e:
+        print(f"Failed to push project update for {project_id}: {e}")
+
+
+def project_state_message(changes: dict) -> dict:
+    """The `project_state` message clients receive, for a dict of changed fields."""
+    return {
+        'event': 'project_state',
+        'changes': changes,
+        'sent_at': timezone.now().isoformat(),
+    }
+
+
+def publish_project_state(project_id, **fields):
+    """
+    Pushes the given project fields to clients watching the project, leaving
+    out any whose value has already been pushed. The last pushed values are
+    shared through Redis, so writes from different workers never resend
+    what clients already have.
+
+    Args:
+        project_id: The project that changed.
+        **fields: Field names and their new values.
+    """
+    if get_channel_layer() is None:
+        return
+    changes = {name: '' if value is None else str(value) for name, value in fields.items()}
+    key = f"{PUSHED_STATE_NAMESPACE}:{project_id}"
+    try:
+        redis = get_redis()
+        pushed = redis.hmget(key, list(changes))
+        changes = {name: value for (name, value), old in zip(changes.items(), pushed) if old != value}
+        if not changes:
+            return
+        redis.pipeline().hset(key, mapping=changes).expire(key, PUSHED_STATE_TTL_SECONDS).execute()
+    except Exception as e:
+        print(f"Could not compare pushed state for {project_id}, sending all fields: {e}")
+    send_project_update(project_id, project_state_message(changes))
@@ -1,15 +1,41 @@
 from rest_framework import serializers
-from .models import Project, MobileApp
-from .utils import highlight_code
+from .models import BuildManifest, Project, MobileApp
 from apps.users.serializers import UserDetailSerializer
 
+def requested_fields(request):
+    """
+    The field names asked for with a `fields=a,b,c` query parameter, or None
+    when the parameter is absent.
+    """
+    if request is None or not request.query_params.get('fields'):
+        return None
+    return {name.strip() for name in request.query_params['fields'].split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients trim a serializer's output with `?fields=a,b,c`. Only the
+    top-level serializer of a response is trimmed, and only on reads.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        wanted = requested_fields(request)
+        if wanted is None or request.method != 'GET':
+            return
+        unknown = wanted - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}."})
+        for name in set(self.fields) - wanted:
+            self.fields.pop(name)
+
+
 class MobileAppSerializer(serializers.ModelSerializer):
     """
     Serializer for the MobileApp model.
-    Includes a field for pre-highlighted code.
+    Includes the code highlighted when the app was saved; its stylesheet is
+    the static file projects/monokai.css.
     """
-    highlighted_code = serializers.SerializerMethodField()
-
     class Meta:
         model = MobileApp
         fields = (
@@ -22,23 +48,39 @@ class MobileAppSerializer(serializers.ModelSerializer):
             'created_at',
         )
 
-    def get_highlighted_code(self, obj: MobileApp) -> str:
-        """
-        Returns the highlighted HTML for the app's code snippet.
-        """
-        if obj.code_snippet and obj.language:
-            return highlight_code(obj.code_snippet, obj.language)
-        return ""
 
+class MobileAppFileSerializer(serializers.ModelSerializer):
+    """
+    One entry of a project's file tree: where a generated file lives and how
+    big it is, without its code.
+    """
+    path = serializers.CharField(source='file_path')
+
+    class Meta:
+        model = MobileApp
+        fields = ('id', 'path', 'platform', 'language', 'size_bytes', 'line_count', 'updated_at')
+
+
+class BuildManifestSerializer(serializers.ModelSerializer):
+    """
+    A build of a project's generated code, without its file list.
+    """
+    class Meta:
+        model = BuildManifest
+        fields = ('id', 'build_number', 'digest', 'file_count', 'total_size_bytes', 'new_bytes', 'created_at')
 
-class ProjectSerializer(serializers.ModelSerializer):
+
+class ProjectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the Project model.
     Optimizes database lookups and includes nested mobile apps.
+    Supports sparse fieldsets through the `fields` query parameter.
     """
     owner = UserDetailSerializer(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     apps = MobileAppSerializer(many=True, read_only=True)
+    apps_count = serializers.SerializerMethodField()
+    testimonials_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Project
@@ -54,11 +96,22 @@ class ProjectSerializer(serializers.ModelSerializer):
             'user_persona_document',
             'brand_palette',
             'generated_code_path',
+            'deployment_url',
             'apps', # Include the nested apps
+            'apps_count',
+            'testimonials_count',
             'created_at',
             'updated_at'
         )
-        read_only_fields = ('id', 'owner', 'status', 'status_display', 'status_message', 'created_at', 'updated_at', 'apps')
+        read_only_fields = ('id', 'owner', 'status', 'status_display', 'status_message', 'deployment_url', 'created_at', 'updated_at', 'apps', 'apps_count', 'testimonials_count')
+
+    # Listings annotate the counts (see ProjectViewSet.get_queryset); other
+    # responses count on demand.
+    def get_apps_count(self, project):
+        return project.apps_count if hasattr(project, 'apps_count') else project.apps.count()
+
+    def get_testimonials_count(self, project):
+        return project.testimonials_count if hasattr(project, 'testimonials_count') else project.testimonials.count()
 
     def create(self, validated_data):
         """
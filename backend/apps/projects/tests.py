@@ -1,9 +1,27 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from unittest import mock
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth import get_user_model
-from .models import Project
+from django.contrib.staticfiles import finders
+from apps.testimonials.models import Testimonial
+from .artifacts import artifact_storage, create_build, read_blob
+from .downloads import _save_archive, archive_name, iter_zip
+from .models import Artifact, BuildManifest, MobileApp, Project
+from .notifications import project_group_name, publish_project_state
+from .utils import highlight_stylesheet
 
 User = get_user_model()
 
@@ -52,8 +70,8 @@ class ProjectAPITests(APITestCase):
 
         response = self.client.get(self.list_url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], self.project_data['name'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['name'], self.project_data['name'])
 
     def test_list_projects_isolates_data(self):
         """
@@ -69,5 +87,248 @@ class ProjectAPITests(APITestCase):
         # The main user should only see their own project
         response = self.client.get(self.list_url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertNotEqual(response.data[0]['name'], 'Other Project')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertNotEqual(response.data['results'][0]['name'], 'Other Project')
+
+
+class ProjectStateNotificationTests(SimpleTestCase):
+
+    def test_only_changed_fields_are_pushed(self):
+        """
+        Ensure a field already pushed to clients is left out of the next update.
+        """
+        redis = mock.MagicMock()
+        redis.hmget.return_value = ['QA_PENDING', None]
+        with mock.patch('apps.projects.notifications.get_redis', return_value=redis), \
+                mock.patch('apps.projects.notifications.get_channel_layer'), \
+                mock.patch('apps.projects.notifications.send_project_update') as send:
+            publish_project_state('p1', status='QA_PENDING', status_message='Performing automated QA checks...')
+            redis.hmget.return_value = ['QA_PENDING', 'Performing automated QA checks...']
+            publish_project_state('p1', status='QA_PENDING', status_message='Performing automated QA checks...')
+
+        send.assert_called_once()
+        self.assertEqual(send.call_args.args[1]['changes'], {'status_message': 'Performing automated QA checks...'})
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ProjectStatusConsumerTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email='socket@example.com', password='password123')
+        self.project = Project.objects.create(
+            owner=self.owner, name='Socket', status=Project.ProjectStatus.QA_PENDING, status_message='Checking...'
+        )
+        self.stranger = User.objects.create_user(email='stranger@example.com', password='password123')
+
+    def communicator(self, user=None):
+        from applaude_api.asgi import application
+        query = f"?token={AccessToken.for_user(user)}" if user else ''
+        return WebsocketCommunicator(application, f"/ws/project/{self.project.id}/{query}")
+
+    async def test_owner_receives_the_state_then_updates(self):
+        """
+        Ensure the owner is sent the project's full state on connect, then what the pipeline pushes.
+        """
+        from channels.layers import get_channel_layer
+        communicator = self.communicator(self.owner)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        initial = (await communicator.receive_json_from())['message']
+        self.assertEqual(initial['event'], 'project_state')
+        self.assertEqual(initial['changes'], {'status': 'QA_PENDING', 'status_message': 'Checking...'})
+
+        await get_channel_layer().group_send(
+            project_group_name(self.project.id), {'type': 'project_update', 'message': {'event': 'file_generated'}}
+        )
+        self.assertEqual(await communicator.receive_json_from(), {'message': {'event': 'file_generated'}})
+        await communicator.disconnect()
+
+    def test_asgi_application_loads_in_a_fresh_process(self):
+        """
+        Ensure the ASGI entry point imports its routes only once Django is set up.
+        """
+        result = subprocess.run(
+            [sys.executable, '-c', 'import applaude_api.asgi'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)},
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    async def test_anonymous_users_and_other_users_are_rejected(self):
+        """
+        Ensure only the project's owner can watch it.
+        """
+        for user in (None, self.stranger):
+            communicator = self.communicator(user)
+            connected, _ = await communicator.connect()
+            self.assertFalse(connected)
+
+
+class ProjectListPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='pages@applaude.ai', password='password123')
+        self.client.force_authenticate(self.user)
+        Project.objects.bulk_create(
+            [Project(owner=self.user, name=f'Project {i}', user_persona_document='Persona') for i in range(5)]
+        )
+
+    def test_cursor_pages_cover_every_project_once(self):
+        """
+        Ensure following `next` links returns each project exactly once, newest first.
+        """
+        seen = []
+        url = reverse('project-list') + '?page_size=2&fields=id,name'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += response.data['results']
+            url = response.data['next']
+
+        expected = Project.objects.order_by('-created_at', '-id').values_list('name', flat=True)
+        self.assertEqual([project['name'] for project in seen], list(expected))
+        self.assertEqual(set(seen[0]), {'id', 'name'})
+
+    def test_counts_and_summary_are_aggregated(self):
+        """
+        Ensure listings carry per-project counts and the summary totals every project without paging.
+        """
+        project = Project.objects.order_by('-created_at', '-id').first()
+        for path in ('Main.kt', 'Theme.kt'):
+            MobileApp.objects.create(project=project, platform='Android', file_path=path, language='kotlin', code_snippet='//')
+        Testimonial.objects.create(user=self.user, project=project, content='Great app')
+        Project.objects.filter(pk=project.pk).update(status=Project.ProjectStatus.COMPLETED)
+
+        response = self.client.get(reverse('project-list'), {'page_size': 1, 'fields': 'id,apps_count,testimonials_count'})
+        self.assertEqual(response.data['results'], [{'id': str(project.id), 'apps_count': 2, 'testimonials_count': 1}])
+
+        response = self.client.get(reverse('project-summary'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'projects': 5,
+            'by_status': {Project.ProjectStatus.PENDING: 4, Project.ProjectStatus.COMPLETED: 1},
+            'apps': 2,
+            'testimonials': 1,
+        })
+
+
+class MobileAppHighlightTests(APITestCase):
+
+    def test_snippet_is_highlighted_when_saved(self):
+        """
+        Ensure highlighting happens on write, only when the code changes, and without an embedded stylesheet.
+        """
+        user = User.objects.create_user(email='code@applaude.ai', password='password123')
+        project = Project.objects.create(owner=user, name='Code Project')
+        app = MobileApp.objects.create(project=project, platform='Android', language='kotlin', code_snippet='fun main() {}')
+        self.assertIn('<div class="source">', app.highlighted_code)
+        self.assertNotIn('<style', app.highlighted_code)
+
+        with mock.patch('apps.projects.models.highlight_code', return_value='<div class="source"></div>') as highlight:
+            MobileApp.objects.get(pk=app.pk).save()
+            highlight.assert_not_called()
+            MobileApp.objects.update_or_create(project=project, file_path='', defaults={'code_snippet': 'val x = 1'})
+            highlight.assert_called_once_with('val x = 1', 'kotlin')
+
+    def test_static_stylesheet_matches_formatter(self):
+        """
+        Ensure the shipped stylesheet is the one the formatter produces.
+        """
+        with open(finders.find('projects/monokai.css')) as stylesheet:
+            self.assertEqual(stylesheet.read().strip(), highlight_stylesheet().strip())
+
+    def test_file_content_returns_only_the_requested_lines(self):
+        """
+        Ensure a line range is cut from the file and highlighted on its own, keeping its indentation.
+        """
+        user = User.objects.create_user(email='lines@applaude.ai', password='password123')
+        project = Project.objects.create(owner=user, name='Lines Project')
+        code = ''.join(f'    val x{i} = {i}\n' for i in range(1, 101))
+        MobileApp.objects.create(project=project, platform='Android', file_path='Main.kt', language='kotlin', code_snippet=code)
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('project-file-content', args=[project.id]), {'path': 'Main.kt', 'start': 10, 'end': 11})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['code'], '    val x10 = 10\n    val x11 = 11\n')
+        self.assertEqual(response.data['line_count'], 100)
+        self.assertIn('x10', response.data['highlighted_code'])
+        self.assertNotIn('x12', response.data['highlighted_code'])
+
+
+class ArtifactStoreTests(APITestCase):
+
+    def setUp(self):
+        storage_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_root, ignore_errors=True)
+        storages_setting = {
+            **settings.STORAGES,
+            'artifacts': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': storage_root}},
+        }
+        self.enterContext(override_settings(STORAGES=storages_setting))
+        self.user = User.objects.create_user(email='builds@applaude.ai', password='password123')
+
+    def test_identical_files_are_stored_once(self):
+        """
+        Ensure files shared between projects are stored once and an unchanged build is not recorded again.
+        """
+        projects = [Project.objects.create(owner=self.user, name=f'Build Project {i}') for i in range(2)]
+        for project in projects:
+            MobileApp.objects.create(project=project, platform='Android', file_path='Shared.kt', language='kotlin', code_snippet='shared')
+
+        first = create_build(projects[0].id)
+        second = create_build(projects[1].id)
+
+        self.assertEqual(Artifact.objects.count(), 2)  # The shared file and the manifest, identical for both builds.
+        self.assertEqual(second.new_bytes, 0)
+        self.assertEqual(create_build(projects[0].id).pk, first.pk)
+        self.assertEqual(read_blob(first.files[0]['sha256']), b'shared')
+
+    def test_builds_with_the_same_files_produce_the_same_archive(self):
+        """
+        Ensure the archive depends only on the files, since builds with the same digest share its cache and ETag.
+        """
+        projects = [Project.objects.create(owner=self.user, name=f'Archive Project {i}') for i in range(2)]
+        for project in projects:
+            MobileApp.objects.create(project=project, platform='Android', file_path='Main.kt', language='kotlin', code_snippet='fun main() {}')
+        first, second = create_build(projects[0].id), create_build(projects[1].id)
+        BuildManifest.objects.filter(pk=second.pk).update(created_at=first.created_at.replace(year=2020))
+        second.refresh_from_db()
+
+        self.assertEqual(first.digest, second.digest)
+        self.assertEqual(b''.join(iter_zip(first)), b''.join(iter_zip(second)))
+
+    def test_racing_archive_saves_leave_one_copy(self):
+        """
+        Ensure a download that loses the race to cache an archive does not leave a second, renamed copy.
+        """
+        project = Project.objects.create(owner=self.user, name='Race Project')
+        MobileApp.objects.create(project=project, platform='Android', file_path='Main.kt', language='kotlin', code_snippet='fun main() {}')
+        build = create_build(project.id)
+        storage = artifact_storage()
+        real_exists = storage.exists
+        for _ in range(2):
+            # Both downloads checked before either had saved.
+            stale = [False]
+            with mock.patch.object(storage, 'exists', side_effect=lambda name: stale.pop() if stale else real_exists(name)), \
+                    tempfile.TemporaryFile() as spool:
+                spool.write(b''.join(iter_zip(build)))
+                _save_archive(build, spool)
+        self.assertEqual(storage.listdir('archives')[1], [os.path.basename(archive_name(build))])
+
+    def test_download_streams_a_zip_and_resumes_from_the_cache(self):
+        """
+        Ensure the download is a valid ZIP and a ranged request returns the matching bytes of the cached archive.
+        """
+        project = Project.objects.create(owner=self.user, name='Download Project')
+        MobileApp.objects.create(project=project, platform='Android', file_path='Main.kt', language='kotlin', code_snippet='fun main() {}')
+        create_build(project.id)
+        self.client.force_authenticate(self.user)
+        url = reverse('project-download', args=[project.id])
+
+        response = self.client.get(url)
+        archive = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(zipfile.ZipFile(io.BytesIO(archive)).read('Android/Main.kt'), b'fun main() {}')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), archive[10:])
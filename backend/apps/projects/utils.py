@@ -1,36 +1,74 @@
-import hashlib
+from functools import lru_cache
+
 from django.core.cache import cache
 from pygments import highlight
-from pygments.lexers import get_lexer_by_name
 from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+# Shared by every snippet. The matching stylesheet is served once, as the
+# static file projects/monokai.css (see `highlight_stylesheet`), instead of
+# being embedded in each snippet.
+HIGHLIGHT_STYLE = 'monokai'
+HIGHLIGHT_CSS_CLASS = 'source'
+_formatter = HtmlFormatter(style=HIGHLIGHT_STYLE, cssclass=HIGHLIGHT_CSS_CLASS)
+
 
-def highlight_code(code: str, language: str) -> str:
+# Highlighted line ranges are cached this long. Keys include the file's
+# last update, so an edited file never serves a stale range.
+RANGE_CACHE_SECONDS = 86400
+
+
+@lru_cache(maxsize=64)
+def _lexer(language: str, stripall: bool):
+    try:
+        return get_lexer_by_name(language, stripall=stripall)
+    except ClassNotFound:
+        # Fallback to a generic lexer if the language is not found
+        return get_lexer_by_name('text', stripall=stripall)
+
+
+def highlight_code(code: str, language: str, stripall: bool = True) -> str:
     """
-    Highlights the given code using Pygments and caches the result.
+    Highlights the given code using Pygments. Lexers and the formatter are
+    built once and reused.
 
     Args:
         code: The source code to highlight.
         language: The programming language of the code.
+        stripall: Whether to strip leading and trailing whitespace first.
 
     Returns:
-        The HTML-formatted highlighted code.
+        The HTML-formatted highlighted code, without a stylesheet.
     """
-    cache_key = f"code_highlight:{hashlib.md5(code.encode('utf-8')).hexdigest()}:{language}"
-    cached_html = cache.get(cache_key)
+    return highlight(code, _lexer(language.lower(), stripall), _formatter)
 
-    if cached_html:
-        return cached_html
 
-    try:
-        lexer = get_lexer_by_name(language, stripall=True)
-    except ValueError:
-        # Fallback to a generic lexer if the language is not found
-        lexer = get_lexer_by_name('text', stripall=True)
+def highlight_lines(app, start: int, end: int):
+    """
+    Cuts lines start..end (1-based, inclusive) out of a MobileApp's code and
+    highlights only them. The whole file reuses the HTML stored on the app.
+    A range is highlighted on its own, so a construct that opens before it
+    (a block comment, say) is not coloured as such.
+
+    Returns:
+        A (code, highlighted_html) pair.
+    """
+    code = ''.join(app.code_snippet.splitlines(keepends=True)[start - 1:end])
+    if start == 1 and end >= app.line_count and app.highlighted_code:
+        return code, app.highlighted_code
+    if not code or not app.language:
+        return code, ''
 
-    formatter = HtmlFormatter(style='monokai', full=True, cssclass="source")
-    highlighted_html = highlight(code, lexer, formatter)
+    cache_key = f"code_highlight:{app.id}:{app.updated_at.timestamp()}:{start}:{end}"
+    highlighted_html = cache.get(cache_key)
+    if highlighted_html is None:
+        # Keep the first line's indentation.
+        highlighted_html = highlight_code(code, app.language, stripall=False)
+        cache.set(cache_key, highlighted_html, timeout=RANGE_CACHE_SECONDS)
+    return code, highlighted_html
 
-    # Cache the result for 24 hours
-    cache.set(cache_key, highlighted_html, timeout=86400)
 
-    return highlighted_html
+def highlight_stylesheet() -> str:
+    """The CSS for highlighted code, as shipped in projects/monokai.css."""
+    return _formatter.get_style_defs(f'.{HIGHLIGHT_CSS_CLASS}')
@@ -1,7 +1,24 @@
-from rest_framework import viewsets, permissions
-from .models import Project, Testimonial, MobileApp
-from .serializers import ProjectSerializer, TestimonialSerializer, MobileAppSerializer
-from ratelimit.decorators import ratelimit
+from django.db.models import Count
+from django.utils.decorators import method_decorator
+from django.utils.text import slugify
+from django_ratelimit.decorators import ratelimit
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from apps.testimonials.models import Testimonial
+from apps.testimonials.serializers import TestimonialSerializer
+from agents.code_generation_agent import plan_regeneration
+from agents.pipeline import BUILD_PIPELINE, levels, resume_plan, run_pipeline
+from applaude_api.celery_routing import PRIORITY_PAID, PRIORITY_STANDARD
+from agents.project_status import update_project_status
+from agents.stage_events import estimate_completion, stage_duration_stats
+from .downloads import download_response
+from .models import Project, MobileApp
+from .pagination import ProjectCursorPagination
+from .serializers import (
+    ProjectSerializer, MobileAppSerializer, MobileAppFileSerializer, BuildManifestSerializer, requested_fields,
+)
+from .utils import highlight_lines
 
 class IsOwner(permissions.BasePermission):
     """
@@ -22,12 +39,19 @@ class ProjectViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    pagination_class = ProjectCursorPagination
 
-    @ratelimit(key='user', rate='10/m', method='GET', block=True)
+    # Large columns that are only loaded when the response includes them.
+    # The survey questions are never serialized here.
+    DEFERRABLE_FIELDS = ('user_persona_document', 'brand_palette', 'ux_survey_questions', 'pmf_survey_questions')
+    # Most lines `files/content` returns at once.
+    MAX_FILE_LINES = 2000
+
+    @method_decorator(ratelimit(key='user', rate='10/m', method='GET', block=True))
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-    @ratelimit(key='user', rate='5/m', method='POST', block=True)
+    @method_decorator(ratelimit(key='user', rate='5/m', method='POST', block=True))
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
@@ -37,9 +61,29 @@ class ProjectViewSet(viewsets.ModelViewSet):
         This view should return a list of all the projects
         for the currently authenticated user, prefetching related apps
         to optimize database queries.
+
+        When listing or retrieving, only what the response needs is loaded:
+        with `?fields=` the owner and apps are fetched only if requested,
+        the app and testimonial counts are annotated only if requested, and
+        large columns are deferred unless requested.
         """
         user = self.request.user
-        return Project.objects.filter(owner=user).prefetch_related('apps', 'testimonials')
+        queryset = Project.objects.filter(owner=user)
+        if self.action in ('files', 'file_content', 'builds', 'download'):
+            return queryset
+        if self.action not in ('list', 'retrieve'):
+            return queryset.prefetch_related('apps', 'testimonials')
+
+        fields = requested_fields(self.request) or set(ProjectSerializer.Meta.fields)
+        if 'owner' in fields:
+            queryset = queryset.select_related('owner')
+        if 'apps' in fields:
+            queryset = queryset.prefetch_related('apps')
+        if 'apps_count' in fields:
+            queryset = queryset.annotate(apps_count=Count('apps', distinct=True))
+        if 'testimonials_count' in fields:
+            queryset = queryset.annotate(testimonials_count=Count('testimonials', distinct=True))
+        return queryset.defer(*(name for name in self.DEFERRABLE_FIELDS if name not in fields))
 
     def perform_create(self, serializer):
         """
@@ -47,6 +91,160 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """
         serializer.save(owner=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Totals over all of the user's projects: how many there are, by
+        status, and their generated files and testimonials. Clients read
+        these here instead of paging through the whole list.
+        """
+        projects = Project.objects.filter(owner=request.user)
+        by_status = dict(projects.order_by().values_list('status').annotate(count=Count('id')))
+        return Response({
+            'projects': sum(by_status.values()),
+            'by_status': by_status,
+            'apps': MobileApp.objects.filter(project__owner=request.user).count(),
+            'testimonials': Testimonial.objects.filter(project__owner=request.user).count(),
+        })
+
+    @action(detail=True, methods=['get'])
+    def eta(self, request, pk=None):
+        """
+        Estimated completion of the project's current pipeline, based on
+        historical stage durations.
+        """
+        return Response(estimate_completion(self.get_object()))
+
+    @action(detail=True, methods=['get'])
+    def files(self, request, pk=None):
+        """
+        The project's generated files: path, platform, language, size and
+        line count, without any code.
+        """
+        apps = self.get_object().apps.only(
+            'id', 'project_id', 'file_path', 'platform', 'language', 'size_bytes', 'line_count', 'updated_at'
+        )
+        return Response(MobileAppFileSerializer(apps, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path='files/content')
+    def file_content(self, request, pk=None):
+        """
+        One generated file, or lines `start` to `end` of it (1-based,
+        inclusive), given its `path`. Only the returned lines are
+        highlighted, at most MAX_FILE_LINES at a time.
+        """
+        project = self.get_object()
+        app = project.apps.filter(file_path=request.query_params.get('path', '')).defer('highlighted_code').first()
+        if app is None:
+            return Response({'detail': 'No such file.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            start = int(request.query_params.get('start', 1))
+            end = int(request.query_params.get('end', start + self.MAX_FILE_LINES - 1))
+        except ValueError:
+            return Response({'detail': 'start and end must be line numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if start < 1 or end < start:
+            return Response({'detail': 'Lines are numbered from 1 and end cannot come before start.'}, status=status.HTTP_400_BAD_REQUEST)
+        end = min(end, start + self.MAX_FILE_LINES - 1, max(app.line_count, start))
+
+        code, highlighted_code = highlight_lines(app, start, end)
+        return Response({
+            'path': app.file_path,
+            'platform': app.platform,
+            'language': app.language,
+            'start': start,
+            'end': end,
+            'line_count': app.line_count,
+            'code': code,
+            'highlighted_code': highlighted_code,
+        })
+
+    @action(detail=True, methods=['get'])
+    def builds(self, request, pk=None):
+        """The project's builds in the artifact store, newest first."""
+        builds = self.get_object().builds.defer('files')
+        return Response(BuildManifestSerializer(builds, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        The project's generated source as a ZIP, streamed. Defaults to the
+        latest build; pass `build` for an earlier one. Supports byte ranges
+        for resuming.
+        """
+        project = self.get_object()
+        builds = project.builds.all()
+        if 'build' in request.query_params:
+            try:
+                builds = builds.filter(build_number=int(request.query_params['build']))
+            except ValueError:
+                return Response({'detail': 'build must be a build number.'}, status=status.HTTP_400_BAD_REQUEST)
+        build = builds.order_by('-build_number').first()
+        if build is None:
+            return Response({'detail': 'This project has no generated code yet.'}, status=status.HTTP_404_NOT_FOUND)
+        return download_response(request, build, f"{slugify(project.name) or 'app'}-build-{build.build_number}.zip")
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """
+        Restarts a failed project from the stages that have not succeeded
+        yet, keeping everything its finished stages and steps produced.
+        """
+        project = self.get_object()
+        stages, resume_status = resume_plan(project)
+        if not stages:
+            return Response({'detail': 'The pipeline has already finished.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        resumed_from = [stage.name for stage in levels(stages)[0]]
+        if not update_project_status(
+            project.id, resume_status, f"Resuming from {', '.join(resumed_from)}...",
+            from_statuses=[Project.ProjectStatus.FAILED]
+        ):
+            return Response({'detail': 'Only a failed project can be resumed.'}, status=status.HTTP_409_CONFLICT)
+        build_stages = {stage.name for stage in BUILD_PIPELINE}
+        priority = PRIORITY_PAID if build_stages & set(resumed_from) else PRIORITY_STANDARD
+        run_pipeline(stages, project.id, resume=True, priority=priority)
+        return Response({'resumed_from': resumed_from, 'status': resume_status}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def regenerate(self, request, pk=None):
+        """
+        Rebuilds a finished project's app after its inputs were edited, e.g.
+        a new brand palette. Only the files whose inputs changed are
+        generated again; QA, the security scan and deployment then run on
+        the new build.
+        """
+        project = self.get_object()
+        if not project.builds.exists():
+            return Response({'detail': 'This project has no generated code yet.'}, status=status.HTTP_400_BAD_REQUEST)
+        regeneration = plan_regeneration(project.id)
+        if not update_project_status(
+            project.id, Project.ProjectStatus.CODE_GENERATION, "Regenerating application source code...",
+            from_statuses=[Project.ProjectStatus.COMPLETED, Project.ProjectStatus.FAILED]
+        ):
+            return Response({'detail': 'Only a completed or failed project can be regenerated.'}, status=status.HTTP_409_CONFLICT)
+        run_pipeline(BUILD_PIPELINE, project.id, priority=PRIORITY_PAID)
+
+        if regeneration is None:
+            return Response({'full_rebuild': True, 'regenerated_files': None, 'reused_files': 0}, status=status.HTTP_202_ACCEPTED)
+        manifest, stale = regeneration
+        return Response({
+            'full_rebuild': False,
+            'regenerated_files': [entry['path'] for entry in stale],
+            'reused_files': len(manifest) - len(stale),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path='stage-stats', permission_classes=[permissions.IsAdminUser])
+    def stage_stats(self, request):
+        """
+        Per-stage p50/p95/p99 durations of recent pipeline runs. Accepts an
+        optional `days` query parameter (default 30).
+        """
+        try:
+            days = max(1, min(int(request.query_params.get('days', 30)), 365))
+        except ValueError:
+            days = 30
+        return Response(stage_duration_stats(days=days))
+
 
 class TestimonialViewSet(viewsets.ReadOnlyModelViewSet):
     """
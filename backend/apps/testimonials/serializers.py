@@ -1,13 +1,13 @@
 from rest_framework import serializers
 from .models import Testimonial
-from apps.users.serializers import UserSerializer
+from apps.users.serializers import UserDetailSerializer
 
 class TestimonialSerializer(serializers.ModelSerializer):
     """
     Serializer for the Testimonial model.
     Includes nested user data for frontend display.
     """
-    user = UserSerializer(read_only=True)
+    user = UserDetailSerializer(read_only=True)
 
     class Meta:
         model = Testimonial
@@ -1,5 +1,7 @@
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery } from '@tanstack/react-query';
 import { api } from '../../api/axios';
+import { getPage } from '@/services/api';
+import { CursorPage } from '@/types';
 import { useAuth } from '../../store/auth';
 import { Link } from 'react-router-dom';
 import { PlusCircle, Loader, AlertTriangle, ArrowRight } from 'lucide-react';
@@ -15,27 +17,28 @@ interface Project {
     testimonials_count: number;
 }
 
-const fetchProjects = async (token: string | null): Promise<Project[]> => {
+// Only what the cards show; the `next` links keep the same fields.
+const PROJECTS_URL = '/projects/?fields=id,name,source_url,created_at,apps_count,testimonials_count';
+
+const fetchProjects = async (token: string | null, url: string): Promise<CursorPage<Project>> => {
     if (!token) {
         throw new Error("Authentication token not found.");
     }
-    const { data } = await api.get('/projects/', {
+    return getPage<Project>(url, {
         headers: { Authorization: `Token ${token}` }
-    });
-    return data.map((p: any) => ({
-        ...p,
-        apps_count: p.apps?.length || 0,
-        testimonials_count: p.testimonials?.length || 0,
-    }));
+    }, api);
 };
 
 const ProjectList = () => {
     const { token } = useAuth();
-    const { data: projects, isLoading, isError, error } = useQuery<Project[], Error>({
-        queryKey: ['projects'],
-        queryFn: () => fetchProjects(token),
+    const { data, isLoading, isError, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery<CursorPage<Project>, Error>({
+        queryKey: ['projects', PROJECTS_URL],
+        queryFn: ({ pageParam }) => fetchProjects(token, pageParam as string),
+        initialPageParam: PROJECTS_URL,
+        getNextPageParam: (lastPage) => lastPage.next,
         enabled: !!token,
     });
+    const projects = data?.pages.flatMap((page) => page.results);
 
     if (isLoading) {
         return (
@@ -93,6 +96,15 @@ const ProjectList = () => {
                         </Link>
                     </div>
                 ))}
+                {hasNextPage && (
+                    <button
+                        onClick={() => fetchNextPage()}
+                        disabled={isFetchingNextPage}
+                        className="col-span-full justify-self-center px-6 py-3 font-semibold text-ion-blue bg-white rounded-lg shadow-sm hover:bg-gray-100 transition-colors"
+                    >
+                        {isFetchingNextPage ? 'Loading...' : 'Load More'}
+                    </button>
+                )}
             </div>
         );
     }
@@ -1,27 +1,44 @@
 import React from 'react';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery } from '@tanstack/react-query';
 import { Link } from 'react-router-dom';
 import { Button } from '@/components/ui/Button';
 import { Skeleton } from '@/components/ui/Skeleton';
-import { apiClient } from '@/services/api';
-import { Project } from '@/types';
+import { apiClient, getPage } from '@/services/api';
+import { CursorPage, Project, ProjectSummary } from '@/types';
 import { AlertCircle } from 'lucide-react';
 
-const getProjects = async (): Promise<Project[]> => {
-    const { data } = await apiClient.get('/projects/');
+// Only what the cards show; the `next` links keep the same fields.
+const PROJECTS_URL = '/projects/?fields=id,name,source_url';
+
+const getSummary = async (): Promise<ProjectSummary> => {
+    const { data } = await apiClient.get('/projects/summary/');
     return data;
 };
 
 const Dashboard = () => {
-  const { data: projects, isLoading, isError, error } = useQuery<Project[], Error>({
-    queryKey: ['projects'],
-    queryFn: getProjects,
+  const { data: summary } = useQuery<ProjectSummary, Error>({
+    queryKey: ['projects', 'summary'],
+    queryFn: getSummary,
+  });
+  const { data, isLoading, isError, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery<CursorPage<Project>, Error>({
+    queryKey: ['projects', PROJECTS_URL],
+    queryFn: ({ pageParam }) => getPage<Project>(pageParam as string),
+    initialPageParam: PROJECTS_URL,
+    getNextPageParam: (lastPage) => lastPage.next,
   });
+  const projects = data?.pages.flatMap((page) => page.results);
 
   return (
     <div className="container mx-auto p-4 md:p-8">
       <div className="flex justify-between items-center mb-6">
-        <h1 className="text-3xl font-bold">Your Projects</h1>
+        <div>
+          <h1 className="text-3xl font-bold">Your Projects</h1>
+          {summary && (
+            <p className="text-gray-600 mt-1">
+              {summary.projects} projects · {summary.apps} generated files · {summary.testimonials} testimonials
+            </p>
+          )}
+        </div>
         <Button asChild>
           <Link to="/create-project">Create New Project</Link>
         </Button>
@@ -71,6 +88,13 @@ const Dashboard = () => {
               <p className="text-gray-500">You haven't created any projects yet.</p>
             </div>
           )}
+          {hasNextPage && (
+            <div className="col-span-full text-center">
+              <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                {isFetchingNextPage ? 'Loading...' : 'Load More'}
+              </Button>
+            </div>
+          )}
         </div>
       )}
     </div>
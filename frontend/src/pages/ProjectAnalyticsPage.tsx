@@ -1,4 +1,4 @@
-import React, { useMemo } from 'react';
+import React from 'react';
 import { useParams } from 'react-router-dom';
 import { useQuery } from '@tanstack/react-query';
 import { apiClient } from '@/services/api';
@@ -7,8 +7,10 @@ import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, Responsive
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/Card';
 import { Loader2, AlertCircle } from 'lucide-react';
 
-const getProjects = async (): Promise<Project[]> => {
-    const { data } = await apiClient.get('/projects/');
+const getProject = async (id: string): Promise<Project> => {
+    const { data } = await apiClient.get(`/projects/${id}/`, {
+        params: { fields: 'id,name,apps_count,testimonials_count' },
+    });
     return data;
 };
 
@@ -25,15 +27,12 @@ const mockAnalyticsData = [
 const ProjectAnalyticsPage: React.FC = () => {
     const { id: currentProjectId } = useParams<{ id: string }>();
 
-    const { data: userProjects, isLoading, isError, error } = useQuery<Project[], Error>({
-        queryKey: ['projects'],
-        queryFn: getProjects
+    const { data: currentProject, isLoading, isError, error } = useQuery<Project, Error>({
+        queryKey: ['project', currentProjectId, 'analytics'],
+        queryFn: () => getProject(currentProjectId!),
+        enabled: !!currentProjectId,
     });
 
-    const currentProject = useMemo(() => {
-        return userProjects?.find(p => p.id === currentProjectId);
-    }, [userProjects, currentProjectId]);
-
     if (isLoading) {
         return <div className="flex justify-center items-center h-screen"><Loader2 className="h-16 w-16 animate-spin"/></div>;
     }
@@ -51,7 +50,26 @@ const ProjectAnalyticsPage: React.FC = () => {
     return (
         <div className="container mx-auto p-4 md:p-8">
             <h1 className="text-3xl font-bold mb-6">Analytics for {currentProject?.name || 'Project'}</h1>
-            
+
+            <div className="grid grid-cols-1 md:grid-cols-2 gap-6 mb-6">
+                <Card>
+                    <CardHeader>
+                        <CardTitle>Generated Files</CardTitle>
+                    </CardHeader>
+                    <CardContent>
+                        <p className="text-3xl font-bold">{currentProject?.apps_count ?? 0}</p>
+                    </CardContent>
+                </Card>
+                <Card>
+                    <CardHeader>
+                        <CardTitle>Testimonials</CardTitle>
+                    </CardHeader>
+                    <CardContent>
+                        <p className="text-3xl font-bold">{currentProject?.testimonials_count ?? 0}</p>
+                    </CardContent>
+                </Card>
+            </div>
+
             <Card>
                 <CardHeader>
                     <CardTitle>Usage Analytics</CardTitle>
@@ -1,5 +1,6 @@
 import axios from 'axios';
-import type { AxiosError } from 'axios';
+import type { AxiosError, AxiosInstance, AxiosRequestConfig } from 'axios';
+import type { CursorPage } from '@/types';
 
 export const apiClient = axios.create({
   baseURL: import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000/api/v1',
@@ -39,3 +40,14 @@ apiClient.interceptors.response.use(
     return Promise.reject(error);
   }
 );
+
+// Reads one page of a cursor-paginated list. Pass the page's `next` link
+// as the URL to read the following one.
+export const getPage = async <T>(
+  url: string,
+  config?: AxiosRequestConfig,
+  client: AxiosInstance = apiClient,
+): Promise<CursorPage<T>> => {
+  const { data } = await client.get<CursorPage<T>>(url, config);
+  return data;
+};
@@ -19,9 +19,25 @@ export interface Project {
         text_dark: string;
         text_light: string;
     };
+    apps_count?: number;
+    testimonials_count?: number;
     created_at: string;
 }
 
+// Totals over all of the user's projects, from /projects/summary/.
+export interface ProjectSummary {
+    projects: number;
+    by_status: Record<string, number>;
+    apps: number;
+    testimonials: number;
+}
+
+// A page of a cursor-paginated list; `next` is the URL of the following page.
+export interface CursorPage<T> {
+    next: string | null;
+    results: T[];
+}
+
 export interface BlogPost {
     id: number;
     title: string;